@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# Mock inference server - speaks enough of the Jan.ai (OpenAI) and Ollama APIs
+# to benchmark Kalki without a live model
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+# Given the request path and decoded body, return the completion text
+Responder = Callable[[str, Dict[str, Any]], str]
+
+@dataclass
+class MockConfig:
+    latency: float = 0.1         # seconds before the first token
+    jitter: float = 0.0          # +/- random seconds added to latency
+    token_rate: float = 100.0    # tokens per second once generation starts
+    failure_rate: float = 0.0    # fraction of requests answered with HTTP 500
+    models: List[str] = field(default_factory=lambda: ["dolphin3", "qwen:2.5", "mistral", "llama2"])
+
+def default_responder(path: str, body: Dict[str, Any]) -> str:
+    """Echo a short canned reply."""
+    return "This is a mock response from the Kalki benchmark server."
+
+def prompt_text(body: Dict[str, Any]) -> str:
+    """The user prompt of an OpenAI, Ollama chat or Ollama generate request."""
+    if "prompt" in body:
+        return str(body["prompt"])
+    messages = body.get("messages") or []
+    return str(messages[-1].get("content", "")) if messages else ""
+
+def _tokens(text: str) -> List[str]:
+    # Whitespace-preserving pseudo tokens, roughly one per word
+    words = text.split(" ")
+    return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+class MockInferenceServer:
+    def __init__(self, config: Optional[MockConfig] = None, responder: Responder = default_responder):
+        self.config = config or MockConfig()
+        self.responder = responder
+        self.requests = 0
+        self.app = web.Application()
+        self.app.router.add_get("/v1/models", self.openai_models)
+        self.app.router.add_post("/v1/chat/completions", self.openai_chat)
+        self.app.router.add_get("/api/tags", self.ollama_tags)
+        self.app.router.add_get("/api/version", self.ollama_version)
+        self.app.router.add_get("/api/models", self.ollama_tags)
+        self.app.router.add_post("/api/chat", self.ollama_chat)
+        self.app.router.add_post("/api/generate", self.ollama_generate)
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving; port 0 picks a free port. Returns the base URL."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _first_token_delay(self) -> None:
+        delay = self.config.latency + random.uniform(-self.config.jitter, self.config.jitter)
+        await asyncio.sleep(max(0.0, delay))
+
+    async def _token_delay(self, count: int = 1) -> None:
+        if self.config.token_rate > 0:
+            await asyncio.sleep(count / self.config.token_rate)
+
+    def _should_fail(self) -> bool:
+        return self.config.failure_rate > 0 and random.random() < self.config.failure_rate
+
+    def _usage(self, body: Dict[str, Any], tokens: List[str]) -> Dict[str, int]:
+        return {
+            "prompt_tokens": max(1, len(prompt_text(body)) // 4),
+            "completion_tokens": len(tokens),
+        }
+
+    async def _prepare(self, request: web.Request):
+        self.requests += 1
+        body = await request.json()
+        if self._should_fail():
+            raise web.HTTPInternalServerError(text="mock failure")
+        text = self.responder(request.path, body)
+        return body, text, _tokens(text)
+
+    async def openai_models(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": m, "object": "model"} for m in self.config.models]
+        })
+
+    async def ollama_tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": m} for m in self.config.models]})
+
+    async def ollama_version(self, request: web.Request) -> web.Response:
+        return web.json_response({"version": "mock"})
+
+    async def openai_chat(self, request: web.Request) -> web.StreamResponse:
+        body, text, tokens = await self._prepare(request)
+        model = body.get("model", "mock")
+        await self._first_token_delay()
+
+        if not body.get("stream", False):
+            await self._token_delay(len(tokens))
+            return web.json_response({
+                "id": f"mock-{self.requests}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": self._usage(body, tokens)
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            for token in tokens:
+                chunk = {
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                }
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await self._token_delay()
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # Client stopped reading early, e.g. after parsing what it needed
+            pass
+        return response
+
+    async def _ollama(self, request: web.Request, chat: bool) -> web.StreamResponse:
+        body, text, tokens = await self._prepare(request)
+        model = body.get("model", "mock")
+        usage = self._usage(body, tokens)
+        started = time.monotonic()
+        await self._first_token_delay()
+
+        def chunk(content: str, done: bool) -> Dict[str, Any]:
+            data: Dict[str, Any] = {"model": model, "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": content}
+            else:
+                data["response"] = content
+                # Jan's legacy generate endpoint answers with `text`
+                data["text"] = content
+            if done:
+                data["prompt_eval_count"] = usage["prompt_tokens"]
+                data["eval_count"] = usage["completion_tokens"]
+                data["total_duration"] = int((time.monotonic() - started) * 1e9)
+            return data
+
+        # Ollama streams unless told otherwise
+        if not body.get("stream", True):
+            await self._token_delay(len(tokens))
+            return web.json_response(chunk(text, True))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        try:
+            for token in tokens:
+                await response.write((json.dumps(chunk(token, False)) + "\n").encode())
+                await self._token_delay()
+            await response.write((json.dumps(chunk("", True)) + "\n").encode())
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+        return response
+
+    async def ollama_chat(self, request: web.Request) -> web.StreamResponse:
+        return await self._ollama(request, chat=True)
+
+    async def ollama_generate(self, request: web.Request) -> web.StreamResponse:
+        return await self._ollama(request, chat=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Jan.ai/Ollama inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds on latency")
+    parser.add_argument("--token-rate", type=float, default=100.0, help="Tokens per second")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--reply", default=None, help="Fixed reply text")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        token_rate=args.token_rate,
+        failure_rate=args.failure_rate
+    )
+    responder = (lambda path, body: args.reply) if args.reply else default_responder
+    server = MockInferenceServer(config, responder)
+
+    async def serve():
+        url = await server.start(args.host, args.port)
+        print(f"Mock inference server listening on {url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
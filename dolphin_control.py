@@ -3,6 +3,7 @@
 # Provides a secure way to allow your local LLM to execute system commands
 
 import argparse
+import atexit
 import json
 import logging
 import os
@@ -66,6 +67,10 @@ except ImportError:
     PYAUTOGUI_AVAILABLE = False
     log.warning("Package 'pyautogui' not found. Screenshot functionality will be disabled.")
 
+from history_manager import HistoryManager
+from history_store import HistoryStore
+from kalki.integrations.metrics import metrics
+
 class CommandCategory(Enum):
     FILE_SYSTEM = "file_system"
     PROCESS = "process"
@@ -78,16 +83,25 @@ class CommandCategory(Enum):
 class DolphinControl:
     def __init__(self, ollama_url: str = "http://localhost:11434", 
                  model_name: str = "dolphin",
-                 history_file: str = "dolphin_history.json",
+                 history_file: str = "dolphin_history.db",
                  safe_mode: bool = True,
                  auto_confirm: bool = False,
-                 enable_screen_watching: bool = False):
+                 enable_screen_watching: bool = False,
+                 history_window: int = 20,
+                 history_token_budget: int = 4096,
+                 history_session: str = "default"):
         self.ollama_url = ollama_url
         self.model_name = model_name
         self.history_file = Path(history_file)
         self.safe_mode = safe_mode
         self.auto_confirm = auto_confirm
-        self.history = []
+        # Recent turns verbatim, older ones summarised in the background
+        self.history = HistoryManager(
+            summarizer=self._summarize_history,
+            window_turns=history_window,
+            token_budget=history_token_budget,
+            on_summary=self._save_summary
+        )
         self.commands = {}
         self.last_response = ""
         
@@ -104,16 +118,20 @@ class DolphinControl:
         # Check if Ollama is running
         self._check_ollama_connection()
         
-        # Load history if exists
-        if self.history_file.exists():
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    self.history = json.load(f)
-                log.info(f"Loaded conversation history from {self.history_file}")
-            except json.JSONDecodeError:
-                log.warning(f"Could not parse history file {self.history_file}. Starting with empty history.")
-            except Exception as e:
-                log.warning(f"Error loading history: {str(e)}. Starting with empty history.")
+        # Append-only history; only the tail the prompt needs is loaded
+        self.store = HistoryStore(self.history_file, session=history_session)
+        # Also stops the summary worker at exit; the store flushes itself
+        atexit.register(self.close)
+        legacy_file = self.history_file.with_suffix(".json")
+        if legacy_file != self.history_file and legacy_file.exists():
+            self.store.migrate_json(legacy_file)
+        try:
+            self.history.summary = self.store.load_summary()
+            self.history.extend(self.store.tail(history_window))
+            if len(self.history):
+                log.info(f"Loaded {len(self.history)} recent turns from {self.history_file}")
+        except Exception as e:
+            log.warning(f"Error loading history: {str(e)}. Starting with empty history.")
         
         # Register commands
         self._register_commands()
@@ -190,9 +208,7 @@ class DolphinControl:
                 except Exception as e:
                     log.warning(f"Error getting screen context: {str(e)}")
             
-            # Prepare the messages history
-            messages = [{"role": "system", "content": 
-                        f"""You are Dolphin, a helpful AI assistant that can control a computer by executing commands.
+            system_prompt = f"""You are Dolphin, a helpful AI assistant that can control a computer by executing commands.
                         You can run commands to get information and perform tasks on the user's computer.
                         When you need to execute a command, respond in this exact format:
                         
@@ -209,33 +225,34 @@ class DolphinControl:
                         Available commands:
                         {chr(10).join([f"- {cmd.name}: {cmd.description}" for cmd in self.commands.values()])}
                         
-                        {context}"""}]
+                        {context}"""
             
-            # Add the conversation history
-            for entry in self.history:
-                messages.append(entry)
-            
-            # Add the user's input
-            messages.append({"role": "user", "content": user_input})
+            # System prompt, history summary, recent turns and the user's input, within budget
+            messages = self.history.build_messages(system_prompt, user_input)
             
             # Make the API request
-            response = requests.post(
-                f"{self.ollama_url}/api/chat",
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "stream": False
-                },
-                timeout=90
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                self.last_response = result["message"]["content"]
-                return self.last_response
-            else:
-                log.error(f"Error from Ollama API: {response.status_code} - {response.text}")
-                return f"Error: {response.status_code} - {response.text}"
+            with metrics.track("ollama", self.model_name) as timer:
+                response = requests.post(
+                    f"{self.ollama_url}/api/chat",
+                    json={
+                        "model": self.model_name,
+                        "messages": messages,
+                        "stream": False
+                    },
+                    timeout=90
+                )
+                timer.mark_first_token(response.elapsed.total_seconds())
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    timer.record_usage(result)
+                    self.last_response = result["message"]["content"]
+                    self._record_turns(user_input, self.last_response)
+                    return self.last_response
+                else:
+                    timer.fail()
+                    log.error(f"Error from Ollama API: {response.status_code} - {response.text}")
+                    return f"Error: {response.status_code} - {response.text}"
         except requests.exceptions.Timeout:
             error_msg = "Request to Ollama timed out. The model might be processing a complex query."
             log.error(error_msg)
@@ -247,4 +264,48 @@ class DolphinControl:
         except Exception as e:
             error_msg = f"Error querying Dolphin: {str(e)}"
             log.error(error_msg)
-            return error_msg 
\ No newline at end of file
+            return error_msg 
+
+    def _record_turns(self, user_input: str, reply: str) -> None:
+        self.history.extend([
+            {"role": "user", "content": user_input},
+            {"role": "assistant", "content": reply}
+        ])
+        self.store.append("user", user_input)
+        self.store.append("assistant", reply)
+    
+    def _save_summary(self, summary: str) -> None:
+        self.store.save_summary(summary)
+    
+    def close(self):
+        """Stop background history work and flush pending writes"""
+        atexit.unregister(self.close)
+        self.history.close()
+        self.store.close()
+    
+    def _summarize_history(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        """Fold turns leaving the history window into the running summary.
+
+        Called on the history worker thread, never on the query path.
+        """
+        transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+        prompt = (
+            "Update the summary of a conversation between a user and Dolphin, an assistant "
+            "that controls their computer. Keep facts, file paths, decisions and unfinished "
+            "tasks; drop pleasantries. Reply with the summary only.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+        )
+        with metrics.track("ollama", self.model_name) as timer:
+            response = requests.post(
+                f"{self.ollama_url}/api/chat",
+                json={
+                    "model": self.model_name,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "stream": False
+                },
+                timeout=120
+            )
+            response.raise_for_status()
+            result = response.json()
+            timer.record_usage(result)
+        return result["message"]["content"]
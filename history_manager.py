@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# History Manager - keeps conversation history within a prompt token budget
+# Recent turns are sent verbatim; older turns are folded into a rolling summary
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+log = logging.getLogger("kalki.history")
+
+# Given the current summary and the turns falling out of the window, return the new summary
+Summarizer = Callable[[str, List[Dict[str, str]]], str]
+
+# Chat templates add a few tokens of framing per message
+MESSAGE_OVERHEAD = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, roughly four characters per token for English text."""
+    return len(text) // 4 + 1 if text else 0
+
+def extractive_summary(summary: str, turns: List[Dict[str, str]], max_chars: int = 200) -> str:
+    """Fallback summary: the start of each evicted turn, appended to the old summary."""
+    lines = [summary] if summary else []
+    for turn in turns:
+        content = " ".join(turn.get("content", "").split())
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        lines.append(f"{turn.get('role', 'user')}: {content}")
+    return "\n".join(lines)
+
+class HistoryManager:
+    """Sliding window of recent turns plus a rolling summary of older ones.
+
+    ``append`` is cheap: turns pushed out of the window, or left out of a
+    prompt by ``token_budget``, stay pending until ``fold_batch`` of them
+    have gathered (half the window by default). They are then handed to a
+    single background worker that folds them into the summary in one call,
+    so a query never waits on summarisation and the summarizer does not
+    run on every turn. ``build_messages`` fits system prompt, summary,
+    recent turns (pending ones included while they fit) and the new input
+    under the budget, so no turn is ever dropped without being summarised.
+    """
+
+    def __init__(self,
+                 summarizer: Optional[Summarizer] = None,
+                 window_turns: int = 20,
+                 token_budget: int = 4096,
+                 max_summary_tokens: int = 512,
+                 estimator: Callable[[str], int] = estimate_tokens,
+                 on_summary: Optional[Callable[[str], None]] = None,
+                 fold_batch: Optional[int] = None):
+        self.summarizer = summarizer
+        self.window_turns = max(1, window_turns)
+        self.fold_batch = max(1, fold_batch or self.window_turns // 2)
+        self.token_budget = token_budget
+        self.max_summary_tokens = max_summary_tokens
+        self.estimator = estimator
+        self.on_summary = on_summary
+        self.turns: List[Dict[str, str]] = []
+        self.summary = ""
+        # Oldest turns the last build_messages() left out for the token budget
+        self._over_budget = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def __iter__(self):
+        return iter(list(self.turns))
+
+    def _tokens(self, message: Dict[str, str]) -> int:
+        return self.estimator(message.get("content", "")) + MESSAGE_OVERHEAD
+
+    def append(self, role: str, content: str) -> None:
+        self.extend([{"role": role, "content": content}])
+
+    def extend(self, turns: Iterable[Dict[str, str]]) -> None:
+        with self._lock:
+            self.turns.extend({"role": t["role"], "content": t["content"]} for t in turns)
+            evicted = self._take_pending()
+        self._submit_folds(evicted)
+
+    def _evict(self, turns: List[Dict[str, str]]) -> None:
+        # Mark turns over the token budget as pending; a concurrent extend()
+        # may already have folded some of them
+        ids = {id(t) for t in turns}
+        with self._lock:
+            over = 0
+            while over < len(self.turns) and id(self.turns[over]) in ids:
+                over += 1
+            self._over_budget = over
+            evicted = self._take_pending()
+        self._submit_folds(evicted)
+
+    def _take_pending(self) -> List[Dict[str, str]]:
+        # Called with the lock held: remove the pending turns once enough
+        # have gathered to be worth a summarizer call
+        pending = max(len(self.turns) - self.window_turns, self._over_budget)
+        if pending < self.fold_batch:
+            return []
+        evicted = self.turns[:pending]
+        del self.turns[:pending]
+        self._over_budget = 0
+        return evicted
+
+    def _submit_folds(self, evicted: List[Dict[str, str]]) -> None:
+        # Fold in window-sized chunks so a large backlog never becomes one huge prompt
+        for i in range(0, len(evicted), self.window_turns):
+            self._executor.submit(self._fold, evicted[i:i + self.window_turns])
+
+    def _fold(self, evicted: List[Dict[str, str]]) -> None:
+        # Runs on the summary worker; folds are serialised, so summaries stay ordered
+        with self._lock:
+            summary = self.summary
+        new_summary = None
+        if self.summarizer is not None:
+            try:
+                new_summary = self.summarizer(summary, evicted)
+            except Exception as e:
+                log.warning(f"History summarisation failed: {str(e)}. Using extractive summary.")
+        if not new_summary:
+            new_summary = extractive_summary(summary, evicted)
+        new_summary = self._trim_summary(new_summary.strip())
+        with self._lock:
+            self.summary = new_summary
+        if self.on_summary is not None:
+            try:
+                self.on_summary(new_summary)
+            except Exception as e:
+                log.warning(f"Could not persist history summary: {str(e)}")
+        log.debug(f"Folded {len(evicted)} turns into history summary ({self.estimator(new_summary)} tokens)")
+
+    def _trim_summary(self, summary: str) -> str:
+        # Keep the most recent part of an over-long summary
+        if self.estimator(summary) <= self.max_summary_tokens:
+            return summary
+        return "..." + summary[-self.max_summary_tokens * 4:]
+
+    def build_messages(self, system_prompt: str, user_input: str) -> List[Dict[str, str]]:
+        """Messages for the next request, kept under the token budget."""
+        system = {"role": "system", "content": system_prompt}
+        user = {"role": "user", "content": user_input}
+        remaining = self.token_budget - self._tokens(system) - self._tokens(user)
+
+        with self._lock:
+            turns = list(self.turns)
+            summary = self.summary
+
+        head = [system]
+        if summary:
+            summary_message = {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+            cost = self._tokens(summary_message)
+            if cost <= remaining:
+                head.append(summary_message)
+                remaining -= cost
+
+        recent: List[Dict[str, str]] = []
+        for turn in reversed(turns):
+            cost = self._tokens(turn)
+            if cost > remaining:
+                break
+            recent.append(turn)
+            remaining -= cost
+        recent.reverse()
+
+        dropped = turns[:len(turns) - len(recent)]
+        if dropped:
+            log.debug(f"{len(dropped)} turns over the token budget are pending for the summary")
+        self._evict(dropped)
+
+        if remaining < 0:
+            log.warning(f"Prompt exceeds the history token budget ({self.token_budget}) before any history")
+        return head + recent + [user]
+
+    def wait_idle(self, timeout: Optional[float] = None) -> None:
+        """Block until queued summarisation work is done."""
+        self._executor.submit(lambda: None).result(timeout)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.turns.clear()
+            self.summary = ""
+            self._over_budget = 0
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# History Store - append-only conversation log in SQLite
+# Writes are queued and committed in batches by a writer thread; reads only
+# touch the rows they need, so startup cost does not grow with the history
+
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger("kalki.history_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session TEXT NOT NULL,
+    ts REAL NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_session_ts ON turns (session, ts);
+CREATE TABLE IF NOT EXISTS summaries (
+    session TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+"""
+
+class HistoryStore:
+    """Append-only turn log with indexed lookup by session and time.
+
+    ``append`` only enqueues; a writer thread commits queued turns in one
+    transaction per batch (one fsync per batch rather than per turn). Use
+    ``flush`` to wait for everything queued so far to be durable.
+    """
+
+    def __init__(self,
+                 path: str = "dolphin_history.db",
+                 session: str = "default",
+                 flush_interval: float = 1.0,
+                 batch_size: int = 256):
+        self.path = Path(path)
+        self.session = session
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._read_lock = threading.Lock()
+
+        self._reader = self._connect()
+        self._reader.executescript(SCHEMA)
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+        # The writer is a daemon thread; without this, turns still queued at exit are lost
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets the writer commit while readers query the tail
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def append(self, role: str, content: str, ts: Optional[float] = None, session: Optional[str] = None) -> None:
+        """Queue a turn for writing."""
+        if self._closed:
+            raise RuntimeError("History store is closed")
+        self._queue.put(("turn", (session or self.session, ts or time.time(), role, content)))
+
+    def save_summary(self, summary: str, session: Optional[str] = None) -> None:
+        """Queue the rolling summary of a session, replacing the previous one."""
+        if self._closed:
+            raise RuntimeError("History store is closed")
+        self._queue.put(("summary", (session or self.session, summary, time.time())))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued writes are committed."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not self._commit(conn, batch):
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[Tuple[str, Any]]) -> bool:
+        """Write a batch in one transaction; returns False when asked to stop."""
+        turns = [item for kind, item in batch if kind == "turn"]
+        summaries = [item for kind, item in batch if kind == "summary"]
+        try:
+            with conn:
+                if turns:
+                    conn.executemany(
+                        "INSERT INTO turns (session, ts, role, content) VALUES (?, ?, ?, ?)", turns
+                    )
+                if summaries:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO summaries (session, summary, ts) VALUES (?, ?, ?)", summaries
+                    )
+        except sqlite3.Error as e:
+            log.error(f"Failed to write {len(turns)} history turns: {str(e)}")
+
+        running = True
+        for kind, item in batch:
+            if kind == "flush":
+                item.set()
+            elif kind == "stop":
+                running = False
+        return running
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def tail(self, limit: int, session: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The last ``limit`` committed turns of a session, oldest first."""
+        rows = self._query(
+            "SELECT ts, role, content FROM turns WHERE session = ? ORDER BY id DESC LIMIT ?",
+            (session or self.session, limit)
+        )
+        return [{"ts": ts, "role": role, "content": content} for ts, role, content in reversed(rows)]
+
+    def between(self, start: float, end: float, session: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Committed turns of a session with start <= ts < end, oldest first."""
+        rows = self._query(
+            "SELECT ts, role, content FROM turns WHERE session = ? AND ts >= ? AND ts < ? ORDER BY ts, id",
+            (session or self.session, start, end)
+        )
+        return [{"ts": ts, "role": role, "content": content} for ts, role, content in rows]
+
+    def load_summary(self, session: Optional[str] = None) -> str:
+        rows = self._query("SELECT summary FROM summaries WHERE session = ?", (session or self.session,))
+        return rows[0][0] if rows else ""
+
+    def sessions(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT DISTINCT session FROM turns", ())]
+
+    def count(self, session: Optional[str] = None) -> int:
+        return self._query("SELECT COUNT(*) FROM turns WHERE session = ?", (session or self.session,))[0][0]
+
+    def migrate_json(self, json_path: Path) -> int:
+        """Import a legacy JSON history list once, then rename the file aside."""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                turns = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"Could not migrate history file {json_path}: {str(e)}")
+            return 0
+
+        # Legacy entries have no timestamps; keep their order with increasing ts
+        base = json_path.stat().st_mtime - len(turns)
+        for i, turn in enumerate(turns):
+            if isinstance(turn, dict) and "role" in turn and "content" in turn:
+                self.append(turn["role"], turn["content"], ts=base + i)
+        self.flush()
+        json_path.rename(json_path.with_suffix(json_path.suffix + ".migrated"))
+        log.info(f"Migrated {len(turns)} turns from {json_path} to {self.path}")
+        return len(turns)
+
+    def close(self) -> None:
+        """Flush pending writes and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(("stop", None))
+        self._writer.join()
+        with self._read_lock:
+            self._reader.close()
@@ -1,20 +1,26 @@
 import requests
 from requests.adapters import HTTPAdapter, Retry
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence
 import logging
 import asyncio
 import aiohttp
 import json
 
+from kalki.integrations.batch import BatchRun, backend_limit
+from kalki.integrations.health import health_monitor
+from kalki.integrations.metrics import metrics
+
 class JanClient:
     def __init__(self, 
                  base_url: str = "http://localhost:8080", 
                  api_key: Optional[str] = None,
                  timeout: int = 30,
-                 max_retries: int = 3):
+                 max_retries: int = 3,
+                 max_concurrency: int = 4):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         self.timeout = timeout
+        self.max_concurrency = max_concurrency
         self.logger = logging.getLogger("kalki.jan")
         
         # Default model configuration
@@ -45,6 +51,16 @@ class JanClient:
                        status_forcelist=[500, 502, 503, 504])
         self.session.mount('http://', HTTPAdapter(max_retries=retries))
         
+        # Shared, background-probed health status for this server
+        self.backend = f"jan:{self.base_url}"
+        health_monitor.register(self.backend, self._probe)
+        # Shared by single async calls and batches against this server
+        self._limit = backend_limit(self.backend, max_concurrency)
+        
+    def _probe(self) -> bool:
+        response = requests.get(f"{self.base_url}/v1/models", headers=self.headers, timeout=5)
+        return response.status_code == 200
+        
     async def agenerate(self,
                        prompt: str,
                        model: str = "dolphin",
@@ -53,6 +69,14 @@ class JanClient:
         """
         Async version of generate method
         """
+        async with self._limit:
+            return await self._agenerate(prompt, model, image_path, **kwargs)
+            
+    async def _agenerate(self,
+                         prompt: str,
+                         model: str = "dolphin",
+                         image_path: Optional[str] = None,
+                         **kwargs) -> Dict[Any, Any]:
         url = f"{self.base_url}/v1/chat/completions"
         messages = [{"role": "user", "content": prompt}]
         data = {
@@ -61,6 +85,8 @@ class JanClient:
             **kwargs
         }
         
+        health_monitor.check(self.backend)
+        timer = metrics.track("jan", model)
         async with aiohttp.ClientSession() as session:
             try:
                 if image_path:
@@ -69,22 +95,59 @@ class JanClient:
                         data.add_field("image", f)
                         data.add_field("messages", json.dumps(messages))
                         async with session.post(url, data=data, headers=self.headers) as response:
+                            timer.mark_first_token()
                             response.raise_for_status()
                             result = await response.json()
                 else:
                     async with session.post(url, json=data, headers=self.headers) as response:
+                        timer.mark_first_token()
                         response.raise_for_status()
                         result = await response.json()
                 
+                health_monitor.record_success(self.backend)
+                timer.record_usage(result)
                 return {
                     "text": result["choices"][0]["message"]["content"],
                     "model": model,
                     "usage": result.get("usage", {})
                 }
             
+            except aiohttp.ClientResponseError as e:
+                if e.status >= 500:
+                    health_monitor.record_failure(self.backend)
+                else:
+                    health_monitor.record_success(self.backend)
+                timer.fail()
+                self.logger.error(f"Error in async call to Jan API: {str(e)}")
+                raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                health_monitor.record_failure(self.backend)
+                timer.fail()
+                self.logger.error(f"Error in async call to Jan API: {str(e)}")
+                raise
             except Exception as e:
+                health_monitor.release(self.backend)
+                timer.fail()
                 self.logger.error(f"Error in async call to Jan API: {str(e)}")
                 raise
+            finally:
+                timer.finish()
+
+    def agenerate_many(self,
+                       prompts: Sequence[str],
+                       model: str = "dolphin",
+                       **kwargs) -> BatchRun:
+        """
+        Run agenerate over many prompts with at most max_concurrency requests
+        in flight to this server
+        
+        Use ``async for`` to get BatchItems as they complete, or await the
+        result for a list in input order. Failed prompts are reported per item.
+        """
+        async def run(prompt: str) -> Dict[Any, Any]:
+            return await self._agenerate(prompt, model=model, **kwargs)
+        
+        return BatchRun(run, prompts, self._limit)
 
     def generate(self,
                 prompt: str,
@@ -108,6 +171,8 @@ class JanClient:
             **kwargs
         }
 
+        health_monitor.check(self.backend)
+        timer = metrics.track("jan", model)
         try:
             if image_path:
                 with open(image_path, "rb") as f:
@@ -127,8 +192,11 @@ class JanClient:
                     timeout=self.timeout
                 )
             
+            timer.mark_first_token(response.elapsed.total_seconds())
             response.raise_for_status()
             result = response.json()
+            health_monitor.record_success(self.backend)
+            timer.record_usage(result)
             return {
                 "text": result["choices"][0]["message"]["content"],
                 "model": model,
@@ -136,14 +204,30 @@ class JanClient:
             }
             
         except requests.exceptions.Timeout:
+            health_monitor.record_failure(self.backend)
+            timer.fail()
             self.logger.error("Request timed out")
             raise
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code >= 500:
+                health_monitor.record_failure(self.backend)
+            else:
+                health_monitor.record_success(self.backend)
+            timer.fail()
+            self.logger.error(f"Error calling Jan API: {str(e)}")
+            raise
         except requests.exceptions.RequestException as e:
+            health_monitor.record_failure(self.backend)
+            timer.fail()
             self.logger.error(f"Error calling Jan API: {str(e)}")
             raise
         except Exception as e:
+            health_monitor.release(self.backend)
+            timer.fail()
             self.logger.error(f"Unexpected error: {str(e)}")
             raise
+        finally:
+            timer.finish()
 
     def list_models(self) -> List[str]:
         """Get list of available models from Jan"""
@@ -156,17 +240,13 @@ class JanClient:
             self.logger.error(f"Error getting models: {str(e)}")
             raise
 
-    def check_health(self) -> bool:
-        """Check if Jan.ai server is healthy"""
-        try:
-            response = self.session.get(
-                f"{self.base_url}/v1/models",
-                headers=self.headers,
-                timeout=5
-            )
-            return response.status_code == 200
-        except:
-            return False
+    def check_health(self, max_age: Optional[float] = None) -> bool:
+        """Check if Jan.ai server is healthy
+        
+        Returns the status cached by the background health probe; only probes
+        inline when nothing is cached yet or it is older than max_age seconds.
+        """
+        return health_monitor.is_healthy(self.backend, max_age=max_age)
 
     def generate_with_phi(self,
                          prompt: str,
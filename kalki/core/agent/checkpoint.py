@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ...config.logging_setup import logger
+from ..plugins.base import PluginResult
+
+class CheckpointStore:
+    """Append-only checkpoints of running agent tasks, one file per task.
+
+    A task file starts with a header line (goal, step and time budget)
+    followed by one JSON line per checkpoint holding only what changed
+    since the previous one: new thoughts and actions, the last action and
+    result, the step counter and what the task and its subtasks have used
+    of the budget. Writing a checkpoint therefore costs the size of a
+    step, not of the whole task. Steps completed between writes (with
+    ``every`` > 1) are written by flush(), e.g. on shutdown. A torn last
+    line from a crash is ignored on load.
+    """
+
+    def __init__(self, directory: str = "checkpoints", every: int = 1):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.every = max(1, every)
+        # task_id -> (state, thoughts written, actions written)
+        self._active: Dict[str, Tuple[Any, int, int]] = {}
+        # task_id -> snapshot of the last completed step not yet written
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # Reentrant: flush() may run from a signal handler while a step holds the lock
+        self._lock = threading.RLock()
+
+    def _path(self, task_id: str) -> Path:
+        return self.directory / f"{task_id}.jsonl"
+
+    def track(self, state: Any, max_steps: int, time_limit: Optional[float] = None) -> None:
+        """Start checkpointing a new task."""
+        header = {"goal": state.goal, "max_steps": max_steps, "time_limit": time_limit, "created": time.time()}
+        with self._lock:
+            self._append(state.task_id, header)
+            self._active[state.task_id] = (state, 0, 0)
+
+    def resume(self, state: Any) -> None:
+        """Continue checkpointing a task restored with load()."""
+        with self._lock:
+            self._active[state.task_id] = (state, len(state.thoughts), len(state.actions))
+
+    def save(self, state: Any, budget: Any = None) -> None:
+        """Record a completed step and the budget used so far (a Budget,
+        shared with subtasks); written now or every ``every`` steps."""
+        with self._lock:
+            if state.task_id not in self._active:
+                return
+            self._pending[state.task_id] = {
+                "step": state.steps,
+                "thoughts": len(state.thoughts),
+                "actions": len(state.actions),
+                "last_action": state.last_action,
+                "last_result": state.last_result,
+                "completed": state.completed,
+                "budget_steps": budget.steps if budget is not None else state.steps,
+                "elapsed": budget.elapsed if budget is not None else 0.0,
+            }
+            if state.steps % self.every == 0:
+                self._write_pending(state.task_id)
+
+    def finish(self, state: Any) -> None:
+        """The task ended normally; its checkpoint is no longer needed."""
+        with self._lock:
+            self._active.pop(state.task_id, None)
+            self._pending.pop(state.task_id, None)
+        self.discard(state.task_id)
+
+    def flush(self) -> None:
+        """Write every completed step that has not been written yet."""
+        with self._lock:
+            for task_id in list(self._pending):
+                self._write_pending(task_id)
+
+    def discard(self, task_id: str) -> None:
+        try:
+            self._path(task_id).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove checkpoint {task_id}: {e}")
+
+    def pending(self) -> List[str]:
+        """Ids of tasks with a checkpoint, oldest first."""
+        paths = sorted(self.directory.glob("*.jsonl"), key=lambda p: p.stat().st_mtime)
+        return [p.stem for p in paths]
+
+    def load(self, task_id: str) -> Dict[str, Any]:
+        """Merge a task's checkpoint lines into one snapshot.
+
+        Thoughts are (type, content) pairs and actions (plugin, parameters,
+        timestamp) triples. Raises FileNotFoundError for an unknown task.
+        """
+        snapshot: Dict[str, Any] = {
+            "task_id": task_id, "steps": 0, "thoughts": [], "actions": [],
+            "last_action": None, "last_result": None, "completed": False,
+            "budget_steps": 0, "elapsed": 0.0
+        }
+        path = self._path(task_id)
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        for i, line in enumerate(lines):
+            try:
+                if not line.endswith("\n"):
+                    raise ValueError("incomplete line")
+                record = json.loads(line)
+            except ValueError:
+                # Drop the torn tail so later checkpoints append cleanly
+                logger.warning(f"Ignoring torn line {i + 1} of checkpoint {task_id}")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.writelines(lines[:i])
+                break
+            if i == 0:
+                snapshot.update(goal=record["goal"], max_steps=record["max_steps"],
+                                time_limit=record.get("time_limit"))
+                continue
+            snapshot["steps"] = record["s"]
+            snapshot["thoughts"].extend(record["t"])
+            snapshot["actions"].extend(record["a"])
+            snapshot["last_action"] = record["la"]
+            snapshot["last_result"] = record["lr"]
+            snapshot["completed"] = record["c"]
+            snapshot["budget_steps"] = record.get("bs", record["s"])
+            snapshot["elapsed"] = record.get("be", 0.0)
+        if "goal" not in snapshot:
+            raise ValueError(f"checkpoint {task_id} has no header")
+        if snapshot["last_result"] is not None:
+            snapshot["last_result"] = PluginResult(*snapshot["last_result"])
+        return snapshot
+
+    def _write_pending(self, task_id: str) -> None:
+        snapshot = self._pending.pop(task_id, None)
+        if snapshot is None or task_id not in self._active:
+            return
+        state, thoughts_written, actions_written = self._active[task_id]
+        last_action, last_result = snapshot["last_action"], snapshot["last_result"]
+        record = {
+            "s": snapshot["step"],
+            "t": [[t.type.value, t.content] for t in state.thoughts[thoughts_written:snapshot["thoughts"]]],
+            "a": [[a.plugin, a.parameters, a.timestamp] for a in state.actions[actions_written:snapshot["actions"]]],
+            "la": [last_action.plugin, last_action.parameters, last_action.timestamp] if last_action else None,
+            "lr": [last_result.success, last_result.data, last_result.error] if last_result else None,
+            "c": snapshot["completed"],
+            "bs": snapshot["budget_steps"],
+            "be": round(snapshot["elapsed"], 3),
+        }
+        if self._append(task_id, record):
+            self._active[task_id] = (state, snapshot["thoughts"], snapshot["actions"])
+
+    def _append(self, task_id: str, record: Dict[str, Any]) -> bool:
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        try:
+            with open(self._path(task_id), "a", encoding="utf-8") as f:
+                f.write(line)
+            return True
+        except OSError as e:
+            logger.warning(f"Could not write checkpoint {task_id}: {e}")
+            return False
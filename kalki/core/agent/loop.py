@@ -1,9 +1,17 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 from enum import Enum
 import asyncio
+import json
+import time
+import uuid
 from ...config.logging_setup import logger
 from ..plugins.base import plugin_registry, PluginResult
+from .checkpoint import CheckpointStore
+from .plan_cache import PlanCache
+from .planner import SUBTASK_SCHEMA, Budget, ResourceLocks, TaskGraph, TaskPlanner
+from .scratchpad import Scratchpad
+from .tracing import CONTROL, MODEL, PLUGIN, Tracer
 
 class ThoughtType(Enum):
     TASK_PLANNING = "task_planning"
@@ -20,6 +28,7 @@ class Thought:
 class Action:
     plugin: str
     parameters: Dict[str, Any]
+    timestamp: float = field(default_factory=time.time)
 
 @dataclass
 class TaskState:
@@ -28,60 +37,378 @@ class TaskState:
     thoughts: List[Thought] = None
     last_action: Optional[Action] = None
     last_result: Optional[PluginResult] = None
+    actions: List[Action] = None  # Successful actions in order, for macro recording
+    scratchpad: Scratchpad = None  # Bounded prompt rendering of thoughts
+    replayed: bool = False  # Completed entirely from a cached plan
+    task_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    steps: int = 0  # Completed loop steps
     
     def __post_init__(self):
         if self.thoughts is None:
             self.thoughts = []
+        if self.actions is None:
+            self.actions = []
+        if self.scratchpad is None:
+            self.scratchpad = Scratchpad()
+    
+    def add_thought(self, thought: Thought) -> None:
+        self.thoughts.append(thought)
+        self.scratchpad.add(thought.type.value, thought.content)
+
+# One plugin call
+PLUGIN_CALL_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "plugin": {"type": "string"},
+        "parameters": {"type": "object"}
+    },
+    "required": ["plugin", "parameters"]
+}
+
+# Schema for one fused ReAct step: what kind of step, the reasoning, the
+# action to run (if any), or a short script of actions, and whether the
+# goal is now reached
+STEP_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string", "enum": [t.value for t in ThoughtType if t != ThoughtType.OBSERVATION]},
+        "thought": {"type": "string"},
+        "action": {**PLUGIN_CALL_SCHEMA, "type": ["object", "null"]},
+        "script": {"type": "array", "items": PLUGIN_CALL_SCHEMA},
+        "subtasks": {"type": "array", "items": SUBTASK_SCHEMA},
+        "completed": {"type": "boolean"}
+    },
+    "required": ["type", "thought", "completed"]
+}
+
+ACTION_SCHEMA: Dict[str, Any] = STEP_SCHEMA["properties"]["action"]
+
+@dataclass
+class StepDecision:
+    """One parsed and validated fused step."""
+    type: ThoughtType
+    thought: str
+    action: Optional[Action] = None
+    script: List[Action] = field(default_factory=list)
+    plan: Optional[TaskGraph] = None
+    completed: bool = False
 
 class AgentLoop:
-    def __init__(self, model_client):
+    def __init__(self, model_client, fused: bool = True, max_parallel: int = 4,
+                 time_limit: Optional[float] = None, tracer: Optional[Tracer] = None,
+                 plan_cache: Optional[PlanCache] = None,
+                 checkpoints: Optional[CheckpointStore] = None,
+                 max_script_steps: int = 8):
         self.model_client = model_client
         self.available_plugins = plugin_registry.list_plugins()
+        # One structured model call per step instead of think/select/reflect
+        self.fused = fused
+        self.planner = TaskPlanner(model_client)
+        # Independent subtasks run concurrently; plugins sharing a resource do not
+        self.max_parallel = max_parallel
+        self.resources = ResourceLocks()
+        self.time_limit = time_limit
+        # Prompts start with a byte-identical prefix so backends can reuse its KV cache
+        self._plugins_json = json.dumps(self.available_plugins, sort_keys=True)
+        # Spans for every model call and plugin execution; disabled without a path
+        self.tracer = tracer or Tracer()
+        # Recurring goals replay their last successful trajectory without the model
+        self.plan_cache = plan_cache
+        # Top-level tasks are checkpointed after every step and can be resumed
+        self.checkpoints = checkpoints
+        # Longest action script accepted in one step
+        self.max_script_steps = max_script_steps
+    
+    def _generation_kwargs(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask for schema-constrained output when the backend supports it."""
+        if getattr(self.model_client, 'supports_format', False):
+            return {"format": schema}
+        return {}
     
-    async def execute_task(self, goal: str, max_steps: int = 10) -> TaskState:
-        """Execute a task using the ReAct loop."""
+    async def execute_task(self, goal: str, max_steps: int = 10,
+                           budget: Optional[Budget] = None) -> TaskState:
+        """Execute a task using the ReAct loop.
+        
+        max_steps (and the loop's time_limit) bound the task together with
+        all of its subtasks; subtasks draw on the parent's budget. A goal
+        with a cached plan is replayed first, and the model only takes over
+        from the first step whose observation shows a failure.
+        """
         state = TaskState(goal=goal)
-        steps = 0
-        
-        while not state.completed and steps < max_steps:
-            # Think about the current state
-            thought = await self._think(state)
-            state.thoughts.append(thought)
-            
-            if thought.type == ThoughtType.TASK_PLANNING:
-                # Break down the task if needed
-                subtasks = await self._plan_subtasks(state)
-                for subtask in subtasks:
-                    await self.execute_task(subtask, max_steps=max_steps-steps)
-            
-            elif thought.type == ThoughtType.ACTION_SELECTION:
-                # Select and execute an action
-                action = await self._select_action(state)
-                if action:
-                    state.last_action = action
-                    result = await plugin_registry.execute_plugin(
-                        action.plugin,
-                        **action.parameters
-                    )
-                    state.last_result = result
-                    
-                    # Observe the result
-                    observation = await self._observe(state)
-                    state.thoughts.append(observation)
-            
-            elif thought.type == ThoughtType.REFLECTION:
-                # Reflect on progress and decide if task is complete
-                state.completed = await self._reflect(state)
-            
-            steps += 1
+        checkpointed = budget is None and self.checkpoints is not None
+        budget = budget or Budget(max_steps, self.time_limit)
+        if checkpointed:
+            self.checkpoints.track(state, budget.max_steps, budget.time_limit)
         
+        with self.tracer.span("task", CONTROL, goal=goal) as task_span:
+            cached = self.plan_cache.get(goal) if self.plan_cache is not None else None
+            if cached:
+                await self._replay(state, cached, budget)
+            await self._run_steps(state, budget, checkpointed)
+            task_span.set(completed=state.completed, steps=state.steps, cached=bool(cached))
+        
+        if cached and not state.replayed:
+            self.plan_cache.record(replayed=False)
+        self._remember_plan(state)
         return state
     
+    def _remember_plan(self, state: TaskState) -> None:
+        if self.plan_cache is not None and state.completed and state.actions and not state.replayed:
+            # A fresh or model-repaired trajectory replaces the cached one
+            self.plan_cache.put(state.goal, [
+                {"plugin": a.plugin, "parameters": a.parameters} for a in state.actions
+            ])
+    
+    async def resume_task(self, task_id: str, time_limit: Optional[float] = None) -> TaskState:
+        """Continue a checkpointed task from its last completed step.
+        
+        The task keeps what it and its subtasks had used of the step and
+        time budget; time_limit overrides the original limit. Raises
+        FileNotFoundError if there is no such checkpoint.
+        """
+        if self.checkpoints is None:
+            raise RuntimeError("checkpointing is not enabled")
+        snapshot = self.checkpoints.load(task_id)
+        state = TaskState(goal=snapshot['goal'], task_id=task_id, steps=snapshot['steps'])
+        for kind, content in snapshot['thoughts']:
+            state.add_thought(Thought(ThoughtType(kind), content))
+        state.actions = [Action(*a) for a in snapshot['actions']]
+        state.last_action = Action(*snapshot['last_action']) if snapshot['last_action'] else None
+        state.last_result = snapshot['last_result']
+        state.completed = snapshot['completed']
+        budget = Budget(snapshot['max_steps'], time_limit or snapshot.get('time_limit') or self.time_limit,
+                        steps=snapshot['budget_steps'], elapsed=snapshot['elapsed'])
+        logger.info(f"Resuming task {task_id} at step {state.steps}: {state.goal}")
+        
+        self.checkpoints.resume(state)
+        with self.tracer.span("task", CONTROL, goal=state.goal, resumed=True) as task_span:
+            await self._run_steps(state, budget, checkpointed=True)
+            task_span.set(completed=state.completed, steps=state.steps)
+        self._remember_plan(state)
+        return state
+    
+    async def _run_steps(self, state: TaskState, budget: Budget, checkpointed: bool) -> None:
+        while not state.completed and budget.consume():
+            with self.tracer.span("step", CONTROL):
+                await self._step(state, budget)
+            state.steps += 1
+            if checkpointed:
+                self.checkpoints.save(state, budget)
+        # Interrupted tasks (an exception or cancellation) keep their checkpoint
+        if checkpointed:
+            self.checkpoints.finish(state)
+    
+    async def _replay(self, state: TaskState, actions: List[Dict[str, Any]], budget: Budget) -> None:
+        """Run a cached trajectory, checking the observation after every action."""
+        with self.tracer.span("replay", CONTROL, actions=len(actions)):
+            for i, data in enumerate(actions, 1):
+                if budget.expired:
+                    return
+                try:
+                    action = self._parse_action(data)
+                except ValueError as e:
+                    failure = f"step {i} is no longer valid: {e}"
+                else:
+                    await self._run_action(state, action)
+                    failure = None if state.last_result.success else f"step {i} failed"
+                if failure:
+                    self.plan_cache.invalidate(state.goal)
+                    state.add_thought(Thought(
+                        ThoughtType.OBSERVATION, f"Cached plan {failure}; continuing without it"
+                    ))
+                    return
+        
+        state.replayed = True
+        state.completed = True
+        self.plan_cache.record(replayed=True)
+        state.add_thought(Thought(ThoughtType.OBSERVATION, f"Completed by replaying a cached plan of {len(actions)} actions"))
+    
+    async def _step(self, state: TaskState, budget: Budget) -> None:
+        if self.fused:
+            await self._fused_step(state, budget)
+            return
+        
+        # Think about the current state
+        thought = await self._think(state)
+        state.add_thought(thought)
+        
+        if thought.type == ThoughtType.TASK_PLANNING:
+            # Break down the task if needed
+            plan = await self._plan_subtasks(state)
+            if plan:
+                await self._run_subtasks(state, plan, budget)
+        
+        elif thought.type == ThoughtType.ACTION_SELECTION:
+            # Select and execute an action
+            action = await self._select_action(state)
+            if action:
+                await self._run_action(state, action)
+            else:
+                state.add_thought(Thought(ThoughtType.OBSERVATION, "No valid action was selected"))
+        
+        elif thought.type == ThoughtType.REFLECTION:
+            # Reflect on progress and decide if task is complete
+            state.completed = await self._reflect(state)
+    
+    async def _generate(self, phase: str, prompt: str, **kwargs) -> str:
+        """One model call, traced with prompt and response sizes."""
+        with self.tracer.span(phase, MODEL, prompt_chars=len(prompt)) as span:
+            response = await self.model_client.generate(prompt, **kwargs)
+            span.set(result_chars=len(response or ""))
+        return response
+    
+    async def _fused_step(self, state: TaskState, budget: Budget) -> None:
+        """Think, act and check completion with a single model call."""
+        response = await self._generate(
+            "fused_step", self._create_step_prompt(state), **self._generation_kwargs(STEP_SCHEMA)
+        )
+        try:
+            step = self._parse_step(response)
+        except ValueError as e:
+            # Nothing is executed on a malformed step; the error is fed back
+            logger.warning(f"Rejected agent step: {e}")
+            state.add_thought(Thought(ThoughtType.OBSERVATION, f"Invalid step rejected: {e}"))
+            return
+        
+        state.add_thought(Thought(step.type, step.thought))
+        if step.type == ThoughtType.TASK_PLANNING:
+            await self._run_subtasks(state, step.plan, budget)
+        elif step.script:
+            await self._run_script(state, step.script)
+        elif step.type == ThoughtType.ACTION_SELECTION:
+            await self._run_action(state, step.action)
+        
+        if step.completed:
+            state.completed = True
+    
+    async def _run_subtasks(self, state: TaskState, plan: TaskGraph, budget: Budget) -> None:
+        """Run a subtask graph, independent branches concurrently."""
+        with self.tracer.span("subtasks", CONTROL, count=len(plan.subtasks)):
+            results = await plan.run(
+                lambda subtask: self.execute_task(subtask.goal, budget=budget),
+                succeeded=lambda child: child.completed,
+                max_parallel=self.max_parallel,
+                budget=budget
+            )
+        outcomes = []
+        for subtask_id in plan.order:
+            child = results.get(subtask_id)
+            if child is not None:
+                state.actions.extend(child.actions)
+            status = "skipped" if child is None else "done" if child.completed else "not done"
+            outcomes.append(f"{plan.subtasks[subtask_id].goal}: {status}")
+        state.add_thought(Thought(ThoughtType.OBSERVATION, "Subtasks - " + "; ".join(outcomes)))
+        if all(child is not None and child.completed for child in results.values()):
+            state.completed = True
+    
+    async def _run_action(self, state: TaskState, action: Action) -> None:
+        """Execute an action through its plugin and record the observation."""
+        state.last_action = action
+        async with self.resources.hold(plugin_registry.resources(action.plugin)):
+            with self.tracer.span(f"plugin:{action.plugin}", PLUGIN,
+                                  action=action.parameters.get('action')) as span:
+                result = await plugin_registry.execute_plugin(
+                    action.plugin,
+                    **action.parameters
+                )
+                span.set(success=result.success,
+                         result_chars=len(str(result.data if result.success else result.error)))
+        state.last_result = result
+        if result.success:
+            state.actions.append(action)
+        
+        # Observe the result
+        with self.tracer.span("observe"):
+            observation = await self._observe(state)
+        state.add_thought(observation)
+    
+    async def _run_script(self, state: TaskState, script: List[Action]) -> None:
+        """Run several actions back to back and observe once, after the last
+        one that ran; the script stops at the first failure."""
+        resources = set()
+        for action in script:
+            resources.update(plugin_registry.resources(action.plugin))
+        async with self.resources.hold(resources):
+            with self.tracer.span("script", PLUGIN, steps=len(script)) as span:
+                results = await plugin_registry.execute_batch(
+                    [(action.plugin, action.parameters) for action in script]
+                )
+                span.set(ran=len(results), success=all(r.success for r in results))
+        for action, result in zip(script, results):
+            state.last_action, state.last_result = action, result
+            if result.success:
+                state.actions.append(action)
+        
+        with self.tracer.span("observe"):
+            observation = await self._observe(state)
+        observation.content = f"Script ran {len(results)} of {len(script)} actions. {observation.content}"
+        state.add_thought(observation)
+    
+    def _decode_json(self, response: str) -> Dict[str, Any]:
+        """Decode a JSON object reply, tolerating text around it."""
+        text = (response or "").strip()
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            start, end = text.find('{'), text.rfind('}') + 1
+            if start == -1 or end == 0:
+                raise ValueError("response is not a JSON object")
+            try:
+                data = json.loads(text[start:end])
+            except json.JSONDecodeError as e:
+                raise ValueError(f"malformed JSON: {e}")
+        if not isinstance(data, dict):
+            raise ValueError("response is not a JSON object")
+        return data
+    
+    def _parse_action(self, data: Any) -> Action:
+        """Validate an action against the registered plugins."""
+        if not isinstance(data, dict):
+            raise ValueError("action must be an object")
+        plugin = data.get('plugin')
+        parameters = data.get('parameters')
+        names = {p['name'] for p in self.available_plugins}
+        if not isinstance(plugin, str) or plugin not in names:
+            raise ValueError(f"unknown plugin {plugin!r}; available: {sorted(names)}")
+        if not isinstance(parameters, dict):
+            raise ValueError("action parameters must be an object")
+        return Action(plugin=plugin, parameters=parameters)
+    
+    def _parse_step(self, response: str) -> StepDecision:
+        """Strictly parse a fused step, raising ValueError if it is invalid."""
+        data = self._decode_json(response)
+        try:
+            step_type = ThoughtType(data.get('type'))
+        except ValueError:
+            raise ValueError(f"unknown step type {data.get('type')!r}")
+        if step_type == ThoughtType.OBSERVATION:
+            raise ValueError("observations come from plugins, not the model")
+        thought = data.get('thought')
+        completed = data.get('completed')
+        if not isinstance(thought, str):
+            raise ValueError("thought must be a string")
+        if not isinstance(completed, bool):
+            raise ValueError("completed must be true or false")
+        
+        step = StepDecision(step_type, thought, completed=completed)
+        script = data.get('script')
+        if step_type == ThoughtType.ACTION_SELECTION and script:
+            if not isinstance(script, list):
+                raise ValueError("script must be a list of actions")
+            if len(script) > self.max_script_steps:
+                raise ValueError(f"script has {len(script)} actions; at most {self.max_script_steps} are allowed")
+            step.script = [self._parse_action(item) for item in script]
+        elif step_type == ThoughtType.ACTION_SELECTION:
+            step.action = self._parse_action(data.get('action'))
+        elif step_type == ThoughtType.TASK_PLANNING:
+            step.plan = TaskGraph.from_json(data.get('subtasks'))
+        return step
+    
     async def _think(self, state: TaskState) -> Thought:
         """Generate the next thought based on the current state."""
         # TODO: Implement proper prompting
         prompt = self._create_thinking_prompt(state)
-        response = await self.model_client.generate(prompt)
+        response = await self._generate("think", prompt)
         
         # Parse response to determine thought type and content
         # This is a simplified version - implement proper parsing
@@ -92,27 +419,25 @@ class AgentLoop:
         else:
             return Thought(ThoughtType.REFLECTION, response)
     
-    async def _plan_subtasks(self, state: TaskState) -> List[str]:
-        """Break down a complex task into subtasks."""
-        # TODO: Implement proper task breakdown
-        prompt = f"Break down the task: {state.goal}"
-        response = await self.model_client.generate(prompt)
-        return response.split('\n')  # Simplified parsing
+    async def _plan_subtasks(self, state: TaskState) -> Optional[TaskGraph]:
+        """Break down a complex task into a graph of subtasks."""
+        try:
+            with self.tracer.span("plan", MODEL):
+                return await self.planner.plan(state.goal)
+        except ValueError as e:
+            logger.warning(f"Rejected plan: {e}")
+            state.add_thought(Thought(ThoughtType.OBSERVATION, f"Invalid plan rejected: {e}"))
+            return None
     
     async def _select_action(self, state: TaskState) -> Optional[Action]:
         """Select the next action based on available plugins."""
-        # TODO: Implement proper action selection
         prompt = self._create_action_prompt(state)
-        response = await self.model_client.generate(prompt)
-        
-        # Parse response to get plugin and parameters
-        # This is a simplified version - implement proper parsing
-        if "click" in response.lower():
-            return Action(
-                plugin="ui_automation",
-                parameters={"action": "click", "x": 100, "y": 100}
-            )
-        return None
+        response = await self._generate("select_action", prompt, **self._generation_kwargs(ACTION_SCHEMA))
+        try:
+            return self._parse_action(self._decode_json(response))
+        except ValueError as e:
+            logger.warning(f"Rejected action: {e}")
+            return None
     
     async def _observe(self, state: TaskState) -> Thought:
         """Observe the results of the last action."""
@@ -130,41 +455,73 @@ class AgentLoop:
         """Reflect on the current state and determine if the task is complete."""
         # TODO: Implement proper completion check
         prompt = self._create_reflection_prompt(state)
-        response = await self.model_client.generate(prompt)
+        response = await self._generate("reflect", prompt)
         return "complete" in response.lower()
     
+    def _format_action(self, action: Optional[Action]) -> str:
+        if action is None:
+            return "None"
+        return f"{action.plugin} {json.dumps(action.parameters, sort_keys=True, default=str)}"
+    
+    def _format_result(self, result: Optional[PluginResult], limit: int = 300) -> str:
+        if result is None:
+            return "None"
+        text = f"succeeded: {result.data}" if result.success else f"failed: {result.error}"
+        return text if len(text) <= limit else text[:limit - 3] + "..."
+    
+    def _state_block(self, state: TaskState) -> str:
+        """The per-step part of a prompt; everything before it is static."""
+        return (
+            f"Goal: {state.goal}\n"
+            f"Scratchpad:\n{state.scratchpad.render()}"
+            f"Last action: {self._format_action(state.last_action)}\n"
+            f"Last result: {self._format_result(state.last_result)}\n"
+        )
+    
     def _create_thinking_prompt(self, state: TaskState) -> str:
         """Create a prompt for the thinking phase."""
-        return f"""
-        Goal: {state.goal}
-        Available plugins: {self.available_plugins}
-        Previous thoughts: {state.thoughts}
-        Last action: {state.last_action}
-        Last result: {state.last_result}
-        
-        What should be done next? Consider:
-        1. Does this need planning?
-        2. Can we take a direct action?
-        3. Should we reflect on progress?
-        """
+        return f"""Available plugins: {self._plugins_json}
+What should be done next? Consider:
+1. Does this need planning?
+2. Can we take a direct action?
+3. Should we reflect on progress?
+
+{self._state_block(state)}"""
+    
+    def _create_step_prompt(self, state: TaskState) -> str:
+        """Create the prompt for a fused step."""
+        return f"""Available plugins: {self._plugins_json}
+Decide the next step and reply with only a JSON object:
+{{
+    "type": "action_selection" | "task_planning" | "reflection",
+    "thought": "<short reasoning>",
+    "action": {{"plugin": "<plugin name>", "parameters": {{...}}}} or null,
+    "script": [{{"plugin": "<plugin name>", "parameters": {{...}}}}, ...],
+    "subtasks": [{{"id": "a", "goal": "<subtask>", "depends_on": []}}, ...],
+    "completed": true | false
+}}
+Use "action_selection" with an action to act, "task_planning" with subtasks to
+break the goal down (list the ids each subtask depends_on; independent subtasks
+run in parallel), or "reflection" to assess progress. When several actions
+follow each other without needing to look at the screen in between (e.g.
+click a field, type, press enter), give them as a "script" instead of an
+action; it stops at the first failure. Set "completed" to true only when the
+goal has been achieved.
+
+{self._state_block(state)}"""
     
     def _create_action_prompt(self, state: TaskState) -> str:
         """Create a prompt for action selection."""
-        return f"""
-        Goal: {state.goal}
-        Available plugins: {self.available_plugins}
-        Current thought: {state.thoughts[-1] if state.thoughts else None}
-        
-        Select an action using available plugins.
-        """
+        return f"""Available plugins: {self._plugins_json}
+Select an action using available plugins.
+Reply with only a JSON object: {{"plugin": "<plugin name>", "parameters": {{...}}}}
+
+Goal: {state.goal}
+Current thought: {state.thoughts[-1].content if state.thoughts else None}
+"""
     
     def _create_reflection_prompt(self, state: TaskState) -> str:
         """Create a prompt for reflection."""
-        return f"""
-        Goal: {state.goal}
-        Thoughts so far: {state.thoughts}
-        Last action: {state.last_action}
-        Last result: {state.last_result}
-        
-        Is this task complete? Why or why not?
-        """ 
\ No newline at end of file
+        return f"""Is this task complete? Why or why not?
+
+{self._state_block(state)}"""
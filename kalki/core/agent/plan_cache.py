@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ...config.logging_setup import logger
+from ..intent_cache import Slots, normalize_command
+
+class PlanCache:
+    """Successful action trajectories of agent goals, keyed by normalised goal.
+
+    Numbers in the goal become slots, as in IntentCache, so "scroll down 5
+    times" and "scroll down 10 times" share a trajectory. Goals whose
+    numbers are repeated or absent from the actions are not cached.
+    Replay outcomes are counted and the hit rate is logged every
+    ``log_every`` lookups.
+    """
+
+    def __init__(self,
+                 path: Optional[str] = "plan_cache.json",
+                 capacity: int = 256,
+                 autosave_every: int = 5,
+                 log_every: int = 20):
+        self.path = Path(path) if path else None
+        self.capacity = capacity
+        self.autosave_every = autosave_every
+        self.log_every = log_every
+        self.hits = 0
+        self.misses = 0
+        self.replayed = 0
+        self.fallbacks = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate,
+                "replayed": self.replayed,
+                "fallbacks": self.fallbacks,
+            }
+
+    def get(self, goal: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached [{"plugin", "parameters"}, ...] for a goal, or None."""
+        key, numbers = normalize_command(goal)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["slots"] != len(numbers):
+                self.misses += 1
+                entry = None
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            total = self.hits + self.misses
+        if self.log_every and total % self.log_every == 0:
+            logger.info(f"Plan cache hit rate {self.hit_rate:.1%} over {total} goals")
+        if entry is None:
+            return None
+        return Slots.fill(entry["actions"], numbers)
+
+    def put(self, goal: str, actions: List[Dict[str, Any]]) -> None:
+        if not actions:
+            return
+        key, numbers = normalize_command(goal)
+        if len(set(numbers)) != len(numbers):
+            return
+        template = Slots.template(actions, numbers)
+        if Slots.used(template) != set(range(len(numbers))):
+            return
+        with self._lock:
+            self._entries[key] = {"actions": template, "slots": len(numbers)}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            save = self.autosave_every and self._unsaved >= self.autosave_every
+        if save:
+            self.save()
+
+    def record(self, replayed: bool) -> None:
+        """Count a replay that completed the goal, or one that fell back to the model."""
+        with self._lock:
+            if replayed:
+                self.replayed += 1
+            else:
+                self.fallbacks += 1
+
+    def invalidate(self, goal: str) -> bool:
+        key = normalize_command(goal)[0]
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            if removed:
+                self._unsaved += 1
+        if removed:
+            logger.info(f"Invalidated cached plan for '{key}'")
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._unsaved += 1
+
+    def _load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            for key, entry in entries[-self.capacity:]:
+                self._entries[key] = entry
+            logger.info(f"Loaded {len(self._entries)} cached plans from {self.path}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load plan cache {self.path}: {e}")
+
+    def save(self) -> None:
+        """Write the cache to disk, least recently used first."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+            self._unsaved = 0
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save plan cache {self.path}: {e}")
@@ -0,0 +1,222 @@
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from ...config.logging_setup import logger
+
+# Schema for a subtask graph; also used for the subtasks of a fused step
+SUBTASK_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "goal": {"type": "string"},
+        "depends_on": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["id", "goal"]
+}
+
+PLAN_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "subtasks": {"type": "array", "items": SUBTASK_SCHEMA}
+    },
+    "required": ["subtasks"]
+}
+
+@dataclass
+class Subtask:
+    id: str
+    goal: str
+    depends_on: List[str] = field(default_factory=list)
+
+class Budget:
+    """Step and wall-clock budget shared by a task and all of its subtasks.
+
+    ``steps`` and ``elapsed`` restore what a resumed task had already used.
+    """
+
+    def __init__(self, max_steps: int, time_limit: Optional[float] = None,
+                 steps: int = 0, elapsed: float = 0.0):
+        self.max_steps = max_steps
+        self.time_limit = time_limit
+        self.steps = steps
+        self._started = time.monotonic() - elapsed
+        self.deadline = self._started + time_limit if time_limit else None
+
+    @property
+    def elapsed(self) -> float:
+        """Wall-clock seconds used, including any before a resume."""
+        return time.monotonic() - self._started
+
+    @property
+    def remaining_steps(self) -> int:
+        return max(0, self.max_steps - self.steps)
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining_steps == 0 or self.expired
+
+    def consume(self) -> bool:
+        """Take one step from the budget; False if none is left."""
+        if self.exhausted:
+            return False
+        self.steps += 1
+        return True
+
+class ResourceLocks:
+    """Named locks so actions on a shared resource (e.g. the UI) never overlap."""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @asynccontextmanager
+    async def hold(self, resources: Iterable[str]):
+        # Sorted acquisition order rules out deadlock between multi-resource holders
+        locks = [self._locks.setdefault(name, asyncio.Lock()) for name in sorted(set(resources))]
+        for lock in locks:
+            await lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+class TaskGraph:
+    """A validated dependency graph of subtasks."""
+
+    def __init__(self, subtasks: Sequence[Subtask]):
+        self.subtasks: Dict[str, Subtask] = {}
+        for subtask in subtasks:
+            if subtask.id in self.subtasks:
+                raise ValueError(f"duplicate subtask id {subtask.id!r}")
+            self.subtasks[subtask.id] = subtask
+        for subtask in subtasks:
+            missing = [d for d in subtask.depends_on if d not in self.subtasks]
+            if missing:
+                raise ValueError(f"subtask {subtask.id!r} depends on unknown {missing}")
+        self.order = self._topological_order()
+
+    @classmethod
+    def sequential(cls, goals: Sequence[str]) -> "TaskGraph":
+        """A chain in which each goal waits for the previous one."""
+        return cls([
+            Subtask(str(i), goal, [str(i - 1)] if i else [])
+            for i, goal in enumerate(goals)
+        ])
+
+    @classmethod
+    def from_json(cls, items: Any) -> "TaskGraph":
+        """Build a graph from model output, raising ValueError if it is invalid.
+
+        A plain list of strings is treated as an ordered chain.
+        """
+        if not isinstance(items, list) or not items:
+            raise ValueError("subtasks must be a non-empty list")
+        if all(isinstance(item, str) for item in items):
+            goals = [item.strip() for item in items if item.strip()]
+            if not goals:
+                raise ValueError("subtasks are all blank")
+            return cls.sequential(goals)
+
+        subtasks = []
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError("each subtask must be an object")
+            subtask_id, goal = item.get('id'), item.get('goal')
+            depends_on = item.get('depends_on') or []
+            if not isinstance(subtask_id, (str, int)) or not str(subtask_id).strip():
+                raise ValueError("each subtask needs an id")
+            if not isinstance(goal, str) or not goal.strip():
+                raise ValueError(f"subtask {subtask_id!r} has no goal")
+            if not isinstance(depends_on, list):
+                raise ValueError(f"depends_on of {subtask_id!r} must be a list")
+            subtasks.append(Subtask(str(subtask_id), goal.strip(), [str(d) for d in depends_on]))
+        return cls(subtasks)
+
+    def _topological_order(self) -> List[str]:
+        remaining = {sid: set(s.depends_on) for sid, s in self.subtasks.items()}
+        order = []
+        while remaining:
+            ready = [sid for sid, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"dependency cycle among {sorted(remaining)}")
+            for sid in ready:
+                order.append(sid)
+                del remaining[sid]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    async def run(self,
+                  execute: Callable[[Subtask], Awaitable[Any]],
+                  succeeded: Callable[[Any], bool],
+                  max_parallel: int = 4,
+                  budget: Optional[Budget] = None) -> Dict[str, Any]:
+        """Run subtasks as soon as their dependencies succeed.
+
+        Independent branches run concurrently, at most ``max_parallel`` at a
+        time. A subtask whose dependency failed, or that would start after
+        the budget ran out, is skipped and maps to None.
+        """
+        results: Dict[str, Any] = {}
+        done = {sid: asyncio.Event() for sid in self.subtasks}
+        slots = asyncio.Semaphore(max(1, max_parallel))
+
+        async def run_one(subtask: Subtask) -> None:
+            try:
+                for dep in subtask.depends_on:
+                    await done[dep].wait()
+                if any(results.get(dep) is None or not succeeded(results[dep]) for dep in subtask.depends_on):
+                    logger.info(f"Skipping subtask {subtask.id}: a dependency did not succeed")
+                    results[subtask.id] = None
+                    return
+                async with slots:
+                    if budget is not None and budget.exhausted:
+                        logger.info(f"Skipping subtask {subtask.id}: budget exhausted")
+                        results[subtask.id] = None
+                        return
+                    results[subtask.id] = await execute(subtask)
+            except Exception as e:
+                logger.error(f"Subtask {subtask.id} failed: {e}")
+                results[subtask.id] = None
+            finally:
+                done[subtask.id].set()
+
+        await asyncio.gather(*(run_one(self.subtasks[sid]) for sid in self.order))
+        return results
+
+class TaskPlanner:
+    """Asks the model to break a goal into a dependency graph of subtasks."""
+
+    def __init__(self, model_client):
+        self.model_client = model_client
+
+    async def plan(self, goal: str, context: str = "") -> TaskGraph:
+        kwargs = {"format": PLAN_SCHEMA} if getattr(self.model_client, 'supports_format', False) else {}
+        response = await self.model_client.generate(self._create_plan_prompt(goal, context), **kwargs)
+        text = (response or "").strip()
+        start, end = text.find('{'), text.rfind('}') + 1
+        if start == -1 or end == 0:
+            raise ValueError("plan is not a JSON object")
+        try:
+            data = json.loads(text[start:end])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"malformed plan: {e}")
+        return TaskGraph.from_json(data.get('subtasks'))
+
+    def _create_plan_prompt(self, goal: str, context: str) -> str:
+        return f"""
+        Break down the task: {goal}
+        {context}
+
+        Reply with only a JSON object listing subtasks. Give each an id, a goal and the
+        ids it depends_on. Subtasks that do not depend on each other may run in parallel.
+        {{"subtasks": [{{"id": "a", "goal": "...", "depends_on": []}},
+                       {{"id": "b", "goal": "...", "depends_on": ["a"]}}]}}
+        """
@@ -0,0 +1,50 @@
+from collections import Counter
+from typing import List, Optional
+
+class Scratchpad:
+    """Compact, append-only rendering of an agent's thoughts for prompts.
+
+    Each thought is rendered to one short line when it is added, never
+    again. The last ``window`` lines are kept verbatim; older ones are
+    folded into a one-line summary (counts per kind plus the most recent
+    failure), so the prompt stays bounded however long the task runs.
+    """
+
+    def __init__(self, window: int = 8, max_line_chars: int = 300):
+        self.window = max(1, window)
+        self.max_line_chars = max_line_chars
+        self._lines: List[str] = []
+        self._folded = Counter()
+        self._last_failure: Optional[str] = None
+        self._text = ""
+
+    def __len__(self) -> int:
+        return sum(self._folded.values()) + len(self._lines)
+
+    def add(self, kind: str, content: str) -> None:
+        content = " ".join(str(content).split())
+        if len(content) > self.max_line_chars:
+            content = content[:self.max_line_chars - 3] + "..."
+        line = f"[{kind}] {content}"
+        self._lines.append(line)
+
+        if len(self._lines) <= self.window:
+            self._text += line + "\n"
+            return
+
+        evicted = self._lines.pop(0)
+        evicted_kind = evicted[1:evicted.index("]")]
+        self._folded[evicted_kind] += 1
+        if evicted_kind == "observation" and "failed" in evicted:
+            self._last_failure = evicted[len("[observation] "):]
+        self._text = self._summary() + "".join(l + "\n" for l in self._lines)
+
+    def _summary(self) -> str:
+        counts = ", ".join(f"{n} {kind}" for kind, n in sorted(self._folded.items()))
+        summary = f"[earlier] {counts}"
+        if self._last_failure:
+            summary += f"; last earlier failure: {self._last_failure}"
+        return summary + "\n"
+
+    def render(self) -> str:
+        return self._text or "(nothing yet)\n"
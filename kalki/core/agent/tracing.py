@@ -0,0 +1,232 @@
+"""Per-step tracing of agent runs.
+
+Every phase of an ``AgentLoop`` run (model calls, plugin executions,
+observations) is recorded as a span and appended to a JSONL trace file.
+Render a latency breakdown with::
+
+    python -m kalki.core.agent.tracing logs/agent_trace.jsonl [--run RUN_ID]
+"""
+import argparse
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Span kinds; the report attributes run time to model inference or actuation
+MODEL = "model"
+PLUGIN = "plugin"
+LOCAL = "local"
+CONTROL = "control"
+
+@dataclass
+class Span:
+    run_id: str
+    span_id: int
+    parent_id: Optional[int]
+    name: str
+    kind: str
+    start: float
+    duration: float = 0.0
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+# The span enclosing the current code; asyncio tasks inherit it on creation,
+# so concurrent subtasks nest under the span that started them
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("agent_span", default=None)
+
+class Tracer:
+    """Writes spans to ``path`` as JSON lines; a no-op when path is None."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @contextmanager
+    def span(self, name: str, kind: str = LOCAL, **attrs: Any) -> Iterator[Span]:
+        """Time the enclosed block; a span with no open parent starts a new run."""
+        parent = _current.get()
+        span = Span(
+            run_id=parent.run_id if parent else uuid.uuid4().hex[:12],
+            span_id=next(self._ids),
+            parent_id=parent.span_id if parent else None,
+            name=name,
+            kind=kind,
+            start=time.time(),
+            attrs=attrs
+        )
+        if not self.enabled:
+            yield span
+            return
+
+        token = _current.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current.reset(token)
+            self._write(span)
+
+    def _write(self, span: Span) -> None:
+        line = json.dumps(asdict(span), default=str) + "\n"
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning(f"Could not write agent trace {self.path}: {e}")
+
+def load_spans(path: str) -> List[Span]:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                spans.append(Span(**json.loads(line)))
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Skipping malformed trace line: {e}")
+    return spans
+
+def group_runs(spans: List[Span]) -> Dict[str, List[Span]]:
+    """Spans per run, runs in start order."""
+    runs: Dict[str, List[Span]] = defaultdict(list)
+    for span in sorted(spans, key=lambda s: s.start):
+        runs[span.run_id].append(span)
+    return dict(runs)
+
+def breakdown(spans: List[Span]) -> Dict[str, Any]:
+    """Latency breakdown of one run.
+
+    Model and plugin time are summed over their spans. Concurrent subtasks
+    can make the sums exceed the wall time; "other" is never negative.
+    """
+    roots = [s for s in spans if s.parent_id is None]
+    wall = sum(s.duration for s in roots)
+    by_kind: Dict[str, float] = defaultdict(float)
+    by_name: Dict[str, Dict[str, float]] = {}
+    for span in spans:
+        if span.kind in (MODEL, PLUGIN, LOCAL):
+            by_kind[span.kind] += span.duration
+        stats = by_name.setdefault(span.name, {"count": 0, "total": 0.0, "max": 0.0,
+                                               "prompt_chars": 0, "result_chars": 0})
+        stats["count"] += 1
+        stats["total"] += span.duration
+        stats["max"] = max(stats["max"], span.duration)
+        stats["prompt_chars"] += span.attrs.get("prompt_chars", 0)
+        stats["result_chars"] += span.attrs.get("result_chars", 0)
+
+    model, plugin = by_kind[MODEL], by_kind[PLUGIN]
+    return {
+        "goal": roots[0].attrs.get("goal") if roots else None,
+        "wall": wall,
+        "model": model,
+        "plugin": plugin,
+        "local": by_kind[LOCAL],
+        "other": max(0.0, wall - model - plugin - by_kind[LOCAL]),
+        "bound": "inference" if model >= plugin else "actuation",
+        "phases": by_name,
+    }
+
+def flame(spans: List[Span], width: int = 40) -> List[str]:
+    """Indented call tree of a run, identical paths merged, with bars."""
+    children: Dict[Optional[int], List[Span]] = defaultdict(list)
+    for span in spans:
+        children[span.parent_id].append(span)
+    totals: Dict[tuple, List[float]] = {}
+    # Merged paths below each path, in first-seen order
+    below: Dict[tuple, List[tuple]] = defaultdict(list)
+
+    def walk(parent_id: Optional[int], path: tuple) -> None:
+        for span in children.get(parent_id, []):
+            key = path + (span.name,)
+            if key not in totals:
+                totals[key] = [0, 0.0]
+                below[path].append(key)
+            totals[key][0] += 1
+            totals[key][1] += span.duration
+            walk(span.span_id, key)
+
+    walk(None, ())
+    wall = sum(totals[key][1] for key in below[()]) or 1.0
+    lines = []
+
+    def emit(path: tuple) -> None:
+        for key in below.get(path, []):
+            count, total = totals[key]
+            bar = "#" * max(1, round(min(1.0, total / wall) * width))
+            label = "  " * (len(key) - 1) + key[-1]
+            lines.append(f"{label:<36} {total * 1000:9.1f}ms x{count:<4} {bar}")
+            emit(key)
+
+    emit(())
+    return lines
+
+def render(spans: List[Span]) -> str:
+    """Human-readable report for one run."""
+    b = breakdown(spans)
+    wall = b["wall"] or 1.0
+    lines = [
+        f"Run {spans[0].run_id}: {b['goal']!r}",
+        f"  wall {b['wall'] * 1000:.1f}ms - {b['bound']}-bound",
+    ]
+    for kind in ("model", "plugin", "local", "other"):
+        lines.append(f"  {kind:<7} {b[kind] * 1000:9.1f}ms {b[kind] / wall:6.1%}")
+    lines.append("")
+    lines.append(f"  {'phase':<22} {'count':>5} {'total':>10} {'mean':>9} {'max':>9} {'prompt':>8} {'result':>8}")
+    for name, s in sorted(b["phases"].items(), key=lambda item: -item[1]["total"]):
+        lines.append(
+            f"  {name:<22} {s['count']:>5} {s['total'] * 1000:8.1f}ms "
+            f"{s['total'] / s['count'] * 1000:7.1f}ms {s['max'] * 1000:7.1f}ms "
+            f"{s['prompt_chars']:>8} {s['result_chars']:>8}"
+        )
+    lines.append("")
+    lines.extend("  " + line for line in flame(spans))
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency breakdown of traced agent runs")
+    parser.add_argument("trace", help="JSONL trace file written by the agent loop")
+    parser.add_argument("--run", help="Only report this run id")
+    parser.add_argument("--last", type=int, default=0, help="Only report the last N runs")
+    args = parser.parse_args()
+
+    runs = group_runs(load_spans(args.trace))
+    if args.run:
+        runs = {k: v for k, v in runs.items() if k == args.run}
+    selected = list(runs.values())[-args.last:] if args.last else list(runs.values())
+    if not selected:
+        print("No runs found")
+        return
+    print("\n\n".join(render(spans) for spans in selected))
+
+    if len(selected) > 1:
+        model = sum(breakdown(spans)["model"] for spans in selected)
+        plugin = sum(breakdown(spans)["plugin"] for spans in selected)
+        print(f"\n{len(selected)} runs: model {model * 1000:.1f}ms, plugin {plugin * 1000:.1f}ms "
+              f"- {'inference' if model >= plugin else 'actuation'}-bound overall")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class FastMatch:
+    """A command resolved by the grammar without a model call."""
+    action: str
+    parameters: Dict[str, Any]
+    confidence: float
+    rule: str
+
+KEY_ALIASES = {
+    "return": "enter", "esc": "escape", "del": "delete", "bksp": "backspace",
+    "control": "ctrl", "cmd": "command", "super": "win", "windows": "win",
+    "page up": "pageup", "page down": "pagedown", "spacebar": "space",
+    "arrow up": "up", "arrow down": "down", "arrow left": "left", "arrow right": "right",
+    "up arrow": "up", "down arrow": "down", "left arrow": "left", "right arrow": "right",
+}
+
+NAMED_KEYS = {
+    "enter", "escape", "tab", "space", "backspace", "delete", "insert",
+    "home", "end", "pageup", "pagedown", "up", "down", "left", "right",
+    "ctrl", "alt", "shift", "win", "command", "option", "capslock", "printscreen",
+} | {f"f{i}" for i in range(1, 13)}
+
+MODIFIERS = {"ctrl", "alt", "shift", "win", "command", "option"}
+
+# Words that signal a compound or descriptive request the grammar should not guess at
+AMBIGUOUS = re.compile(r"\b(and|then|after|before|if|when|which|that|the one|it)\b")
+
+# Where or how often to act ("into the search field", "on the dialog", "twice");
+# text containing these is usually a target description, not the text itself
+QUALIFIER = re.compile(r"\b(into|in|on|onto|to|from|with|at|inside|twice|thrice|times|again)\b")
+
+QUOTED = re.compile(r"\"[^\"]*\"|'[^']*'")
+
+ARTICLE = re.compile(r"^(?:a|an|my|new|some)\b", re.I)
+
+# A scheme, a www. prefix or a common TLD, so "notes.txt" is not mistaken for a site
+URL = re.compile(
+    r"^(?:https?://\S+|www\.\S+|[a-z0-9-]+(?:\.[a-z0-9-]+)*"
+    r"\.(?:com|org|net|io|ai|dev|app|edu|gov|co|me|info|uk|de|in)(?:/\S*)?)$",
+    re.I
+)
+
+POLITE = re.compile(r"^(?:(?:please|kalki|hey kalki|can you|could you)[\s,]+)+|[\s,]+please[.!]?$", re.I)
+
+def _strip_quotes(text: str) -> str:
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    return text
+
+def _normalize_key(name: str) -> Optional[str]:
+    name = KEY_ALIASES.get(name, name)
+    if name in NAMED_KEYS or len(name) == 1:
+        return name
+    return None
+
+def _url(target: str) -> Optional[str]:
+    if not URL.match(target):
+        return None
+    return target if "://" in target else f"https://{target}"
+
+# (action, parameters, confidence) produced by a grammar rule
+Resolved = Tuple[str, Dict[str, Any], float]
+
+class FastPathParser:
+    """Deterministic grammar for the commands people type all day.
+
+    ``match`` returns a FastMatch for unambiguous commands such as
+    "open firefox", "type hello", "press ctrl+c" or "click Submit", and None
+    for anything else, which should go to the model. Hit rates are counted
+    and logged every ``log_every`` lookups.
+    """
+
+    def __init__(self, log_every: int = 50):
+        self.log_every = log_every
+        self.hits = 0
+        self.misses = 0
+        self.rule_hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.rules: List[Tuple[str, Pattern, Callable[[re.Match], Optional[Resolved]]]] = [
+            ("type", re.compile(r"^type\s+(?:out\s+)?(?P<text>.+)$", re.I | re.S), self._type),
+            ("press", re.compile(r"^(?:press|hit|tap)\s+(?:the\s+)?(?P<keys>.+?)(?:\s+key)?$", re.I), self._press),
+            ("navigate", re.compile(r"^(?:go\s+to|navigate\s+to|visit|browse\s+to)\s+(?P<target>\S+)$", re.I), self._navigate),
+            ("open", re.compile(r"^(?:open|launch|start)\s+(?:up\s+)?(?P<target>.+)$", re.I), self._open),
+            ("click_at", re.compile(r"^click\s+(?:at\s+)?\(?(?P<x>\d+)\s*[, ]\s*(?P<y>\d+)\)?$", re.I), self._click_at),
+            ("click", re.compile(r"^(?P<verb>click|press)\s+(?:on\s+)?(?:the\s+)?(?P<text>.+?)(?:\s+button|\s+link)?$", re.I), self._click),
+        ]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate,
+                "rules": dict(self.rule_hits),
+            }
+
+    def match(self, text: str) -> Optional[FastMatch]:
+        """Resolve a command, or return None to fall through to the model."""
+        result = self._match(text)
+        with self._lock:
+            if result:
+                self.hits += 1
+                self.rule_hits[result.rule] = self.rule_hits.get(result.rule, 0) + 1
+            else:
+                self.misses += 1
+            total = self.hits + self.misses
+        if result:
+            logger.debug(f"Fast path '{result.rule}' resolved: {text!r}")
+        if self.log_every and total % self.log_every == 0:
+            logger.info(f"Fast path hit rate {self.hit_rate:.1%} over {total} commands")
+        return result
+
+    def _match(self, text: str) -> Optional[FastMatch]:
+        command = POLITE.sub("", text.strip())
+        if not command or "\n" in command:
+            return None
+        for name, pattern, build in self.rules:
+            m = pattern.match(command)
+            resolved = build(m) if m else None
+            if resolved:
+                action, parameters, confidence = resolved
+                return FastMatch(action, parameters, confidence, name)
+        return None
+
+    def _type(self, m: re.Match) -> Optional[Resolved]:
+        raw = m.group("text")
+        text = _strip_quotes(raw)
+        if text != raw:
+            # Quoted text is typed as is, whatever it says
+            return "type_text", {"text": text}, 0.98
+        # "type hello and press enter" is a compound command and "type hello
+        # into the search field" names a target, neither is text to type
+        unquoted = QUOTED.sub("", raw).lower()
+        if AMBIGUOUS.search(unquoted) or QUALIFIER.search(unquoted):
+            return None
+        words = len(text.split())
+        return "type_text", {"text": text}, 0.95 if words == 1 else 0.85 if words <= 3 else 0.7
+
+    def _press(self, m: re.Match) -> Optional[Resolved]:
+        raw = m.group("keys").lower().rstrip(".!")
+        parts = [p.strip() for p in raw.split("+") if p.strip()]
+        if len(parts) == 1 and " " in parts[0] and parts[0] not in KEY_ALIASES:
+            # "control c", "ctrl shift t"
+            parts = parts[0].split()
+        keys = [_normalize_key(p) for p in parts]
+        if not keys or None in keys:
+            return None
+        if len(keys) == 1:
+            return "press_key", {"key": keys[0]}, 0.99
+        if not all(k in MODIFIERS for k in keys[:-1]):
+            return None
+        return "hotkey", {"keys": keys}, 0.99
+
+    def _navigate(self, m: re.Match) -> Optional[Resolved]:
+        url = _url(m.group("target"))
+        return ("open_url", {"url": url}, 0.98) if url else None
+
+    def _open(self, m: re.Match) -> Optional[Resolved]:
+        target = _strip_quotes(m.group("target").strip().rstrip(".!"))
+        if target.lower().startswith("the "):
+            target = target[4:]
+        url = _url(target)
+        if url:
+            return "open_url", {"url": url}, 0.98
+        # "open firefox", "launch visual studio code"; anything wordier goes to the model
+        if len(target.split()) > 3 or AMBIGUOUS.search(target.lower()) or QUALIFIER.search(target.lower()) \
+                or ARTICLE.match(target):
+            return None
+        # Paths and file names ("notes.txt") are left to the model
+        if not re.fullmatch(r"[\w+-]+(?: [\w+-]+)*", target):
+            return None
+        return "open_application", {"name": target}, 0.95
+
+    def _click_at(self, m: re.Match) -> Optional[Resolved]:
+        return "click", {"x": int(m.group("x")), "y": int(m.group("y"))}, 0.99
+
+    def _click(self, m: re.Match) -> Optional[Resolved]:
+        text = _strip_quotes(m.group("text").rstrip(".!"))
+        if len(text.split()) > 4 or AMBIGUOUS.search(text.lower()) or QUALIFIER.search(text.lower()):
+            return None
+        # "press enter twice" is a key press the press rule could not resolve, never a click
+        if m.group("verb").lower() == "press" and _normalize_key(text.split()[0].lower()):
+            return None
+        return "click", {"text": text}, 0.9
@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+
+# Context keys that identify what the user is looking at, most specific first
+FINGERPRINT_KEYS = ("focused_app", "current_app", "app", "window")
+
+def normalize_command(text: str) -> Tuple[str, List[str]]:
+    """Lower-case, collapse whitespace and replace numbers with placeholders.
+
+    Returns the normalised text and the numbers it contained, in order, so
+    "Scroll down 5" and "scroll  down 10" share the key "scroll down <n>".
+    """
+    text = " ".join(text.lower().split()).rstrip(".!?")
+    numbers = NUMBER.findall(text)
+    return NUMBER.sub("<n>", text), numbers
+
+def context_fingerprint(context: Optional[Dict[str, Any]]) -> str:
+    """A coarse description of the screen state, e.g. the focused app."""
+    for key in FINGERPRINT_KEYS:
+        value = (context or {}).get(key)
+        if value:
+            return str(value).strip().lower()
+    return ""
+
+def _number(text: str) -> Any:
+    return float(text) if "." in text else int(text)
+
+def _strings(value: Any) -> List[str]:
+    if isinstance(value, dict):
+        return [s for v in value.values() for s in _strings(v)]
+    if isinstance(value, list):
+        return [s for v in value for s in _strings(v)]
+    return [value] if isinstance(value, str) else []
+
+class Slots:
+    """Converts parameters to and from templates with numbered number slots.
+
+    Used by IntentCache and by the agent's PlanCache for action trajectories.
+    """
+
+    MARK = "\x00{}\x00"
+    MARKED = re.compile(r"\x00(\d+)\x00")
+
+    @classmethod
+    def template(cls, value: Any, numbers: List[str]) -> Any:
+        if isinstance(value, dict):
+            return {k: cls.template(v, numbers) for k, v in value.items()}
+        if isinstance(value, list):
+            return [cls.template(v, numbers) for v in value]
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (int, float)):
+            for i, number in enumerate(numbers):
+                if value == _number(number):
+                    return {"$slot": i}
+            return value
+        if isinstance(value, str):
+            return NUMBER.sub(
+                lambda m: cls.MARK.format(numbers.index(m.group())) if m.group() in numbers else m.group(),
+                value
+            )
+        return value
+
+    @classmethod
+    def used(cls, value: Any) -> set:
+        """Slot numbers referenced by a template."""
+        if isinstance(value, dict):
+            if set(value) == {"$slot"}:
+                return {value["$slot"]}
+            return set().union(*(cls.used(v) for v in value.values()))
+        if isinstance(value, list):
+            return set().union(*(cls.used(v) for v in value))
+        if isinstance(value, str):
+            return {int(i) for i in cls.MARKED.findall(value)}
+        return set()
+
+    @classmethod
+    def fill(cls, value: Any, numbers: List[str]) -> Any:
+        if isinstance(value, dict):
+            if set(value) == {"$slot"}:
+                return _number(numbers[value["$slot"]])
+            return {k: cls.fill(v, numbers) for k, v in value.items()}
+        if isinstance(value, list):
+            return [cls.fill(v, numbers) for v in value]
+        if isinstance(value, str):
+            return cls.MARKED.sub(lambda m: numbers[int(m.group(1))], value)
+        return value
+
+class IntentCache:
+    """LRU cache of parsed intents keyed by normalised command and context.
+
+    Numbers in the command become slots: the cached parameters are stored
+    as a template and refilled with the numbers of the new command. A
+    command whose numbers are ambiguous (repeated) or do not all appear in
+    the parameters is not cached, since its key would be too broad. The key
+    ignores case and trailing punctuation, but parameters copied from the
+    command ("type Hello!") only match a command containing them verbatim,
+    so free text is never replayed with another command's spelling. Entries
+    are persisted to ``path`` as JSON and survive restarts.
+    """
+
+    def __init__(self,
+                 path: Optional[str] = "intent_cache.json",
+                 capacity: int = 1024,
+                 autosave_every: int = 20):
+        self.path = Path(path) if path else None
+        self.capacity = capacity
+        self.autosave_every = autosave_every
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._load()
+
+    @staticmethod
+    def _key(normalized: str, context: Optional[Dict[str, Any]]) -> str:
+        return f"{context_fingerprint(context)}|{normalized}"
+
+    @classmethod
+    def key(cls, text: str, context: Optional[Dict[str, Any]] = None) -> str:
+        return cls._key(normalize_command(text)[0], context)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, text: str, context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Cached {"action", "parameters", "confidence"} for a command, or None."""
+        normalized, numbers = normalize_command(text)
+        key = self._key(normalized, context)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["slots"] == len(numbers):
+                verbatim = " ".join(text.split())
+                if any(Slots.fill(copied, numbers) not in verbatim for copied in entry.get("copied", ())):
+                    entry = None
+            else:
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return {
+            "action": entry["action"],
+            "parameters": Slots.fill(entry["parameters"], numbers),
+            "confidence": entry["confidence"],
+        }
+
+    def put(self, text: str, context: Optional[Dict[str, Any]], action: str,
+            parameters: Dict[str, Any], confidence: float) -> None:
+        normalized, numbers = normalize_command(text)
+        if len(set(numbers)) != len(numbers):
+            return
+        template = Slots.template(parameters, numbers)
+        if Slots.used(template) != set(range(len(numbers))):
+            return
+        verbatim = " ".join(text.split()).lower()
+        entry = {
+            "action": action,
+            "parameters": template,
+            "confidence": confidence,
+            "slots": len(numbers),
+            # Free text taken from the command, which must match exactly on replay
+            "copied": [
+                Slots.template(s, numbers) for s in _strings(parameters)
+                if s.strip() and s.lower() in verbatim
+            ],
+        }
+        key = self._key(normalized, context)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            save = self.autosave_every and self._unsaved >= self.autosave_every
+        if save:
+            self.save()
+
+    def invalidate(self, text: str, context: Optional[Dict[str, Any]] = None) -> bool:
+        """Drop the entry for a command, e.g. after its cached intent failed."""
+        return self.invalidate_key(self.key(text, context))
+
+    def invalidate_key(self, key: str) -> bool:
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            if removed:
+                self._unsaved += 1
+        if removed:
+            logger.info(f"Invalidated cached intent for '{key}'")
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._unsaved += 1
+
+    def _load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            for key, entry in entries[-self.capacity:]:
+                self._entries[key] = entry
+            logger.info(f"Loaded {len(self._entries)} cached intents from {self.path}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load intent cache {self.path}: {str(e)}")
+
+    def save(self) -> None:
+        """Write the cache to disk, least recently used first."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+            self._unsaved = 0
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save intent cache {self.path}: {str(e)}")
@@ -1,8 +1,12 @@
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any
 import json
 from ..config.logging_setup import logger
-from ..models.model_handler import ModelHandler
+from ..integrations.jan_client import JanAIClient
+from .fast_path import FastPathParser
+from .intent_cache import IntentCache
+from .intent_schema import INTENT_SCHEMA
+from .json_stream import IncrementalJSONParser
 
 @dataclass
 class Intent:
@@ -12,21 +16,81 @@ class Intent:
     context: Dict[str, Any]
     confidence: float
     raw_text: str
+    partial: bool = False  # True until the model has finished the whole object
+    cached: bool = False  # Served from the intent cache
+    cache_key: Optional[str] = None  # Set for intents eligible for the cache
 
 class IntentParser:
-    def __init__(self, model_handler: ModelHandler):
+    def __init__(self,
+                 model_handler: JanAIClient,
+                 fast_path: Optional[FastPathParser] = None,
+                 cache: Optional[IntentCache] = None,
+                 cache_min_confidence: float = 0.8,
+                 fast_path_min_confidence: float = 0.8):
         self.model = model_handler
+        self.fast_path = fast_path or FastPathParser()
+        self.cache = cache if cache is not None else IntentCache()
+        self.cache_min_confidence = cache_min_confidence
+        self.fast_path_min_confidence = fast_path_min_confidence
+    
+    def _fast_intent(self, text: str, context: Dict[str, Any]) -> Optional[Intent]:
+        """Resolve common commands with the grammar, skipping the model."""
+        match = self.fast_path.match(text)
+        if match is None or match.confidence < self.fast_path_min_confidence:
+            return None
+        return Intent(
+            action=match.action,
+            parameters=match.parameters,
+            context=context,
+            confidence=match.confidence,
+            raw_text=text
+        )
+    
+    def _cached_intent(self, text: str, context: Dict[str, Any]) -> Optional[Intent]:
+        hit = self.cache.get(text, context)
+        if hit is None:
+            return None
+        return Intent(
+            action=hit['action'],
+            parameters=hit['parameters'],
+            context=context,
+            confidence=hit['confidence'],
+            raw_text=text,
+            cached=True,
+            cache_key=self.cache.key(text, context)
+        )
+    
+    def _remember(self, intent: Intent, context: Dict[str, Any]) -> Intent:
+        """Cache a confident model intent so the next identical command skips the model."""
+        if intent.action != "error" and intent.confidence >= self.cache_min_confidence:
+            self.cache.put(intent.raw_text, context, intent.action, intent.parameters, intent.confidence)
+            intent.cache_key = self.cache.key(intent.raw_text, context)
+        return intent
+    
+    def report_failure(self, intent: Intent) -> None:
+        """Forget a cached intent whose action failed, so it is re-parsed next time."""
+        if intent.cache_key:
+            self.cache.invalidate_key(intent.cache_key)
+    
+    def _generation_kwargs(self) -> Dict[str, Any]:
+        """Ask for schema-constrained output when the backend supports it."""
+        if getattr(self.model, 'supports_format', False):
+            return {"format": INTENT_SCHEMA}
+        return {}
         
     async def parse(self, text: str, context: Optional[Dict[str, Any]] = None) -> Intent:
         """Parse natural language into structured intent."""
         context = context or {}
+        fast = self._fast_intent(text, context) or self._cached_intent(text, context)
+        if fast:
+            return fast
         
         # Create a prompt that instructs the model to output structured JSON
         prompt = self._create_parsing_prompt(text, context)
         
         try:
             # Get model response
-            response = await self.model.generate(prompt)
+            response = await self.model.generate(prompt, **self._generation_kwargs())
             
             # Parse the response into structured format
             parsed = self._parse_response(response)
@@ -35,24 +99,81 @@ class IntentParser:
             if not self._validate_intent(parsed):
                 raise ValueError("Invalid intent structure")
             
-            return Intent(
-                action=parsed['action'],
-                parameters=parsed['parameters'],
-                context=parsed.get('context', {}),
-                confidence=parsed.get('confidence', 0.0),
-                raw_text=text
-            )
+            return self._remember(self._build_intent(parsed, text), context)
             
         except Exception as e:
             logger.error(f"Failed to parse intent: {e}")
             # Return a fallback intent for error handling
-            return Intent(
-                action="error",
-                parameters={"error": str(e)},
-                context=context,
-                confidence=0.0,
-                raw_text=text
-            )
+            return self._error_intent(e, text, context)
+    
+    async def parse_stream(self, text: str, context: Optional[Dict[str, Any]] = None) -> AsyncIterator[Intent]:
+        """Parse a command while the model is still generating.
+        
+        Yields a partial Intent as soon as ``action`` and ``parameters`` are
+        complete, so execution can begin, then the final Intent once the
+        whole object (including ``confidence``) has arrived. Falls back to
+        parse() for backends that cannot stream.
+        """
+        context = context or {}
+        fast = self._fast_intent(text, context) or self._cached_intent(text, context)
+        if fast:
+            yield fast
+            return
+        
+        stream_generate = getattr(self.model, 'stream_generate', None)
+        if stream_generate is None:
+            yield await self.parse(text, context)
+            return
+        
+        prompt = self._create_parsing_prompt(text, context)
+        parser = IncrementalJSONParser()
+        chunks: List[str] = []
+        ready_sent = False
+        stream = stream_generate(prompt, **self._generation_kwargs())
+        try:
+            try:
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    parser.feed(chunk)
+                    if parser.error or parser.done:
+                        break
+                    if not ready_sent and self._validate_intent(parser.members):
+                        ready_sent = True
+                        yield self._build_intent(parser.members, text, partial=True)
+            finally:
+                await stream.aclose()
+            
+            if parser.done and not parser.error:
+                parsed = parser.members
+            else:
+                # Unconstrained backends may still produce recoverable output
+                parsed = self._parse_response("".join(chunks))
+            if not self._validate_intent(parsed):
+                raise ValueError("Invalid intent structure")
+            yield self._remember(self._build_intent(parsed, text), context)
+        
+        except Exception as e:
+            logger.error(f"Failed to parse intent: {e}")
+            yield self._error_intent(e, text, context)
+    
+    def _build_intent(self, parsed: Dict[str, Any], text: str, partial: bool = False) -> Intent:
+        return Intent(
+            action=parsed['action'],
+            parameters=parsed['parameters'],
+            context=parsed.get('context', {}),
+            confidence=parsed.get('confidence', 0.0),
+            raw_text=text,
+            partial=partial
+        )
+    
+    def _error_intent(self, error: Exception, text: str, context: Dict[str, Any]) -> Intent:
+        return Intent(
+            action="error",
+            parameters={"error": str(error)},
+            context=context,
+            confidence=0.0,
+            raw_text=text
+        )
     
     def _create_parsing_prompt(self, text: str, context: Dict[str, Any]) -> str:
         """Create a prompt for the model to parse intent."""
@@ -97,7 +218,11 @@ class IntentParser:
     def _validate_intent(self, parsed: Dict[str, Any]) -> bool:
         """Validate that the parsed intent has all required fields."""
         required_fields = ['action', 'parameters']
-        return all(field in parsed for field in required_fields)
+        return (
+            all(field in parsed for field in required_fields)
+            and isinstance(parsed['action'], str)
+            and isinstance(parsed['parameters'], dict)
+        )
 
     async def refine_intent(self, intent: Intent) -> Intent:
         """Refine an intent with additional context or clarification."""
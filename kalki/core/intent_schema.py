@@ -0,0 +1,14 @@
+from typing import Any, Dict
+
+# JSON schema for constrained decoding. Property order matters: models emit
+# action and parameters first, so execution can start before the rest.
+INTENT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string"},
+        "parameters": {"type": "object"},
+        "context": {"type": "object"},
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1}
+    },
+    "required": ["action", "parameters", "confidence"]
+}
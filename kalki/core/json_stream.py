@@ -0,0 +1,116 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+class IncrementalJSONParser:
+    """Parse the first JSON object in a text stream member by member.
+
+    Feed chunks as they arrive; every top-level ``key: value`` pair is
+    returned as soon as its value is complete, long before the closing brace.
+    Text before the opening brace (and anything after the object) is ignored,
+    so chatty model output around the JSON is tolerated.
+    """
+
+    def __init__(self):
+        self.members: Dict[str, Any] = {}
+        self.done = False
+        self.error: Optional[str] = None
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+        self._expect = "key"  # "key", "colon", "value" or "comma"
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the members completed by it."""
+        if self.done or self.error:
+            return []
+        self._buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        buf = self._buffer
+
+        while self._pos < len(buf) and self.error is None:
+            ch = buf[self._pos]
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = self._decode(buf[self._token_start:self._pos + 1])
+                        self._token_start = None
+                        self._expect = "colon"
+                    elif self._depth == 1 and self._expect == "value":
+                        self._finish_value(buf, self._pos + 1, completed)
+                self._pos += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect in ("key", "value"):
+                    if self._token_start is None:
+                        self._token_start = self._pos
+            elif ch in "{[":
+                if self._depth == 1 and self._expect == "value" and self._token_start is None:
+                    self._token_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._expect == "value":
+                    # A nested object or array value just closed
+                    self._finish_value(buf, self._pos + 1, completed)
+                elif self._depth == 0:
+                    if self._expect == "value":
+                        self._finish_value(buf, self._pos, completed)
+                    self.done = True
+                    self._pos += 1
+                    break
+            elif self._depth == 1:
+                if ch == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif ch == ",":
+                    if self._expect == "value":
+                        self._finish_value(buf, self._pos, completed)
+                    self._expect = "key"
+                elif not ch.isspace() and self._expect == "value" and self._token_start is None:
+                    # Start of a number, true, false or null
+                    self._token_start = self._pos
+            self._pos += 1
+
+        return completed
+
+    def _finish_value(self, buf: str, end: int, completed: List[Tuple[str, Any]]) -> None:
+        if self._key is None or self._token_start is None:
+            return
+        raw = buf[self._token_start:end].strip()
+        value = self._decode(raw)
+        if self.error is None:
+            self.members[self._key] = value
+            completed.append((self._key, value))
+        self._key = None
+        self._token_start = None
+        self._expect = "comma"
+
+    def _decode(self, raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.error = f"Malformed JSON near {raw[:40]!r}: {e}"
+            return None
+
+    def has(self, *keys: str) -> bool:
+        """True once all the given top-level members have been parsed."""
+        return all(key in self.members for key in keys)
@@ -1,7 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from dataclasses import dataclass
+import asyncio
+import importlib
+import sys
+import threading
+import time
 from ...config.logging_setup import logger
+from .execution import DEFAULT_POLICY, PROCESS, ExecutionPolicy, PluginCancelled, PluginExecutor
+from .memo import MemoPolicy, ResultMemo, frame_clock
 
 @dataclass
 class PluginResult:
@@ -25,15 +32,73 @@ class PluginInterface(ABC):
         """Description of what the plugin does."""
         pass
     
+    @property
+    def resources(self) -> tuple:
+        """Shared resources the plugin uses, e.g. ("ui",).
+        
+        The agent never runs two actions holding the same resource at once.
+        """
+        return ()
+    
+    @property
+    def execution_policy(self) -> ExecutionPolicy:
+        """Where the plugin runs, its concurrency cap and timeout.
+        
+        Plugins that block (e.g. on pyautogui) should run in a thread so the
+        event loop stays responsive.
+        """
+        return DEFAULT_POLICY
+    
+    @property
+    def memoization(self) -> Optional[MemoPolicy]:
+        """Which calls are idempotent and may be served from the result memo.
+        
+        None (the default) means every call may have side effects.
+        """
+        return None
+    
     @abstractmethod
     async def execute(self, **kwargs) -> PluginResult:
         """Execute the plugin's main functionality."""
         pass
 
+@dataclass
+class PluginManifest:
+    """What the registry knows about a plugin before its module is imported."""
+    name: str
+    description: str
+    entry_point: str  # "module:Class"
+    resources: Tuple[str, ...] = ()
+    requires: Tuple[str, ...] = ()  # Modules that must be importable for the plugin to be offered
+    path: Optional[str] = None  # Directory to import the module from
+    execution: Optional[ExecutionPolicy] = None  # Overrides the plugin's own policy
+    
+    def load(self) -> PluginInterface:
+        """Import the module and instantiate the plugin class."""
+        if self.path and self.path not in sys.path:
+            sys.path.insert(0, self.path)
+        module_name, _, class_name = self.entry_point.partition(':')
+        module = importlib.import_module(module_name)
+        plugin = getattr(module, class_name)()
+        if plugin.name != self.name:
+            raise ValueError(f"{self.entry_point} provides plugin {plugin.name!r}, not {self.name!r}")
+        return plugin
+
 class PluginRegistry:
-    """Central registry for all available plugins."""
+    """Central registry for all available plugins.
+    
+    Plugins are either registered as instances or as manifests. A manifest
+    is listed like any other plugin, but its module is only imported on the
+    first call to execute_plugin (or get_plugin).
+    """
     _instance = None
     _plugins: Dict[str, PluginInterface] = {}
+    _manifests: Dict[str, PluginManifest] = {}
+    _load_errors: Dict[str, str] = {}
+    _load_lock = threading.Lock()
+    _policies: Dict[str, ExecutionPolicy] = {}
+    _executor = PluginExecutor()
+    _memo = ResultMemo()
     
     def __new__(cls):
         if cls._instance is None:
@@ -45,31 +110,164 @@ class PluginRegistry:
         if plugin.name in self._plugins:
             logger.warning(f"Plugin {plugin.name} already registered, overwriting")
         self._plugins[plugin.name] = plugin
+        self._manifests.pop(plugin.name, None)
         logger.info(f"Registered plugin: {plugin.name}")
     
+    def register_manifest(self, manifest: PluginManifest) -> None:
+        """Register a plugin without importing it."""
+        if manifest.name in self._plugins or manifest.name in self._manifests:
+            logger.warning(f"Plugin {manifest.name} already registered, overwriting")
+            self._plugins.pop(manifest.name, None)
+        self._manifests[manifest.name] = manifest
+        self._load_errors.pop(manifest.name, None)
+        if manifest.execution is not None:
+            self._policies[manifest.name] = manifest.execution
+        logger.info(f"Registered plugin: {manifest.name} (not loaded)")
+    
+    def is_loaded(self, name: str) -> bool:
+        return name in self._plugins
+    
     def get_plugin(self, name: str) -> Optional[PluginInterface]:
-        """Get a plugin by name."""
-        return self._plugins.get(name)
+        """Get a plugin by name, importing it if it has not been loaded yet."""
+        plugin = self._plugins.get(name)
+        if plugin is None and name in self._manifests:
+            plugin = self._load(name)
+        return plugin
+    
+    def _load(self, name: str) -> Optional[PluginInterface]:
+        with self._load_lock:
+            if name in self._plugins:
+                return self._plugins[name]
+            manifest = self._manifests.get(name)
+            if manifest is None or name in self._load_errors:
+                return None
+            started = time.perf_counter()
+            try:
+                plugin = manifest.load()
+            except Exception as e:
+                # Kept as a manifest so the error is reported on every call
+                logger.error(f"Could not load plugin {name} from {manifest.entry_point}: {e}")
+                self._load_errors[name] = f"Plugin {name} could not be loaded: {e}"
+                return None
+            self._plugins[name] = plugin
+            del self._manifests[name]
+            logger.info(f"Loaded plugin {name} in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return plugin
+    
+    def resources(self, name: str) -> Tuple[str, ...]:
+        """Resources a plugin uses, without loading it."""
+        if name in self._plugins:
+            return tuple(self._plugins[name].resources)
+        manifest = self._manifests.get(name)
+        return tuple(manifest.resources) if manifest else ()
+    
+    def set_policy(self, name: str, policy: ExecutionPolicy) -> None:
+        """Override how a plugin is executed."""
+        self._policies[name] = policy
+    
+    def policy(self, name: str) -> ExecutionPolicy:
+        if name in self._policies:
+            return self._policies[name]
+        plugin = self._plugins.get(name)
+        return plugin.execution_policy if plugin else DEFAULT_POLICY
+    
+    def cancel(self, name: str) -> int:
+        """Cancel every in-flight call of a plugin; they return a failed result."""
+        return self._executor.cancel(name)
+    
+    async def warm(self, name: str) -> bool:
+        """Load a plugin and, if it runs in worker processes, start them now
+        rather than on its first call."""
+        if name in self._manifests:
+            await asyncio.to_thread(self._load, name)
+        plugin = self._plugins.get(name)
+        policy = self.policy(name)
+        if plugin is None or policy.mode != PROCESS:
+            return False
+        await self._executor.worker_pool(plugin, policy).start()
+        return True
+    
+    def worker_health(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Per-worker health (pid, liveness, calls, failures, crashes, restarts)
+        of every plugin hosted in worker processes."""
+        return self._executor.worker_health()
+    
+    def shutdown(self) -> None:
+        """Stop the worker threads and processes."""
+        self._executor.shutdown()
     
     def list_plugins(self) -> List[Dict[str, str]]:
-        """List all registered plugins."""
-        return [
+        """List all registered plugins, loaded or not."""
+        plugins = [
             {"name": p.name, "description": p.description}
             for p in self._plugins.values()
         ]
+        plugins.extend(
+            {"name": m.name, "description": m.description}
+            for m in self._manifests.values()
+        )
+        return plugins
     
     async def execute_plugin(self, name: str, **kwargs) -> PluginResult:
-        """Execute a plugin by name."""
+        """Execute a plugin by name.
+        
+        Idempotent calls (see PluginInterface.memoization) are answered from
+        the result memo while the screen is unchanged. Any other call
+        advances the frame generation, since it may have changed the screen.
+        """
+        if name in self._manifests:
+            # First call: import off the event loop
+            await asyncio.to_thread(self._load, name)
         plugin = self.get_plugin(name)
         if not plugin:
             return PluginResult(
                 success=False,
                 data=None,
-                error=f"Plugin {name} not found"
+                error=self._load_errors.get(name, f"Plugin {name} not found")
             )
         
+        memo = plugin.memoization
+        if memo is None or not memo.applies(kwargs):
+            try:
+                return await self._execute(plugin, kwargs)
+            finally:
+                frame_clock.advance()
+        
+        key = memo.key(name, kwargs)
+        cached = self._memo.get(key)
+        if cached is not None:
+            logger.debug(f"Memoized result for {key}")
+            return cached
+        generation = frame_clock.generation
+        result = await self._execute(plugin, kwargs)
+        if result.success:
+            self._memo.put(key, result, memo, generation)
+        return result
+    
+    def memo_stats(self) -> Dict[str, Any]:
+        return self._memo.stats()
+    
+    def clear_memo(self) -> None:
+        self._memo.clear()
+    
+    async def _execute(self, plugin: PluginInterface, kwargs: Dict[str, Any]) -> PluginResult:
+        name = plugin.name
+        policy = self.policy(name)
         try:
-            return await plugin.execute(**kwargs)
+            return await self._executor.run(plugin, policy, kwargs)
+        except asyncio.TimeoutError:
+            logger.warning(f"Plugin {name} timed out after {policy.timeout}s")
+            return PluginResult(
+                success=False,
+                data=None,
+                error=f"Plugin {name} timed out after {policy.timeout}s"
+            )
+        except PluginCancelled as e:
+            return PluginResult(
+                success=False,
+                data=None,
+                error=str(e)
+            )
         except Exception as e:
             logger.error(f"Error executing plugin {name}: {e}")
             return PluginResult(
@@ -78,5 +276,40 @@ class PluginRegistry:
                 error=str(e)
             )
 
+    async def execute_batch(self, steps: Sequence[Tuple[str, Dict[str, Any]]]) -> List[PluginResult]:
+        """Run (plugin name, parameters) steps back to back, stopping at the first failure.
+        
+        Every step is validated, and its plugin loaded, before any of them
+        runs. An invalid batch returns a single failed result and does
+        nothing. Otherwise the results of the steps that ran are returned
+        in order; if one failed, it is the last.
+        """
+        for i, step in enumerate(steps, 1):
+            error = None
+            if not isinstance(step, (tuple, list)) or len(step) != 2:
+                error = "must be a (plugin, parameters) pair"
+            elif not isinstance(step[1], dict):
+                error = "parameters must be a dict"
+            elif step[0] not in self._plugins and step[0] not in self._manifests:
+                error = f"plugin {step[0]} not found"
+            if error:
+                return [PluginResult(success=False, data=None, error=f"Invalid step {i}: {error}")]
+        
+        for name in {name for name, _ in steps if name in self._manifests}:
+            if await asyncio.to_thread(self._load, name) is None:
+                return [PluginResult(
+                    success=False,
+                    data=None,
+                    error=self._load_errors.get(name, f"Plugin {name} not found")
+                )]
+        
+        results = []
+        for name, parameters in steps:
+            result = await self.execute_plugin(name, **parameters)
+            results.append(result)
+            if not result.success:
+                break
+        return results
+
 # Global plugin registry instance
 plugin_registry = PluginRegistry() 
\ No newline at end of file
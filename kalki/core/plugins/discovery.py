@@ -0,0 +1,99 @@
+import importlib.util
+import json
+from pathlib import Path
+from typing import List, Optional
+
+from ...config.logging_setup import logger
+from .base import PluginManifest, PluginRegistry
+from .execution import ExecutionPolicy
+
+# Plugins shipped with Kalki, registered without importing their modules
+BUILTIN_PLUGINS = [
+    PluginManifest(
+        name="ui_automation",
+        description="Provides UI automation capabilities like clicking, typing, and finding UI elements",
+        entry_point="kalki.core.plugins.ui_automation:UIAutomationPlugin",
+        resources=("ui",),
+        requires=("pyautogui",)
+    ),
+]
+
+MANIFEST_NAME = "plugin.json"
+
+def read_manifest(path: Path) -> PluginManifest:
+    """Parse a plugin manifest, raising ValueError if it is invalid.
+
+    A manifest is a JSON object with name, description and entry_point
+    ("module:Class"), and optionally resources, requires and execution
+    ({"mode", "max_concurrency", "timeout"}). The module is imported from
+    the manifest's directory.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"unreadable manifest: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("manifest must be a JSON object")
+    for key in ("name", "description", "entry_point"):
+        if not isinstance(data.get(key), str) or not data[key].strip():
+            raise ValueError(f"manifest needs a {key}")
+    if ":" not in data["entry_point"]:
+        raise ValueError("entry_point must look like 'module:Class'")
+    execution = data.get("execution")
+    if execution is not None and not isinstance(execution, dict):
+        raise ValueError("execution must be an object")
+    return PluginManifest(
+        name=data["name"],
+        description=data["description"],
+        entry_point=data["entry_point"],
+        resources=tuple(data.get("resources", ())),
+        requires=tuple(data.get("requires", ())),
+        path=str(path.parent.resolve()),
+        execution=ExecutionPolicy.from_dict(execution) if execution else None
+    )
+
+def discover_plugins(directory: str) -> List[PluginManifest]:
+    """Manifests in ``directory``: <dir>/<plugin>/plugin.json or <dir>/<plugin>.json."""
+    root = Path(directory)
+    if not root.is_dir():
+        return []
+    manifests = []
+    for path in sorted(list(root.glob(f"*/{MANIFEST_NAME}")) + list(root.glob("*.json"))):
+        try:
+            manifests.append(read_manifest(path))
+        except ValueError as e:
+            logger.warning(f"Skipping plugin manifest {path}: {e}")
+    return manifests
+
+def _missing_requirements(manifest: PluginManifest) -> List[str]:
+    # find_spec only looks the module up; nothing is imported
+    missing = []
+    for module in manifest.requires:
+        try:
+            if importlib.util.find_spec(module) is None:
+                missing.append(module)
+        except (ImportError, ValueError):
+            missing.append(module)
+    return missing
+
+def register_plugins(registry: PluginRegistry, directory: Optional[str] = None,
+                     builtins: bool = True) -> List[str]:
+    """Register built-in and discovered plugins lazily; returns their names.
+
+    Plugins whose required modules are not installed (e.g. pyautogui on a
+    headless server) are left out, so they are never offered to the model.
+    """
+    manifests = list(BUILTIN_PLUGINS) if builtins else []
+    if directory:
+        manifests.extend(discover_plugins(directory))
+
+    registered = []
+    for manifest in manifests:
+        missing = _missing_requirements(manifest)
+        if missing:
+            logger.info(f"Plugin {manifest.name} not available, missing: {', '.join(missing)}")
+            continue
+        registry.register_manifest(manifest)
+        registered.append(manifest.name)
+    return registered
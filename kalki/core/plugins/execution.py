@@ -0,0 +1,161 @@
+import asyncio
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from ...config.logging_setup import logger
+from .workers import WorkerPool
+
+INLINE = "inline"    # On the event loop; for plugins that only await
+THREAD = "thread"    # In a worker thread; for plugins that block (pyautogui, file I/O)
+PROCESS = "process"  # In warm worker processes; for CPU-bound or crash-prone plugins
+MODES = (INLINE, THREAD, PROCESS)
+
+@dataclass(frozen=True)
+class ExecutionPolicy:
+    """Where a plugin runs, how many calls may overlap and how long one may take."""
+    mode: str = INLINE
+    max_concurrency: Optional[int] = None
+    timeout: Optional[float] = None
+    workers: int = 1  # Worker processes kept warm in process mode
+
+    def __post_init__(self):
+        if self.mode not in MODES:
+            raise ValueError(f"execution mode must be one of {MODES}, not {self.mode!r}")
+        if self.max_concurrency is not None and self.max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if self.workers < 1:
+            raise ValueError("workers must be at least 1")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExecutionPolicy":
+        return cls(
+            mode=data.get("mode", INLINE),
+            max_concurrency=data.get("max_concurrency"),
+            timeout=data.get("timeout"),
+            workers=data.get("workers", 1)
+        )
+
+DEFAULT_POLICY = ExecutionPolicy()
+
+class PluginCancelled(Exception):
+    """A call was cancelled through PluginExecutor.cancel()."""
+
+_worker = threading.local()
+
+def _execute_detached(plugin, kwargs: Dict[str, Any]):
+    """Run plugin.execute to completion on the calling thread's own event loop."""
+    loop = getattr(_worker, "loop", None)
+    if loop is None:
+        loop = _worker.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(plugin.execute(**kwargs))
+
+class PluginExecutor:
+    """Runs plugin calls according to their ExecutionPolicy.
+
+    Thread calls keep their concurrency slot until the thread has actually
+    finished, even if the caller timed out or was cancelled, since a
+    blocking call cannot be interrupted once it has started; a call still
+    queued for a thread is dropped. Process calls go to a WorkerPool per
+    plugin, whose worker is killed and restarted when its call is
+    abandoned.
+    """
+
+    def __init__(self, max_threads: int = 8):
+        self.max_threads = max_threads
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._workers: Dict[str, WorkerPool] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, Set[asyncio.Task]] = defaultdict(set)
+        self._cancelled: Set[asyncio.Task] = set()
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(self.max_threads, thread_name_prefix="plugin")
+        return self._threads
+
+    def worker_pool(self, plugin, policy: ExecutionPolicy) -> WorkerPool:
+        """The warm worker processes of a plugin, created on first use."""
+        if plugin.name not in self._workers:
+            self._workers[plugin.name] = WorkerPool(plugin, policy.workers)
+        return self._workers[plugin.name]
+
+    def worker_health(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {name: pool.health() for name, pool in self._workers.items()}
+
+    def _semaphore(self, name: str, policy: ExecutionPolicy) -> Optional[asyncio.Semaphore]:
+        if policy.max_concurrency is None:
+            return None
+        if name not in self._slots:
+            self._slots[name] = asyncio.Semaphore(policy.max_concurrency)
+        return self._slots[name]
+
+    def inflight(self, name: str) -> int:
+        return len(self._inflight.get(name, ()))
+
+    async def run(self, plugin, policy: ExecutionPolicy, kwargs: Dict[str, Any]):
+        """Execute one call; raises asyncio.TimeoutError past the policy's timeout
+        and PluginCancelled if cancel() stopped it."""
+        task = asyncio.ensure_future(self._run(plugin, policy, kwargs))
+        calls = self._inflight[plugin.name]
+        calls.add(task)
+        try:
+            return await asyncio.wait_for(task, policy.timeout)
+        except asyncio.CancelledError:
+            if task in self._cancelled:
+                raise PluginCancelled(f"Plugin {plugin.name} call cancelled")
+            raise
+        finally:
+            calls.discard(task)
+            self._cancelled.discard(task)
+
+    async def _run(self, plugin, policy: ExecutionPolicy, kwargs: Dict[str, Any]):
+        slots = self._semaphore(plugin.name, policy)
+        if slots is not None:
+            await slots.acquire()
+        if policy.mode in (INLINE, PROCESS):
+            try:
+                if policy.mode == PROCESS:
+                    return await self.worker_pool(plugin, policy).call(kwargs)
+                return await plugin.execute(**kwargs)
+            finally:
+                if slots is not None:
+                    slots.release()
+
+        try:
+            future = self._thread_pool().submit(_execute_detached, plugin, kwargs)
+        except BaseException:
+            if slots is not None:
+                slots.release()
+            raise
+        if slots is not None:
+            loop = asyncio.get_running_loop()
+            future.add_done_callback(lambda _: _release_threadsafe(loop, slots))
+        return await asyncio.wrap_future(future)
+
+    def cancel(self, name: str) -> int:
+        """Cancel every in-flight call of a plugin; returns how many."""
+        calls = list(self._inflight.get(name, ()))
+        for task in calls:
+            self._cancelled.add(task)
+            task.cancel()
+        if calls:
+            logger.info(f"Cancelled {len(calls)} call(s) of plugin {name}")
+        return len(calls)
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._threads is not None:
+            self._threads.shutdown(wait=wait, cancel_futures=True)
+            self._threads = None
+        for pool in self._workers.values():
+            pool.stop()
+        self._workers.clear()
+
+def _release_threadsafe(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore) -> None:
+    try:
+        loop.call_soon_threadsafe(slots.release)
+    except RuntimeError:
+        # The loop is already closed; nobody is waiting for the slot
+        pass
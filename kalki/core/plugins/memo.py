@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Tuple
+
+class FrameClock:
+    """Generation counter of the screen contents.
+
+    Anything that may change what is on screen (a click, typing, a macro
+    step) advances it; results memoized under an older generation are
+    then stale.
+    """
+
+    def __init__(self):
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def advance(self) -> int:
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+frame_clock = FrameClock()
+
+@dataclass(frozen=True)
+class MemoPolicy:
+    """Declares which calls of a plugin are idempotent and how long their
+    results stay valid.
+
+    ``inputs`` are the parameters that make up the cache key. Only calls
+    whose "action" parameter is in ``actions`` are memoized (all calls when
+    it is None); every other call is assumed to change the screen. A result
+    expires when the frame generation advances (if ``per_frame``) or after
+    ``ttl`` seconds, whichever comes first. Failed results are not kept,
+    so an element that is not there yet is looked for again.
+    """
+    inputs: Tuple[str, ...]
+    actions: Optional[Tuple[str, ...]] = None
+    ttl: Optional[float] = None
+    per_frame: bool = True
+
+    def applies(self, kwargs: Dict[str, Any]) -> bool:
+        return self.actions is None or kwargs.get("action") in self.actions
+
+    def key(self, plugin: str, kwargs: Dict[str, Any]) -> str:
+        inputs = {name: kwargs.get(name) for name in self.inputs}
+        return plugin + ":" + json.dumps(inputs, sort_keys=True, default=repr)
+
+class ResultMemo:
+    """LRU store of memoized PluginResults."""
+
+    def __init__(self, capacity: int = 256, clock: FrameClock = frame_clock):
+        self.capacity = capacity
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # key -> (result, frame generation, expiry or None, per_frame)
+        self._entries: "OrderedDict[str, Tuple[Any, int, Optional[float], bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, generation, expires, per_frame = entry
+                if (per_frame and generation != self.clock.generation) or \
+                        (expires is not None and time.monotonic() >= expires):
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # A copy, so callers cannot alter the cached result itself
+        return replace(result)
+
+    def put(self, key: str, result: Any, policy: MemoPolicy, generation: int) -> None:
+        """Store a result computed while the screen was at ``generation``."""
+        expires = time.monotonic() + policy.ttl if policy.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (result, generation, expires, policy.per_frame)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,6 +1,8 @@
 import pyautogui
 from typing import Optional, Tuple
 from .base import PluginInterface, PluginResult
+from .execution import THREAD, ExecutionPolicy
+from .memo import MemoPolicy
 
 class UIAutomationPlugin(PluginInterface):
     @property
@@ -11,6 +13,21 @@ class UIAutomationPlugin(PluginInterface):
     def description(self) -> str:
         return "Provides UI automation capabilities like clicking, typing, and finding UI elements"
     
+    @property
+    def resources(self) -> tuple:
+        # Mouse and keyboard are shared by every UI action
+        return ("ui",)
+    
+    @property
+    def execution_policy(self) -> ExecutionPolicy:
+        # pyautogui blocks, for seconds when typing long text
+        return ExecutionPolicy(THREAD, max_concurrency=1, timeout=60.0)
+    
+    @property
+    def memoization(self) -> MemoPolicy:
+        # Finding an image does not change the screen; clicking and typing do
+        return MemoPolicy(inputs=("action", "image"), actions=("find",), ttl=5.0)
+    
     async def execute(self, **kwargs) -> PluginResult:
         """Execute UI automation actions."""
         action = kwargs.get('action')
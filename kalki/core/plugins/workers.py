@@ -0,0 +1,217 @@
+import asyncio
+import multiprocessing
+import os
+import pickle
+import time
+from typing import Any, Dict, List, Optional
+
+from ...config.logging_setup import logger
+
+# Frames are pickled tuples sent with send_bytes:
+#   parent -> worker  (call_id, kwargs), or (None, None) to stop
+#   worker -> parent  (call_id, result, error), first ("ready", pid, None)
+PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+class WorkerCrashed(RuntimeError):
+    """The worker process died while handling a call."""
+
+def _worker_main(conn, plugin_bytes: bytes) -> None:
+    """Entry point of a worker process: load the plugin once, then serve calls."""
+    plugin = pickle.loads(plugin_bytes)
+    loop = asyncio.new_event_loop()
+    conn.send_bytes(pickle.dumps(("ready", os.getpid(), None), PROTOCOL))
+    while True:
+        try:
+            call_id, kwargs = pickle.loads(conn.recv_bytes())
+        except (EOFError, OSError):
+            break
+        if call_id is None:
+            break
+        try:
+            frame = (call_id, loop.run_until_complete(plugin.execute(**kwargs)), None)
+            payload = pickle.dumps(frame, PROTOCOL)
+        except Exception as e:
+            payload = pickle.dumps((call_id, None, f"{type(e).__name__}: {e}"), PROTOCOL)
+        conn.send_bytes(payload)
+    conn.close()
+
+class Worker:
+    """Parent-side handle of one warm worker process; serves one call at a time."""
+
+    def __init__(self, name: str, index: int, plugin_bytes: bytes, context, start_timeout: float):
+        self.name = f"plugin-{name}-{index}"
+        self._plugin_bytes = plugin_bytes
+        self._context = context
+        self.start_timeout = start_timeout
+        self._process = None
+        self._conn = None
+        self._ids = 0
+        self.calls = 0
+        self.failures = 0
+        self.crashes = 0
+        self.restarts = -1  # The first start is not a restart
+        self.busy = False
+        self.last_latency: Optional[float] = None
+        self.started: Optional[float] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process else None
+
+    def start(self) -> None:
+        """(Re)start the process and wait until the plugin is loaded. Blocking."""
+        self.kill()
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child, self._plugin_bytes), name=self.name, daemon=True
+        )
+        process.start()
+        child.close()
+        if not parent.poll(self.start_timeout):
+            process.kill()
+            raise WorkerCrashed(f"{self.name} did not start within {self.start_timeout}s")
+        try:
+            tag, pid, _ = pickle.loads(parent.recv_bytes())
+        except (EOFError, OSError):
+            raise WorkerCrashed(f"{self.name} exited during startup (code {process.exitcode})")
+        self._process, self._conn = process, parent
+        self.restarts += 1
+        self.started = time.time()
+        logger.info(f"Started plugin worker {self.name} (pid {pid})")
+
+    def call(self, kwargs: Dict[str, Any]) -> Any:
+        """Send one call and wait for its result. Blocking; run it in a thread."""
+        conn, process = self._conn, self._process
+        self._ids += 1
+        call_id = self._ids
+        started = time.perf_counter()
+        self.busy = True
+        self.calls += 1
+        try:
+            conn.send_bytes(pickle.dumps((call_id, kwargs), PROTOCOL))
+            reply_id, result, error = pickle.loads(conn.recv_bytes())
+        except (EOFError, OSError, pickle.PickleError) as e:
+            self.failures += 1
+            if process.is_alive():
+                raise
+            self.crashes += 1
+            process.join(1)
+            raise WorkerCrashed(f"{self.name} (pid {process.pid}) exited with code {process.exitcode}") from e
+        finally:
+            self.busy = False
+            self.last_latency = time.perf_counter() - started
+        if reply_id != call_id:
+            self.failures += 1
+            raise WorkerCrashed(f"{self.name} answered call {reply_id}, expected {call_id}")
+        if error is not None:
+            self.failures += 1
+            raise RuntimeError(error)
+        return result
+
+    def kill(self) -> None:
+        """Stop the process at once, e.g. to abandon a call that timed out."""
+        if self._process is not None and self._process.is_alive():
+            self._process.kill()
+            self._process.join(1)
+        if self._conn is not None:
+            self._conn.close()
+        self._process = self._conn = None
+
+    def stop(self, timeout: float = 1.0) -> None:
+        if self._conn is not None and self.alive:
+            try:
+                self._conn.send_bytes(pickle.dumps((None, None), PROTOCOL))
+                self._process.join(timeout)
+            except OSError:
+                pass
+        self.kill()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "worker": self.name,
+            "pid": self.pid,
+            "alive": self.alive,
+            "busy": self.busy,
+            "calls": self.calls,
+            "failures": self.failures,
+            "crashes": self.crashes,
+            "restarts": max(0, self.restarts),
+            "last_latency": self.last_latency,
+            "uptime": time.time() - self.started if self.started and self.alive else None,
+        }
+
+class WorkerPool:
+    """Warm worker processes hosting one plugin.
+
+    Each call goes to an idle worker. A worker that crashes is restarted in
+    the background; the call it was handling fails rather than being
+    retried, since plugin actions may have side effects. A cancelled or
+    timed-out call kills its worker, so, unlike a thread, the work really
+    stops.
+    """
+
+    def __init__(self, plugin, size: int = 1, start_method: str = "spawn",
+                 start_timeout: float = 30.0):
+        self.plugin_name = plugin.name
+        plugin_bytes = pickle.dumps(plugin, PROTOCOL)
+        context = multiprocessing.get_context(start_method)
+        self.workers = [
+            Worker(plugin.name, i, plugin_bytes, context, start_timeout)
+            for i in range(max(1, size))
+        ]
+        self._idle: Optional[asyncio.Queue] = None
+
+    async def start(self) -> None:
+        """Start every worker; called automatically by the first call."""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        results = await asyncio.gather(
+            *(asyncio.to_thread(w.start) for w in self.workers), return_exceptions=True
+        )
+        for worker, result in zip(self.workers, results):
+            if isinstance(result, Exception):
+                logger.error(f"Could not start {worker.name}: {result}")
+            self._idle.put_nowait(worker)
+
+    async def call(self, kwargs: Dict[str, Any]) -> Any:
+        await self.start()
+        worker = await self._idle.get()
+        try:
+            if not worker.alive:
+                await asyncio.to_thread(worker.start)
+            return await asyncio.to_thread(worker.call, kwargs)
+        except asyncio.CancelledError:
+            logger.warning(f"Killing {worker.name} to abandon a cancelled call")
+            worker.kill()
+            raise
+        except WorkerCrashed as e:
+            logger.error(f"Plugin worker crashed: {e}")
+            raise
+        finally:
+            self._release(worker)
+
+    def _release(self, worker: Worker) -> None:
+        if worker.alive:
+            self._idle.put_nowait(worker)
+            return
+
+        async def restart():
+            try:
+                await asyncio.to_thread(worker.start)
+            except Exception as e:
+                logger.error(f"Could not restart {worker.name}: {e}")
+            self._idle.put_nowait(worker)
+
+        asyncio.ensure_future(restart())
+
+    def health(self) -> List[Dict[str, Any]]:
+        return [worker.health() for worker in self.workers]
+
+    def stop(self) -> None:
+        for worker in self.workers:
+            worker.stop()
@@ -0,0 +1,164 @@
+import asyncio
+import collections
+import weakref
+from dataclasses import dataclass
+from typing import (
+    Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+)
+
+@dataclass
+class BatchItem:
+    """Outcome of one prompt in a batch."""
+    index: int
+    prompt: str
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+# Backend -> the smallest limit any client asked for
+_backend_limits: Dict[str, int] = {}
+
+# Event loop -> backend -> gate. asyncio primitives belong to the loop that
+# first waits on them, so each loop gets its own.
+_backend_gates: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+class _Gate:
+    """Counts in-flight requests to one backend on one event loop."""
+
+    def __init__(self):
+        self.active = 0
+        self.waiters: "collections.deque[asyncio.Future]" = collections.deque()
+
+    def wake(self) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+class BackendLimit:
+    """Caps in-flight requests to a backend; use as an async context manager.
+
+    Every client of the same backend on the same event loop shares one
+    count, so single calls and concurrent batches share the cap. Clients
+    asking for different limits get the smallest of them. The count is
+    looked up when a request starts, so a BackendLimit can be created
+    outside a running loop and reused across asyncio.run() calls.
+    """
+
+    def __init__(self, backend: str, limit: int):
+        self.backend = backend
+        self.limit = max(1, limit)
+        _backend_limits[backend] = min(self.limit, _backend_limits.get(backend, self.limit))
+
+    @property
+    def effective_limit(self) -> int:
+        return _backend_limits[self.backend]
+
+    def _gate(self) -> _Gate:
+        gates = _backend_gates.setdefault(asyncio.get_running_loop(), {})
+        if self.backend not in gates:
+            gates[self.backend] = _Gate()
+        return gates[self.backend]
+
+    async def __aenter__(self) -> None:
+        gate = self._gate()
+        while gate.active >= self.effective_limit:
+            waiter = asyncio.get_running_loop().create_future()
+            gate.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken just as we were cancelled; pass the free slot on
+                    gate.wake()
+                raise
+        gate.active += 1
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        gate = self._gate()
+        gate.active -= 1
+        gate.wake()
+        return False
+
+def backend_limit(backend: str, limit: int) -> BackendLimit:
+    """The shared cap on in-flight requests to a backend."""
+    return BackendLimit(backend, limit)
+
+class BatchRun:
+    """A batch of prompts run concurrently under a backend limit.
+
+    Iterate with ``async for`` to receive BatchItems as they complete, or
+    ``await`` it for the full list in input order. A failing prompt yields an
+    item with ``error`` set instead of aborting the rest of the batch.
+
+    If ``context`` is given it is entered once around the whole batch (e.g. a
+    shared HTTP session) and its value is passed to ``fn`` before the prompt.
+    """
+
+    def __init__(self,
+                 fn: Callable[..., Awaitable[Any]],
+                 prompts: Sequence[str],
+                 limit: AsyncContextManager,
+                 is_failure: Optional[Callable[[Any], bool]] = None,
+                 context: Optional[Callable[[], AsyncContextManager]] = None):
+        self.fn = fn
+        self.prompts = list(prompts)
+        self.limit = limit
+        self.is_failure = is_failure
+        self.context = context
+        self._started = False
+
+    async def _run_one(self, fn: Callable[[str], Awaitable[Any]], index: int, prompt: str) -> BatchItem:
+        async with self.limit:
+            try:
+                result = await fn(prompt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return BatchItem(index, prompt, error=str(e) or type(e).__name__)
+        if self.is_failure is not None and self.is_failure(result):
+            return BatchItem(index, prompt, result=result, error="No response from model")
+        return BatchItem(index, prompt, result=result)
+
+    async def __aiter__(self) -> AsyncIterator[BatchItem]:
+        if self._started:
+            raise RuntimeError("A BatchRun can only be consumed once")
+        self._started = True
+
+        if self.context is None:
+            async for item in self._run(self.fn):
+                yield item
+            return
+
+        async with self.context() as value:
+            async def fn(prompt: str) -> Any:
+                return await self.fn(value, prompt)
+            async for item in self._run(fn):
+                yield item
+
+    async def _run(self, fn: Callable[[str], Awaitable[Any]]) -> AsyncIterator[BatchItem]:
+        tasks = [
+            asyncio.ensure_future(self._run_one(fn, index, prompt))
+            for index, prompt in enumerate(self.prompts)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early or was cancelled
+            for task in tasks:
+                task.cancel()
+
+    async def collect(self) -> List[BatchItem]:
+        """Run the whole batch and return items in input order."""
+        items: List[Optional[BatchItem]] = [None] * len(self.prompts)
+        async for item in self:
+            items[item.index] = item
+        return items
+
+    def __await__(self):
+        return self.collect().__await__()
@@ -0,0 +1,316 @@
+import logging
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitOpenError(ConnectionError):
+    """Raised when a request is refused because the backend is known to be down."""
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker for a single backend.
+
+    CLOSED lets every request through. After failure_threshold consecutive
+    failures (or a failed health probe) the circuit OPENs and requests are
+    refused. Once reset_timeout has passed, or a background probe succeeds,
+    it goes HALF_OPEN and lets a single trial request through; the outcome
+    of that trial closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent to the backend now."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.HALF_OPEN:
+                # A trial that never reported back is presumed lost
+                now = time.monotonic()
+                if not self._trial_in_flight or now - self._trial_started >= self.reset_timeout:
+                    self._trial_in_flight = True
+                    self._trial_started = now
+                    return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CircuitState.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def release(self) -> None:
+        """Give back a half-open trial whose request was abandoned."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def trip(self) -> None:
+        """Open the circuit immediately."""
+        with self._lock:
+            self._open()
+
+    def half_open(self) -> None:
+        """Allow a trial request on an open circuit without waiting for the timeout."""
+        with self._lock:
+            if self._state == CircuitState.OPEN:
+                self._state = CircuitState.HALF_OPEN
+                self._trial_in_flight = False
+
+    def _open(self) -> None:
+        if self._state != CircuitState.OPEN:
+            logger.warning(f"Circuit {self.name} opened")
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+@dataclass
+class BackendStatus:
+    """Cached result of the most recent health probe."""
+    healthy: Optional[bool] = None
+    checked_at: Optional[float] = None
+    latency: Optional[float] = None
+    error: Optional[str] = None
+
+@dataclass
+class _Backend:
+    breaker: CircuitBreaker
+    probe: Optional[Callable[[], bool]]
+    interval: float
+    status: BackendStatus
+    probe_threshold: int
+    failed_probes: int = 0
+
+def http_probe(url: str,
+               timeout: float = 5.0,
+               headers: Optional[Dict[str, str]] = None) -> Callable[[], bool]:
+    """Build a probe that succeeds when url answers with a 2xx status."""
+    def probe() -> bool:
+        request = urllib.request.Request(url, headers=headers or {})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return 200 <= response.status < 300
+    return probe
+
+class HealthMonitor:
+    """Shared registry of backend circuit breakers with background probing.
+
+    Probes run on a single daemon thread, so registering a backend never
+    blocks on the network. The thread starts on the first request (or an
+    explicit start()), not at registration, so merely importing a client
+    does not begin probing. Request paths consult the cached state through
+    allow_request() and report outcomes with record_success()/record_failure().
+    """
+
+    def __init__(self, default_interval: float = 15.0):
+        self.default_interval = default_interval
+        self._backends: Dict[str, _Backend] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = False
+
+    def register(self,
+                 name: str,
+                 probe: Optional[Callable[[], bool]] = None,
+                 interval: Optional[float] = None,
+                 failure_threshold: int = 3,
+                 reset_timeout: float = 30.0,
+                 probe_failures: int = 3) -> CircuitBreaker:
+        """Register a backend (idempotent) and return its circuit breaker.
+
+        probe should return True when the backend is healthy; returning False
+        or raising counts as unhealthy. Only probe_failures consecutive
+        unhealthy probes open the circuit, so a server that is still loading
+        at startup is not cut off by a single failed check.
+        """
+        with self._lock:
+            backend = self._backends.get(name)
+            if backend is None:
+                backend = _Backend(
+                    breaker=CircuitBreaker(name, failure_threshold, reset_timeout),
+                    probe=probe,
+                    interval=interval or self.default_interval,
+                    status=BackendStatus(),
+                    probe_threshold=max(1, probe_failures)
+                )
+                self._backends[name] = backend
+            elif backend.probe is None and probe is not None:
+                backend.probe = probe
+
+        if backend.probe is not None and self._started:
+            # Already probing: check the new backend right away
+            self._ensure_thread()
+            self._wakeup.set()
+        return backend.breaker
+
+    def start(self) -> None:
+        """Start background probing now rather than on the first request."""
+        self._started = True
+        if any(backend.probe is not None for backend in list(self._backends.values())):
+            self._ensure_thread()
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        """Get the breaker for a backend, registering it without a probe if needed."""
+        backend = self._backends.get(name)
+        return backend.breaker if backend else self.register(name)
+
+    def status(self, name: str) -> BackendStatus:
+        backend = self._backends.get(name)
+        return backend.status if backend else BackendStatus()
+
+    def allow_request(self, name: str) -> bool:
+        if not self._started:
+            self.start()
+        return self.breaker(name).allow_request()
+
+    def check(self, name: str) -> None:
+        """Raise CircuitOpenError if requests to the backend should be skipped."""
+        if not self.allow_request(name):
+            status = self.status(name)
+            detail = f": {status.error}" if status.error else ""
+            raise CircuitOpenError(f"Backend {name} is unavailable{detail}")
+
+    def record_success(self, name: str) -> None:
+        self.breaker(name).record_success()
+
+    def record_failure(self, name: str) -> None:
+        self.breaker(name).record_failure()
+
+    def release(self, name: str) -> None:
+        self.breaker(name).release()
+
+    def is_healthy(self, name: str, max_age: Optional[float] = None) -> bool:
+        """Return the cached health of a backend.
+
+        Probes synchronously only when there is no cached result yet or it is
+        older than max_age seconds.
+        """
+        backend = self._backends.get(name)
+        if backend is None:
+            return False
+        status = backend.status
+        stale = status.checked_at is None or (
+            max_age is not None and time.monotonic() - status.checked_at > max_age
+        )
+        if stale and backend.probe is not None:
+            self._probe(name, backend)
+        return bool(backend.status.healthy) and backend.breaker.state != CircuitState.OPEN
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Current state of every registered backend."""
+        return {
+            name: {
+                "state": backend.breaker.state.value,
+                "healthy": backend.status.healthy,
+                "latency": backend.status.latency,
+                "error": backend.status.error,
+            }
+            for name, backend in list(self._backends.items())
+        }
+
+    def stop(self) -> None:
+        """Stop the background probe thread."""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _probe(self, name: str, backend: _Backend) -> bool:
+        started = time.monotonic()
+        error = None
+        try:
+            healthy = bool(backend.probe())
+        except Exception as e:
+            healthy = False
+            error = str(e)
+
+        backend.status = BackendStatus(
+            healthy=healthy,
+            checked_at=time.monotonic(),
+            latency=time.monotonic() - started,
+            error=error
+        )
+        if healthy:
+            backend.failed_probes = 0
+            backend.breaker.half_open()
+            return True
+
+        backend.failed_probes += 1
+        detail = f": {error}" if error else ""
+        if backend.failed_probes < backend.probe_threshold:
+            logger.info(
+                f"Health probe for {name} failed "
+                f"({backend.failed_probes}/{backend.probe_threshold}){detail}"
+            )
+            return False
+        if backend.breaker.state != CircuitState.OPEN:
+            logger.warning(f"Health probe for {name} failed {backend.failed_probes} times{detail}")
+        backend.breaker.trip()
+        return False
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="kalki-health", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            now = time.monotonic()
+            next_due = None
+            for name, backend in list(self._backends.items()):
+                if backend.probe is None:
+                    continue
+                checked_at = backend.status.checked_at
+                due = (checked_at or 0.0) + backend.interval
+                if checked_at is None or due <= now:
+                    self._probe(name, backend)
+                    due = time.monotonic() + backend.interval
+                next_due = due if next_due is None else min(next_due, due)
+
+            timeout = None if next_due is None else max(0.0, next_due - time.monotonic())
+            self._wakeup.wait(timeout)
+
+# Global health monitor instance shared by all model clients
+health_monitor = HealthMonitor()
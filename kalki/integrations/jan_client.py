@@ -1,81 +1,332 @@
 import aiohttp
+import asyncio
 import json
-from typing import Optional, Dict, Any
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, AsyncIterator, Sequence
 from ..config.config_manager import config
 from ..config.logging_setup import logger
-from functools import lru_cache
+from .batch import BatchRun, backend_limit
+from .health import CircuitOpenError, health_monitor, http_probe
+from .latency import LatencyHistogram
+from .metrics import metrics
 
 class JanAIClient:
-    def __init__(self):
-        self.base_url = "http://localhost:1337"  # Jan.ai default API endpoint
+    # The Ollama-style generate endpoint accepts a JSON schema as `format`
+    supports_format = True
+    
+    def __init__(self, base_url: str = "http://localhost:1337"):  # Jan.ai default API endpoint
+        self.base_url = base_url.rstrip('/')
         self.model = config.get('model.default', 'mistral')
         self.fallback_model = config.get('model.fallback', 'llama2')
         
         # Model parameters
         self.temperature = config.get('model.temperature', 0.7)
         self.max_tokens = config.get('model.max_tokens', 2000)
+        self.max_concurrency = config.get('model.max_concurrency', 4)
+        
+        # Hedging: start the fallback when the primary is slower than usual
+        self.hedge_enabled = config.get('model.hedging.enabled', True)
+        self.hedge_percentile = config.get('model.hedging.percentile', 95)
+        self.hedge_min_samples = config.get('model.hedging.min_samples', 20)
+        self.hedge_initial_delay = config.get('model.hedging.initial_delay', 2.0)
+        
+        # Per-model time-to-first-byte and total latency histograms
+        self.first_byte_latency: Dict[str, LatencyHistogram] = {}
+        self.total_latency: Dict[str, LatencyHistogram] = {}
+        
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_size = 100
+        
+        # Shared by single calls, streams and batches against this server
+        self._limit = backend_limit(f"jan:{self.base_url}", self.max_concurrency)
+        
+        # One circuit per model so a dead primary is skipped, not retried
+        for model in {self.model, self.fallback_model}:
+            health_monitor.register(
+                self._backend(model), http_probe(f"{self.base_url}/api/models")
+            )
+    
+    def _backend(self, model: str) -> str:
+        return f"jan:{self.base_url}/{model}"
+    
+    def _cache_key(self, prompt: str, kwargs: Dict[str, Any]) -> str:
+        return json.dumps([prompt, kwargs], sort_keys=True, default=str)
     
-    @lru_cache(maxsize=100)
-    async def _cached_generate(self, prompt: str, **kwargs) -> str:
-        """Cached version of text generation."""
-        return await self.generate(prompt, use_cache=False, **kwargs)
+    def _histogram(self, table: Dict[str, LatencyHistogram], model: str) -> LatencyHistogram:
+        if model not in table:
+            table[model] = LatencyHistogram()
+        return table[model]
+    
+    def hedge_delay(self, model: Optional[str] = None) -> Optional[float]:
+        """Seconds to wait for a first byte from model before hedging.
+        
+        Uses the configured percentile of the time-to-first-byte of completed
+        requests once enough samples exist, otherwise the configured initial
+        delay. Returns None when hedging is disabled or there is no distinct
+        fallback.
+        """
+        if not self.hedge_enabled or not self.fallback_model or self.fallback_model == self.model:
+            return None
+        histogram = self.first_byte_latency.get(model or self.model)
+        if histogram is None or histogram.count < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        return histogram.percentile(self.hedge_percentile)
     
     async def generate(self, prompt: str, use_cache: bool = True, **kwargs) -> str:
         """Generate text using Jan.ai API."""
-        if use_cache:
-            return await self._cached_generate(prompt, **kwargs)
+        key = self._cache_key(prompt, kwargs)
+        if use_cache and key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
         
-        async with aiohttp.ClientSession() as session:
+        async with self._limit, aiohttp.ClientSession() as session:
             try:
-                # Try primary model first
-                response = await self._generate_with_model(
-                    session, self.model, prompt, **kwargs
-                )
-                if response:
-                    return response
-                
-                # Fall back to secondary model if primary fails
-                logger.warning(f"Primary model {self.model} failed, trying fallback {self.fallback_model}")
-                response = await self._generate_with_model(
-                    session, self.fallback_model, prompt, **kwargs
-                )
-                if response:
-                    return response
-                
-                raise Exception("Both primary and fallback models failed")
-                
+                return await self._generate(session, prompt, use_cache, **kwargs)
             except Exception as e:
                 logger.error(f"Error generating text: {e}")
                 return ""
     
+    def generate_many(
+        self,
+        prompts: Sequence[str],
+        use_cache: bool = True,
+        **kwargs
+    ) -> BatchRun:
+        """Generate text for many prompts over one shared session.
+        
+        At most model.max_concurrency requests are in flight against this
+        server, shared with any other batch. ``async for`` over the result
+        yields BatchItems as they complete; awaiting it returns them in input
+        order. Failed prompts carry an error instead of failing the batch.
+        """
+        async def run(session: aiohttp.ClientSession, prompt: str) -> str:
+            return await self._generate(session, prompt, use_cache, **kwargs)
+        
+        return BatchRun(run, prompts, self._limit, context=aiohttp.ClientSession)
+    
+    async def _generate(
+        self,
+        session: aiohttp.ClientSession,
+        prompt: str,
+        use_cache: bool,
+        **kwargs
+    ) -> str:
+        """Generate text over an existing session, raising on failure."""
+        key = self._cache_key(prompt, kwargs)
+        if use_cache and key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        
+        response = await self._generate_hedged(session, prompt, **kwargs)
+        if not response:
+            raise Exception("Both primary and fallback models failed")
+        
+        if use_cache:
+            self._cache[key] = response
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return response
+    
+    async def _generate_hedged(
+        self,
+        session: aiohttp.ClientSession,
+        prompt: str,
+        **kwargs
+    ) -> Optional[str]:
+        """Run the primary model, racing the fallback if it is slow to respond."""
+        first_byte = asyncio.Event()
+        primary = asyncio.create_task(self._generate_with_model(
+            session, self.model, prompt, first_byte=first_byte, **kwargs
+        ))
+        
+        delay = self.hedge_delay()
+        if delay is not None:
+            waiter = asyncio.create_task(first_byte.wait())
+            try:
+                done, _ = await asyncio.wait(
+                    {primary, waiter},
+                    timeout=delay,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+            except asyncio.CancelledError:
+                # asyncio.wait does not cancel what it waits on
+                primary.cancel()
+                raise
+            finally:
+                waiter.cancel()
+            
+            if not done:
+                logger.info(
+                    f"Primary model {self.model} silent after {delay:.2f}s, "
+                    f"hedging with fallback {self.fallback_model}"
+                )
+                fallback = asyncio.create_task(self._generate_with_model(
+                    session, self.fallback_model, prompt, **kwargs
+                ))
+                return await self._first_successful(primary, fallback)
+        
+        response = await primary
+        if response:
+            return response
+        
+        # Fall back to secondary model if primary fails
+        logger.warning(f"Primary model {self.model} failed, trying fallback {self.fallback_model}")
+        return await self._generate_with_model(
+            session, self.fallback_model, prompt, **kwargs
+        )
+    
+    async def _first_successful(self, *tasks: "asyncio.Task") -> Optional[str]:
+        """Return the first non-empty task result and cancel the others."""
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result():
+                        return task.result()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+    
     async def _generate_with_model(
         self,
         session: aiohttp.ClientSession,
         model: str,
         prompt: str,
+        first_byte: Optional[asyncio.Event] = None,
         **kwargs
     ) -> Optional[str]:
         """Generate text with a specific model."""
         url = f"{self.base_url}/api/generate"
+        backend = self._backend(model)
+        if not health_monitor.allow_request(backend):
+            logger.debug(f"Skipping model {model}: circuit open")
+            return None
         
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "temperature": kwargs.get('temperature', self.temperature),
-            "max_tokens": kwargs.get('max_tokens', self.max_tokens),
-        }
+        payload = self._payload(model, prompt, stream=False, **kwargs)
         
+        started = time.monotonic()
+        timer = metrics.track("jan", model)
         try:
             async with session.post(url, json=payload) as response:
+                first_byte_after = time.monotonic() - started
+                timer.mark_first_token()
+                if first_byte is not None:
+                    first_byte.set()
+                
                 if response.status == 200:
                     data = await response.json()
+                    # Only completed requests feed the hedge delay; a request cut
+                    # off by hedging would drag the percentile down, and with it
+                    # the delay, so the client would hedge more and more
+                    self._histogram(self.first_byte_latency, model).observe(first_byte_after)
+                    self._histogram(self.total_latency, model).observe(time.monotonic() - started)
+                    health_monitor.record_success(backend)
+                    timer.record_usage(data)
                     return data.get('text', '')
                 else:
                     logger.error(f"Error from Jan.ai API: {response.status}")
+                    health_monitor.record_failure(backend)
+                    timer.fail()
                     return None
+        except asyncio.CancelledError:
+            # Hedged away or abandoned by the caller
+            health_monitor.release(backend)
+            timer.cancel()
+            raise
         except Exception as e:
             logger.error(f"Error calling Jan.ai API: {e}")
+            health_monitor.record_failure(backend)
+            timer.fail()
             return None
+        finally:
+            timer.finish()
+    
+    def _payload(self, model: str, prompt: str, stream: bool, **kwargs) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "temperature": kwargs.get('temperature', self.temperature),
+            "max_tokens": kwargs.get('max_tokens', self.max_tokens),
+            "stream": stream,
+        }
+        # JSON schema (or "json") constraining the output, where supported
+        if kwargs.get('format'):
+            payload["format"] = kwargs['format']
+        return payload
+    
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream generated text chunks as they arrive.
+        
+        The fallback model is only tried if the primary fails before
+        producing any output. Pass format=<JSON schema> to constrain output.
+        """
+        async with self._limit, aiohttp.ClientSession() as session:
+            for model in (self.model, self.fallback_model):
+                received = False
+                try:
+                    async for chunk in self._stream_with_model(session, model, prompt, **kwargs):
+                        received = True
+                        yield chunk
+                    if received:
+                        return
+                except Exception as e:
+                    if received:
+                        raise
+                    logger.warning(f"Streaming from model {model} failed: {e}")
+            raise Exception("Both primary and fallback models failed")
+    
+    async def _stream_with_model(
+        self,
+        session: aiohttp.ClientSession,
+        model: str,
+        prompt: str,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Stream text chunks from a specific model (newline-delimited JSON)."""
+        backend = self._backend(model)
+        if not health_monitor.allow_request(backend):
+            raise CircuitOpenError(f"Model {model} is unavailable")
+        
+        url = f"{self.base_url}/api/generate"
+        payload = self._payload(model, prompt, stream=True, **kwargs)
+        timer = metrics.track("jan", model)
+        outcome_recorded = False
+        try:
+            async with session.post(url, json=payload) as response:
+                if response.status != 200:
+                    raise Exception(f"Error from Jan.ai API: {response.status}")
+                
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    chunk = data.get('response') or data.get('text') or ''
+                    if chunk:
+                        timer.mark_first_token()
+                        yield chunk
+                    if data.get('done'):
+                        timer.record_usage(data)
+                        break
+            
+            health_monitor.record_success(backend)
+            outcome_recorded = True
+        except (GeneratorExit, asyncio.CancelledError):
+            # Consumer stopped reading early; that says nothing about the model
+            timer.cancel()
+            raise
+        except Exception:
+            timer.fail()
+            health_monitor.record_failure(backend)
+            outcome_recorded = True
+            raise
+        finally:
+            if not outcome_recorded:
+                health_monitor.release(backend)
+            timer.finish()
     
     async def list_models(self) -> Dict[str, Any]:
         """List available models from Jan.ai."""
@@ -94,7 +345,7 @@ class JanAIClient:
     
     def clear_cache(self):
         """Clear the generation cache."""
-        self._cached_generate.cache_clear()
+        self._cache.clear()
 
 # Global Jan.ai client instance
 jan_client = JanAIClient() 
\ No newline at end of file
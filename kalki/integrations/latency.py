@@ -0,0 +1,93 @@
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the histogram buckets, roughly exponential from
+# 5ms to 2 minutes. The last bucket is open-ended.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75,
+    1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0, 120.0,
+)
+
+class LatencyHistogram:
+    """Thread-safe bucketed latency histogram with percentile estimates."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Record a single latency sample."""
+        seconds = max(0.0, float(seconds))
+        index = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += seconds
+            self._max = max(self._max, seconds)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def total(self) -> float:
+        return self._sum
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Estimate the p-th percentile (0-100), or None without samples."""
+        with self._lock:
+            counts = list(self._counts)
+            count = self._count
+            maximum = self._max
+        if count == 0:
+            return None
+
+        rank = max(0.0, min(100.0, p)) / 100.0 * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count == 0:
+                continue
+            if seen + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else maximum
+                upper = min(upper, maximum)
+                # Interpolate linearly inside the bucket
+                fraction = (rank - seen) / bucket_count
+                return lower + (max(upper, lower) - lower) * fraction
+            seen += bucket_count
+        return maximum
+
+    def cumulative_buckets(self) -> List[Tuple[float, int]]:
+        """Return (upper bound, cumulative count) pairs, ending with +Inf."""
+        with self._lock:
+            counts = list(self._counts)
+        result = []
+        running = 0
+        for bound, bucket_count in zip(self.bounds + (float("inf"),), counts):
+            running += bucket_count
+            result.append((bound, running))
+        return result
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """Summary of the histogram suitable for logging or JSON."""
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "max": self._max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+    def reset(self) -> None:
+        """Drop all recorded samples."""
+        with self._lock:
+            self._counts = [0] * (len(self.bounds) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
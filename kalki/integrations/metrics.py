@@ -0,0 +1,270 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from .latency import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+ERROR = "error"
+CANCELLED = "cancelled"
+OUTCOMES = (OK, ERROR, CANCELLED)
+
+class ModelMetrics:
+    """Counters and latency histograms for one (client, model) pair."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.first_token = LatencyHistogram()
+        self.latency = LatencyHistogram()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "in_flight": self.in_flight,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "time_to_first_token": self.first_token.snapshot(),
+            "latency": self.latency.snapshot(),
+        }
+
+class RequestTimer:
+    """Measures a single model call; use as a (async) context manager.
+
+    An exception escaping the block counts as an error, a cancellation as
+    cancelled. Paths that report failure by return value should call fail()
+    explicitly. finish() is idempotent, so it can sit in a ``finally``.
+    """
+
+    def __init__(self, registry: "MetricsRegistry", client: str, model: str):
+        self.registry = registry
+        self.client = client
+        self.model = model
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.outcome = OK
+        self.finished = False
+
+    def mark_first_token(self, elapsed: Optional[float] = None) -> None:
+        """Record time to first token, now or as elapsed seconds since start."""
+        if self.first_token_at is None:
+            self.first_token_at = self.started + elapsed if elapsed is not None else time.monotonic()
+
+    def record_usage(self, payload: Optional[Dict[str, Any]]) -> None:
+        """Pull token counts out of an OpenAI- or Ollama-style response body."""
+        if not isinstance(payload, dict):
+            return
+        usage = payload.get("usage")
+        if isinstance(usage, dict) and usage:
+            self.prompt_tokens = int(usage.get("prompt_tokens") or 0)
+            self.completion_tokens = int(usage.get("completion_tokens") or 0)
+        elif "prompt_eval_count" in payload or "eval_count" in payload:
+            self.prompt_tokens = int(payload.get("prompt_eval_count") or 0)
+            self.completion_tokens = int(payload.get("eval_count") or 0)
+
+    @property
+    def failed(self) -> bool:
+        return self.outcome == ERROR
+
+    def fail(self) -> None:
+        self.outcome = ERROR
+
+    def cancel(self) -> None:
+        """The caller abandoned the call, e.g. it lost a hedge."""
+        self.outcome = CANCELLED
+
+    def finish(self) -> None:
+        if not self.finished:
+            self.finished = True
+            self.registry._record(self)
+
+    def __enter__(self) -> "RequestTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None:
+            if issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+                self.cancel()
+            else:
+                self.fail()
+        self.finish()
+        return False
+
+    async def __aenter__(self) -> "RequestTimer":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+
+class MetricsRegistry:
+    """Process-wide store of LLM call metrics."""
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], ModelMetrics] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def track(self, client: str, model: str) -> RequestTimer:
+        """Start timing a model call made by client (e.g. "ollama", "jan")."""
+        with self._lock:
+            self._stats(client, model).in_flight += 1
+        return RequestTimer(self, client, model)
+
+    def _stats(self, client: str, model: str) -> ModelMetrics:
+        stats = self._models.get((client, model))
+        if stats is None:
+            stats = self._models[(client, model)] = ModelMetrics()
+        return stats
+
+    def _record(self, timer: RequestTimer) -> None:
+        with self._lock:
+            stats = self._stats(timer.client, timer.model)
+            stats.in_flight -= 1
+            stats.requests += 1
+            if timer.outcome == ERROR:
+                stats.errors += 1
+            elif timer.outcome == CANCELLED:
+                stats.cancelled += 1
+            stats.prompt_tokens += timer.prompt_tokens
+            stats.completion_tokens += timer.completion_tokens
+        if timer.outcome == CANCELLED:
+            # A truncated duration would bias the latency percentiles down
+            return
+        if timer.first_token_at is not None:
+            stats.first_token.observe(timer.first_token_at - timer.started)
+        stats.latency.observe(time.monotonic() - timer.started)
+
+    def get(self, client: str, model: str) -> Optional[ModelMetrics]:
+        return self._models.get((client, model))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Metrics for every model, keyed by "client/model"."""
+        with self._lock:
+            items = list(self._models.items())
+        return {f"{client}/{model}": stats.to_dict() for (client, model), stats in items}
+
+    def dump_json(self, path: Optional[str] = None) -> str:
+        """Return the snapshot as JSON, also writing it to path if given."""
+        text = json.dumps(self.snapshot(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self._models.items())
+
+        lines = [
+            "# HELP kalki_llm_requests_in_flight Model requests in flight",
+            "# TYPE kalki_llm_requests_in_flight gauge",
+        ]
+        for (client, model), stats in items:
+            lines.append(f"kalki_llm_requests_in_flight{{{_labels(client, model)}}} {stats.in_flight}")
+
+        lines.append("# HELP kalki_llm_requests_total Finished model requests by outcome")
+        lines.append("# TYPE kalki_llm_requests_total counter")
+        for (client, model), stats in items:
+            by_outcome = {
+                OK: stats.requests - stats.errors - stats.cancelled,
+                ERROR: stats.errors,
+                CANCELLED: stats.cancelled,
+            }
+            for outcome in OUTCOMES:
+                labels = f'{_labels(client, model)},outcome="{outcome}"'
+                lines.append(f"kalki_llm_requests_total{{{labels}}} {by_outcome[outcome]}")
+
+        counters = [
+            ("kalki_llm_errors_total", "Failed model requests", "errors"),
+            ("kalki_llm_prompt_tokens_total", "Prompt tokens sent", "prompt_tokens"),
+            ("kalki_llm_completion_tokens_total", "Completion tokens received", "completion_tokens"),
+        ]
+        for name, help_text, attr in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (client, model), stats in items:
+                lines.append(f"{name}{{{_labels(client, model)}}} {getattr(stats, attr)}")
+
+        histograms = [
+            ("kalki_llm_time_to_first_token_seconds", "Time to first token", "first_token"),
+            ("kalki_llm_request_duration_seconds", "Total request latency", "latency"),
+        ]
+        for name, help_text, attr in histograms:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (client, model), stats in items:
+                histogram: LatencyHistogram = getattr(stats, attr)
+                labels = _labels(client, model)
+                for bound, count in histogram.cumulative_buckets():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9464) -> ThreadingHTTPServer:
+        """Serve /metrics (Prometheus text) and /metrics.json on a daemon thread."""
+        if self._server is not None:
+            return self._server
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body = registry.dump_json().encode()
+                    content_type = "application/json"
+                elif self.path.startswith("/metrics"):
+                    body = registry.render_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(
+            target=self._server.serve_forever, name="kalki-metrics", daemon=True
+        ).start()
+        logger.info(f"Serving model metrics on http://{host}:{self._server.server_port}/metrics")
+        return self._server
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+def _labels(client: str, model: str) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'client="{escape(client)}",model="{escape(model)}"'
+
+# Global metrics registry shared by all model clients
+metrics = MetricsRegistry()
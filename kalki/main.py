@@ -12,9 +12,14 @@ sys.path.append(str(Path(__file__).parent.parent))
 from kalki.config.config_manager import config
 from kalki.config.logging_setup import logger
 from kalki.integrations.jan_client import jan_client
+from kalki.integrations.metrics import metrics
+from kalki.core.agent.checkpoint import CheckpointStore
 from kalki.core.agent.loop import AgentLoop
-from kalki.core.plugins.ui_automation import UIAutomationPlugin
+from kalki.core.agent.plan_cache import PlanCache
+from kalki.core.agent.tracing import Tracer
 from kalki.core.plugins.base import plugin_registry
+from kalki.core.plugins.discovery import register_plugins
+from kalki.core.plugins.execution import PROCESS
 
 class KalkiAssistant:
     def __init__(self):
@@ -30,16 +35,44 @@ class KalkiAssistant:
     def handle_shutdown(self, signum, frame):
         """Handle shutdown signals gracefully."""
         logger.info(f"Received shutdown signal {signum}")
+        # Keep every completed step of running tasks for resume_task
+        if self.agent and self.agent.checkpoints is not None:
+            self.agent.checkpoints.flush()
         self.shutdown_event.set()
     
     async def initialize_components(self):
         """Initialize all Kalki components."""
         try:
-            # Register plugins
-            plugin_registry.register(UIAutomationPlugin())
+            # Register plugins; modules are imported on first use
+            plugins_directory = None
+            if config.get('system.plugins_enabled', True):
+                plugins_directory = config.get('system.plugins_directory')
+            for name in register_plugins(plugin_registry, plugins_directory):
+                # Worker processes are started now so the first call is fast
+                if plugin_registry.policy(name).mode == PROCESS:
+                    await plugin_registry.warm(name)
+            
+            # Expose model latency and token usage metrics
+            if config.get('metrics.enabled', False):
+                try:
+                    metrics.serve(
+                        config.get('metrics.host', '127.0.0.1'),
+                        config.get('metrics.port', 9464)
+                    )
+                except OSError as e:
+                    logger.warning(f"Could not start metrics endpoint: {e}")
             
             # Initialize agent loop
-            self.agent = AgentLoop(jan_client)
+            plan_cache_path = config.get('agent.plan_cache')
+            checkpoint_dir = config.get('agent.checkpoint_dir')
+            self.agent = AgentLoop(
+                jan_client,
+                tracer=Tracer(config.get('agent.trace_file')),
+                plan_cache=PlanCache(plan_cache_path) if plan_cache_path else None,
+                checkpoints=CheckpointStore(
+                    checkpoint_dir, config.get('agent.checkpoint_every', 1)
+                ) if checkpoint_dir else None
+            )
             
             logger.info("All components initialized successfully")
             return True
@@ -55,6 +88,16 @@ class KalkiAssistant:
             
             logger.info("Kalki is running")
             
+            # Finish tasks interrupted by the last shutdown or a crash
+            if self.agent and self.agent.checkpoints is not None:
+                for task_id in self.agent.checkpoints.pending():
+                    try:
+                        state = await self.agent.resume_task(task_id)
+                        logger.info(f"Resumed task {task_id} completed: {state.completed}")
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        logger.error(f"Could not resume task {task_id}: {e}")
+                        self.agent.checkpoints.discard(task_id)
+            
             # Example task execution
             if self.agent:
                 state = await self.agent.execute_task(
@@ -70,6 +113,15 @@ class KalkiAssistant:
             logger.error(f"Kalki encountered an error: {e}")
         finally:
             logger.info("Kalki is shutting down")
+            if self.agent and self.agent.checkpoints is not None:
+                self.agent.checkpoints.flush()
+            plugin_registry.shutdown()
+            if self.agent and self.agent.plan_cache is not None:
+                self.agent.plan_cache.save()
+                logger.info(f"Plan cache: {self.agent.plan_cache.stats()}")
+            dump_path = config.get('metrics.json_dump')
+            if dump_path:
+                metrics.dump_json(dump_path)
 
 async def main():
     """Entry point for Kalki."""
@@ -1,12 +1,25 @@
+import asyncio
+import json
 import logging
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass
+import re
+import threading
+import time
+from typing import AsyncIterator, Dict, Any, Optional, List, Tuple, Callable
+from dataclasses import dataclass, field
 from .actions import ActionEngine
 from .vision import VisionSystem
 from .jan_client import JanClient
+from ..core.fast_path import FastPathParser
+from ..core.intent_cache import IntentCache
+from ..core.intent_schema import INTENT_SCHEMA
+from ..core.json_stream import IncrementalJSONParser
+from ..core.plugins.memo import frame_clock
 
 logger = logging.getLogger(__name__)
 
+# Commands likely to become a click on visible text; only these prefetch the screen
+CLICK_HINT = re.compile(r"\b(click|tap|press|hit|select|choose|check|toggle|button|link|menu|tab|icon)\b", re.I)
+
 @dataclass
 class Command:
     """Represents a parsed command with its parameters"""
@@ -14,32 +27,54 @@ class Command:
     parameters: Dict[str, Any]
     raw_text: str
     confidence: float
+    cached: bool = False
+    timestamp: float = field(default_factory=time.time)
+
+class ScreenPrefetch:
+    """A screen-index refresh running in a worker thread while the model parses"""
+    
+    def __init__(self, vision: VisionSystem):
+        self._abort = threading.Event()
+        self.future = asyncio.ensure_future(
+            asyncio.to_thread(vision.screen_index, 0.0, True, self._abort.is_set)
+        )
+        
+    def cancel(self):
+        """Drop the refresh; OCR is skipped if the capture has not finished yet"""
+        self._abort.set()
+        self.future.cancel()
+        
+    def __await__(self):
+        return self.future.__await__()
 
 class CommandProcessor:
-    def __init__(self, jan_client: JanClient, action_engine: ActionEngine, vision_system: VisionSystem):
+    def __init__(self, jan_client: JanClient, action_engine: ActionEngine, vision_system: VisionSystem,
+                 fast_path: Optional[FastPathParser] = None,
+                 intent_cache: Optional[IntentCache] = None,
+                 cache_min_confidence: float = 0.8,
+                 fast_path_min_confidence: float = 0.8,
+                 prefetch_vision: bool = True):
         self.jan = jan_client
         self.actions = action_engine
         self.vision = vision_system
+        self.fast_path = fast_path or FastPathParser()
+        self.intent_cache = intent_cache if intent_cache is not None else IntentCache()
+        self.cache_min_confidence = cache_min_confidence
+        self.fast_path_min_confidence = fast_path_min_confidence
+        self.prefetch_vision = prefetch_vision
         self.command_history: List[Command] = []
+        # Streamed parses still reading the rest of the reply, by id of the command
+        self._finishing: Dict[int, asyncio.Task] = {}
+        
+    async def process_command(self, text: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Process a natural language command
         
-    async def process_command(self, text: str) -> Dict[str, Any]:
-        """Process a natural language command"""
+        context may describe the screen state (e.g. ``focused_app``); it
+        scopes cached parses so a command can mean different things per app.
+        """
         try:
-            # Parse command using Jan.ai
-            parsed = await self._parse_command(text)
-            
-            # Execute the command
-            result = await self._execute_command(parsed)
-            
-            # Store in history
-            self.command_history.append(parsed)
-            
-            return {
-                'success': True,
-                'action': parsed.action,
-                'result': result,
-                'message': 'Command executed successfully'
-            }
+            parsed, screen = await self.parse(text, context)
+            return await self.execute(parsed, context, screen)
             
         except Exception as e:
             logger.error(f"Command processing failed: {e}")
@@ -49,9 +84,121 @@ class CommandProcessor:
                 'message': 'Failed to process command'
             }
     
-    async def _parse_command(self, text: str) -> Command:
+    async def parse(self, text: str, context: Optional[Dict[str, Any]] = None,
+                    prefetch: bool = True) -> Tuple[Command, Optional[ScreenPrefetch]]:
+        """Parse a command, returning it with any screen refresh started meanwhile"""
+        parsed = self._parse_local(text, context)
+        if parsed is not None:
+            return parsed, None
+        # Capture and OCR the screen while the model parses, so a click does
+        # not pay for vision after inference
+        screen = self._prefetch_screen(text) if prefetch else None
+        try:
+            parsed = await self._parse_with_model(text, context)
+        except BaseException:
+            if screen is not None:
+                screen.cancel()
+            raise
+        if screen is not None and not (parsed.action == 'click' and 'text' in parsed.parameters):
+            screen.cancel()
+            screen = None
+        return parsed, screen
+    
+    async def execute(self, parsed: Command, context: Optional[Dict[str, Any]] = None,
+                      screen: Optional[ScreenPrefetch] = None) -> Dict[str, Any]:
+        """Execute a parsed command and record it in the history if it succeeded
+
+        Raises if the action raised; an action that reports an error (e.g. text
+        not found) returns a result with ``success`` False.
+        """
+        try:
+            result = await self._execute_command(parsed, screen)
+        except Exception:
+            self._forget(parsed, context)
+            raise
+        finally:
+            # The action may have changed the screen; memoized lookups are stale
+            frame_clock.advance()
+        if isinstance(result, dict) and 'error' in result:
+            self._forget(parsed, context)
+            return {
+                'success': False,
+                'action': parsed.action,
+                'result': result,
+                'error': result['error'],
+                'message': 'Command failed'
+            }
+        
+        # Only commands that succeeded are recorded (macros replay this history)
+        self.command_history.append(parsed)
+        
+        return {
+            'success': True,
+            'action': parsed.action,
+            'result': result,
+            'message': 'Command executed successfully'
+        }
+    
+    def _forget(self, parsed: Command, context: Optional[Dict[str, Any]] = None):
+        """A cached (or freshly cached) parse led to a failed action"""
+        finishing = self._finishing.pop(id(parsed), None)
+        if finishing is not None:
+            # Do not cache it once the rest of the reply arrives
+            finishing.cancel()
+        self.intent_cache.invalidate(parsed.raw_text, context)
+    
+    def _prefetch_screen(self, text: str) -> Optional[ScreenPrefetch]:
+        """Refresh the vision system's screen index in a worker thread"""
+        if not self.prefetch_vision or not hasattr(self.vision, 'screen_index'):
+            return None
+        if not CLICK_HINT.search(text):
+            return None
+        return ScreenPrefetch(self.vision)
+    
+    async def _parse_command(self, text: str, context: Optional[Dict[str, Any]] = None) -> Command:
         """Parse natural language into structured command"""
-        prompt = f"""
+        return self._parse_local(text, context) or await self._parse_with_model(text, context)
+    
+    def _parse_local(self, text: str, context: Optional[Dict[str, Any]] = None) -> Optional[Command]:
+        """Resolve a command without the model, from the grammar or the intent cache"""
+        # Common commands are resolved by the grammar without waiting on the model
+        match = self.fast_path.match(text)
+        # Guesses the grammar is unsure of (long unquoted text) go to the model
+        if match and match.confidence >= self.fast_path_min_confidence:
+            return Command(
+                action=match.action,
+                parameters=match.parameters,
+                raw_text=text,
+                confidence=match.confidence
+            )
+        
+        hit = self.intent_cache.get(text, context)
+        if hit:
+            return Command(
+                action=hit['action'],
+                parameters=hit['parameters'],
+                raw_text=text,
+                confidence=hit['confidence'],
+                cached=True
+            )
+        return None
+    
+    async def _parse_with_model(self, text: str, context: Optional[Dict[str, Any]] = None) -> Command:
+        """Parse a command with Jan.ai and cache the result
+        
+        With a streaming client the output is constrained to INTENT_SCHEMA
+        and the command is returned as soon as its action and parameters are
+        complete; the rest of the reply, whose confidence decides caching, is
+        read in the background.
+        """
+        if hasattr(self.jan, 'stream_generate'):
+            return await self._stream_with_model(text, context)
+        
+        response = await self.jan.generate(self._parsing_prompt(text))
+        return self._command_from_reply(response['choices'][0]['message']['content'], text, context)
+    
+    def _parsing_prompt(self, text: str) -> str:
+        return f"""
         Parse this command into a structured format:
         "{text}"
         
@@ -60,25 +207,114 @@ class CommandProcessor:
         - parameters: Required parameters
         - confidence: How confident the parsing is (0-1)
         """
+    
+    async def _stream_with_model(self, text: str, context: Optional[Dict[str, Any]] = None) -> Command:
+        parser = IncrementalJSONParser()
+        chunks: List[str] = []
+        stream = self.jan.stream_generate(self._parsing_prompt(text), format=INTENT_SCHEMA)
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                parser.feed(chunk)
+                if parser.error or parser.done or parser.has('action', 'parameters'):
+                    break
+        except BaseException:
+            await stream.aclose()
+            raise
         
-        response = await self.jan.generate(prompt)
+        members = parser.members
+        if parser.error or not (isinstance(members.get('action'), str) and isinstance(members.get('parameters'), dict)):
+            await stream.aclose()
+            # Unconstrained backends may still produce recoverable output
+            return self._command_from_reply("".join(chunks), text, context)
         
+        command = Command(
+            action=members['action'],
+            parameters=members['parameters'],
+            raw_text=text,
+            confidence=members.get('confidence', 0.0)
+        )
+        task = asyncio.ensure_future(self._finish_stream(stream, parser, command, context))
+        self._finishing[id(command)] = task
+        task.add_done_callback(lambda _: self._finishing.pop(id(command), None))
+        return command
+    
+    async def _finish_stream(self, stream: AsyncIterator[str], parser: IncrementalJSONParser,
+                             command: Command, context: Optional[Dict[str, Any]]):
+        """Read the rest of a streamed parse and cache it if it was confident"""
         try:
-            parsed = response['choices'][0]['message']['content']
+            if not parser.done:
+                async for chunk in stream:
+                    parser.feed(chunk)
+                    if parser.error or parser.done:
+                        break
+        except Exception as e:
+            logger.warning(f"Could not read the rest of the parse of '{command.raw_text}': {e}")
+            return
+        finally:
+            await stream.aclose()
+        if parser.done and not parser.error:
+            command.confidence = parser.members.get('confidence', 0.0)
+            self._remember(command, context)
+    
+    def _command_from_reply(self, content: str, text: str, context: Optional[Dict[str, Any]] = None) -> Command:
+        try:
+            start = content.find('{')
+            end = content.rfind('}') + 1
+            if start == -1 or end == 0:
+                raise ValueError("No JSON structure found in response")
+            parsed = json.loads(content[start:end])
             # Convert to Command object
-            return Command(
+            command = Command(
                 action=parsed['action'],
                 parameters=parsed['parameters'],
                 raw_text=text,
                 confidence=parsed.get('confidence', 0.0)
             )
+            self._remember(command, context)
+            return command
         except Exception as e:
             logger.error(f"Failed to parse command: {e}")
             raise
+    
+    def _remember(self, command: Command, context: Optional[Dict[str, Any]] = None):
+        # Only confident parses are worth replaying without the model
+        if command.confidence >= self.cache_min_confidence:
+            self.intent_cache.put(command.raw_text, context, command.action, command.parameters, command.confidence)
+            
+    async def _execute_command(self, command: Command, screen: Optional[ScreenPrefetch] = None) -> Dict[str, Any]:
+        """Execute a parsed command
+        
+        screen is a pending screen-index refresh started alongside parsing;
+        click-by-text waits for it instead of capturing again. The action
+        itself (OCR, mouse and keyboard) runs in a worker thread so the event
+        loop keeps parsing ahead; cancelling stops it before its next step
+        and returns once the thread has let go of mouse and keyboard.
+        """
+        if screen is not None:
+            await screen
+        abort = threading.Event()
+        action = asyncio.ensure_future(asyncio.to_thread(self._perform, command, screen is not None, abort.is_set))
+        try:
+            return await asyncio.shield(action)
+        except asyncio.CancelledError:
+            abort.set()
+            # Later commands must not run while this one still holds the input
+            await asyncio.wait({action})
+            raise
             
-    async def _execute_command(self, command: Command) -> Dict[str, Any]:
-        """Execute a parsed command"""
-        if command.action == 'open_app':
+    def _perform(self, command: Command, indexed: bool = False,
+                 aborted: Callable[[], bool] = lambda: False) -> Dict[str, Any]:
+        """Carry out a command; blocking, so called from a worker thread
+        
+        aborted is checked before each step that touches the screen.
+        """
+        def step():
+            if aborted():
+                raise asyncio.CancelledError()
+        
+        step()
+        if command.action in ('open_app', 'open_application'):
             return {'opened': self.actions.open_application(command.parameters['name'])}
             
         elif command.action == 'open_url':
@@ -89,8 +325,14 @@ class CommandProcessor:
             if 'text' in command.parameters:
                 # Try to find and click text
                 text = command.parameters['text']
-                found = self.vision.find_text_on_screen(text)
+                if indexed:
+                    # The index just refreshed is current however long the
+                    # parse took, unless an action has changed the screen since
+                    found = self.vision.find_text_cached(text, max_age=float('inf'))
+                else:
+                    found = self.vision.find_text_on_screen(text)
                 if found:
+                    step()
                     self.actions.click(found[0]['x'], found[0]['y'])
                     return {'clicked': text}
                 return {'error': f"Text '{text}' not found"}
@@ -102,13 +344,25 @@ class CommandProcessor:
                 )
                 return {'clicked_at': (command.parameters['x'], command.parameters['y'])}
                 
-        elif command.action == 'type':
+        elif command.action in ('type', 'type_text'):
             self.actions.type_text(command.parameters['text'])
             return {'typed': command.parameters['text']}
             
+        elif command.action == 'press_key':
+            self.actions.press_key(command.parameters['key'])
+            return {'pressed': command.parameters['key']}
+            
+        elif command.action == 'hotkey':
+            self.actions.hotkey(*command.parameters['keys'])
+            return {'pressed': '+'.join(command.parameters['keys'])}
+            
         else:
             raise ValueError(f"Unknown action: {command.action}")
             
+    def close(self) -> None:
+        """Persist the intent cache; it is otherwise only saved every few parses"""
+        self.intent_cache.save()
+            
     def get_command_history(self) -> List[Dict[str, Any]]:
         """Get list of previously executed commands"""
         return [
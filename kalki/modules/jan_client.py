@@ -1,20 +1,31 @@
 import aiohttp
+import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, Optional, Sequence
+from ..integrations.batch import BatchRun, backend_limit
+from ..integrations.health import health_monitor, http_probe
+from ..integrations.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 class JanClient:
-    def __init__(self, base_url: str = "http://0.0.0.0:8080", api_key: Optional[str] = None):
+    def __init__(self, base_url: str = "http://0.0.0.0:8080", api_key: Optional[str] = None,
+                 max_concurrency: int = 4):
         """Initialize Jan.ai client"""
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
+        self.max_concurrency = max_concurrency
         self.headers = {
             "Content-Type": "application/json"
         }
         if api_key:
             self.headers["Authorization"] = f"Bearer {api_key}"
+        
+        self.backend = f"jan:{self.base_url}"
+        health_monitor.register(self.backend, http_probe(f"{self.base_url}/v1/models", headers=self.headers))
+        # Shared by single calls, streams and batches against this server
+        self._limit = backend_limit(self.backend, max_concurrency)
             
     async def check_connection(self) -> bool:
         """Check if Jan.ai server is accessible"""
@@ -30,6 +41,11 @@ class JanClient:
             
     async def generate(self, prompt: str, model: str = "mistral", **kwargs) -> Dict[str, Any]:
         """Generate text using Jan.ai model"""
+        async with self._limit:
+            return await self._generate(prompt, model, **kwargs)
+            
+    async def _generate(self, prompt: str, model: str = "mistral", **kwargs) -> Dict[str, Any]:
+        health_monitor.check(self.backend)
         try:
             messages = [{"role": "user", "content": prompt}]
             
@@ -39,22 +55,98 @@ class JanClient:
                 **kwargs
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession() as session, metrics.track("jan", model) as timer:
                 async with session.post(
                     f"{self.base_url}/v1/chat/completions",
                     headers=self.headers,
                     json=data
                 ) as response:
+                    timer.mark_first_token()
+                    if response.status >= 500:
+                        health_monitor.record_failure(self.backend)
+                    else:
+                        health_monitor.record_success(self.backend)
                     if response.status != 200:
                         error_text = await response.text()
                         raise Exception(f"Jan.ai API error: {error_text}")
                         
-                    return await response.json()
+                    result = await response.json()
+                    timer.record_usage(result)
+                    return result
                     
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            health_monitor.record_failure(self.backend)
+            logger.error(f"Generation failed: {e}")
+            raise
         except Exception as e:
             logger.error(f"Generation failed: {e}")
             raise
             
+    async def stream_generate(self, prompt: str, model: str = "mistral",
+                              format: Optional[Dict[str, Any]] = None, **kwargs) -> AsyncIterator[str]:
+        """Stream generated text chunks as the server sends them
+        
+        format is a JSON schema the output must follow, sent as the
+        OpenAI-style ``response_format``.
+        """
+        health_monitor.check(self.backend)
+        data = {
+            "messages": [{"role": "user", "content": prompt}],
+            "model": model,
+            "stream": True,
+            **kwargs
+        }
+        if format:
+            data["response_format"] = {"type": "json_schema", "json_schema": {"name": "response", "schema": format}}
+        
+        try:
+            async with self._limit, aiohttp.ClientSession() as session, metrics.track("jan", model) as timer:
+                async with session.post(
+                    f"{self.base_url}/v1/chat/completions",
+                    headers=self.headers,
+                    json=data
+                ) as response:
+                    if response.status >= 500:
+                        health_monitor.record_failure(self.backend)
+                    else:
+                        health_monitor.record_success(self.backend)
+                    if response.status != 200:
+                        error_text = await response.text()
+                        raise Exception(f"Jan.ai API error: {error_text}")
+                    
+                    # Server-sent events: "data: {chunk}" lines, ended by "data: [DONE]"
+                    async for line in response.content:
+                        line = line.strip()
+                        if not line.startswith(b"data:"):
+                            continue
+                        payload = line[5:].strip()
+                        if payload == b"[DONE]":
+                            break
+                        chunk = json.loads(payload)
+                        if chunk.get("usage"):
+                            timer.record_usage(chunk)
+                        choices = chunk.get("choices") or [{}]
+                        content = (choices[0].get("delta") or {}).get("content")
+                        if content:
+                            timer.mark_first_token()
+                            yield content
+                            
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            health_monitor.record_failure(self.backend)
+            logger.error(f"Streaming generation failed: {e}")
+            raise
+            
+    def generate_many(self, prompts: Sequence[str], model: str = "mistral", **kwargs) -> BatchRun:
+        """Generate completions for many prompts with bounded concurrency.
+        
+        ``async for`` yields BatchItems as they complete; awaiting returns them
+        in input order. Each item holds the raw completion or an error.
+        """
+        async def run(prompt: str) -> Dict[str, Any]:
+            return await self._generate(prompt, model=model, **kwargs)
+        
+        return BatchRun(run, prompts, self._limit)
+            
     async def list_models(self) -> Dict[str, Any]:
         """Get list of available models"""
         try:
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .commands import Command, CommandProcessor
+from .vision import VisionSystem
+
+logger = logging.getLogger(__name__)
+
+# Longest pause kept from a recording; idle time between commands is not a timing
+MAX_RECORDED_DELAY = 5.0
+
+@dataclass
+class MacroStep:
+    """One recorded step: a CommandProcessor command or an agent plugin action."""
+    kind: str  # "command" or "plugin"
+    action: str  # command action, or plugin name
+    parameters: Dict[str, Any]
+    anchor: Optional[str] = None  # On-screen text a click command targets, re-resolved on replay
+    delay: float = 0.0  # Seconds after the previous step when recorded
+    raw_text: str = ""
+
+@dataclass
+class Macro:
+    name: str
+    steps: List[MacroStep]
+    created: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_commands(cls, name: str, commands: Sequence[Command]) -> "Macro":
+        """Build a macro from successfully executed commands"""
+        steps = []
+        previous = None
+        for command in commands:
+            parameters = dict(command.parameters)
+            anchor = None
+            if command.action == 'click' and 'text' in parameters:
+                anchor = parameters['text']
+            steps.append(MacroStep(
+                kind="command",
+                action=command.action,
+                parameters=parameters,
+                anchor=anchor,
+                delay=_delay(previous, command.timestamp),
+                raw_text=command.raw_text
+            ))
+            previous = command.timestamp
+        return cls(name, steps)
+
+    @classmethod
+    def from_task(cls, name: str, state: Any) -> "Macro":
+        """Build a macro from the successful actions of an agent TaskState"""
+        steps = []
+        previous = None
+        for action in state.actions:
+            # Plugin clicks target coordinates or images, never text, so they have no anchor
+            steps.append(MacroStep(
+                kind="plugin",
+                action=action.plugin,
+                parameters=dict(action.parameters),
+                delay=_delay(previous, action.timestamp),
+                raw_text=state.goal
+            ))
+            previous = action.timestamp
+        return cls(name, steps)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Macro":
+        return cls(
+            name=data['name'],
+            steps=[MacroStep(**step) for step in data['steps']],
+            created=data.get('created', time.time())
+        )
+
+def _delay(previous: Optional[float], current: float) -> float:
+    if previous is None:
+        return 0.0
+    return min(max(0.0, current - previous), MAX_RECORDED_DELAY)
+
+class MacroRecorder:
+    """Records the commands a CommandProcessor executes between start() and stop()"""
+
+    def __init__(self, processor: CommandProcessor):
+        self.processor = processor
+        self._mark: Optional[int] = None
+
+    @property
+    def recording(self) -> bool:
+        return self._mark is not None
+
+    def start(self):
+        self._mark = len(self.processor.command_history)
+
+    def stop(self, name: str) -> Macro:
+        if self._mark is None:
+            raise RuntimeError("Recorder was not started")
+        # CommandProcessor.execute only records commands that succeeded
+        commands = self.processor.command_history[self._mark:]
+        self._mark = None
+        return Macro.from_commands(name, commands)
+
+class MacroLibrary:
+    """Named macros persisted as a JSON file"""
+
+    def __init__(self, path: str = "macros.json"):
+        self.path = Path(path)
+        self.macros: Dict[str, Macro] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.macros = {m['name']: Macro.from_dict(m) for m in json.load(f)}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Could not load macros from {self.path}: {e}")
+
+    def get(self, name: str) -> Optional[Macro]:
+        return self.macros.get(name)
+
+    def list(self) -> List[str]:
+        return sorted(self.macros)
+
+    def save(self, macro: Macro):
+        self.macros[macro.name] = macro
+        self._write()
+
+    def delete(self, name: str) -> bool:
+        if self.macros.pop(name, None) is None:
+            return False
+        self._write()
+        return True
+
+    def _write(self):
+        tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump([m.to_dict() for m in self.macros.values()], f, indent=2)
+        os.replace(tmp, self.path)
+
+class MacroPlayer:
+    """Replays macros without the model.
+
+    Anchored steps are re-resolved against the cached screen index, so
+    elements that moved are still found. Only when an anchor cannot be
+    found, even after a fresh capture, is the model asked which visible
+    text it now corresponds to. Screen capture and OCR run in a worker
+    thread, off the event loop.
+    """
+
+    def __init__(self, processor: CommandProcessor, vision: Optional[VisionSystem] = None,
+                 plugins=None, timing_scale: float = 0.0, index_max_age: float = 2.0):
+        self.processor = processor
+        self.vision = vision or processor.vision
+        self.plugins = plugins
+        self.timing_scale = timing_scale  # 0 = machine speed, 1 = recorded pace
+        self.index_max_age = index_max_age
+
+    async def play(self, macro: Macro) -> Dict[str, Any]:
+        """Run every step in order, stopping at the first failure"""
+        started = time.perf_counter()
+        model_calls = 0
+        for i, step in enumerate(macro.steps):
+            if self.timing_scale and step.delay:
+                await asyncio.sleep(step.delay * self.timing_scale)
+            try:
+                parameters = dict(step.parameters)
+                if step.anchor:
+                    position, used_model = await self._resolve_anchor(step.anchor)
+                    model_calls += used_model
+                    if position is None:
+                        raise LookupError(f"Anchor '{step.anchor}' not found on screen")
+                    parameters.pop('text', None)
+                    parameters['x'], parameters['y'] = position
+                await self._run_step(step, parameters)
+            except Exception as e:
+                logger.error(f"Macro '{macro.name}' failed at step {i + 1}: {e}")
+                return {
+                    'success': False,
+                    'steps_run': i,
+                    'model_calls': model_calls,
+                    'error': str(e),
+                    'message': f"Macro stopped at step {i + 1}"
+                }
+            # The step may have changed the screen
+            self.vision.invalidate_index()
+
+        return {
+            'success': True,
+            'steps_run': len(macro.steps),
+            'model_calls': model_calls,
+            'elapsed': time.perf_counter() - started,
+            'message': f"Macro '{macro.name}' completed"
+        }
+
+    async def _run_step(self, step: MacroStep, parameters: Dict[str, Any]):
+        if step.kind == "plugin":
+            plugins = self.plugins
+            if plugins is None:
+                from ..core.plugins.base import plugin_registry as plugins
+            result = await plugins.execute_plugin(step.action, **parameters)
+            if not result.success:
+                raise RuntimeError(result.error or f"Plugin {step.action} failed")
+            return result
+
+        # Through execute(), so replayed steps are recorded and advance the frame clock
+        command = Command(step.action, parameters, step.raw_text, 1.0)
+        result = await self.processor.execute(command)
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        return result
+
+    def _locate(self, text: str, refresh: bool = False) -> Optional[tuple]:
+        boxes = self.vision.find_text_cached(text, max_age=self.index_max_age, refresh=refresh)
+        if not boxes:
+            return None
+        box = max(boxes, key=lambda b: b['confidence'])
+        return box['x'] + box['width'] // 2, box['y'] + box['height'] // 2
+
+    async def _resolve_anchor(self, anchor: str) -> tuple:
+        """Screen position of an anchor and whether the model was needed"""
+        position = await asyncio.to_thread(self._locate, anchor)
+        if position is None:
+            position = await asyncio.to_thread(self._locate, anchor, True)
+        if position:
+            return position, False
+
+        words = await asyncio.to_thread(self.vision.screen_index, self.index_max_age)
+        visible = " ".join(w['text'] for w in words)
+        prompt = f"""
+        A recorded UI step clicked the element labelled "{anchor}", but that text is no longer on screen.
+        Visible text: {visible[:2000]}
+
+        Reply with only the exact visible text of the element that now serves the same purpose,
+        or NONE if there is no such element.
+        """
+        try:
+            response = await self.processor.jan.generate(prompt)
+            reply = response['choices'][0]['message']['content'].strip().strip('"')
+        except Exception as e:
+            logger.error(f"Model could not resolve anchor '{anchor}': {e}")
+            return None, True
+        if not reply or reply.upper() == 'NONE':
+            return None, True
+        logger.info(f"Anchor '{anchor}' re-resolved by the model as '{reply}'")
+        return await asyncio.to_thread(self._locate, reply), True
@@ -0,0 +1,177 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from .commands import Command, CommandProcessor
+
+logger = logging.getLogger(__name__)
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    PARSING = "parsing"
+    PARSED = "parsed"
+    EXECUTING = "executing"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+FINISHED = (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED)
+
+@dataclass
+class PipelineJob:
+    """A command submitted to the pipeline and its progress"""
+    id: int
+    text: str
+    context: Optional[Dict[str, Any]] = None
+    status: JobStatus = JobStatus.QUEUED
+    command: Optional[Command] = None
+    result: Optional[Dict[str, Any]] = None
+    submitted: float = field(default_factory=time.time)
+    _parse_task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _run_task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _finished: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    async def wait(self) -> Dict[str, Any]:
+        """Wait for the job to finish and return its result"""
+        await self._finished.wait()
+        return self.result
+
+class CommandPipeline:
+    """Accepts commands continuously and runs them in submission order.
+
+    Parsing starts as soon as a command is submitted (at most
+    ``parse_ahead`` model parses at once), so the next command is usually
+    parsed while the current one executes. Execution stays strictly
+    sequential. Screen prefetch is disabled for parse-ahead, because an
+    earlier command may change the screen before this one runs.
+
+    ``on_update`` is called with the job after every status change.
+    """
+
+    def __init__(self, processor: CommandProcessor, parse_ahead: int = 2,
+                 on_update: Optional[Callable[[PipelineJob], None]] = None):
+        self.processor = processor
+        self.on_update = on_update
+        self.jobs: Dict[int, PipelineJob] = {}
+        self._ids = itertools.count(1)
+        self._parse_slots = asyncio.Semaphore(max(1, parse_ahead))
+        self._queue: "asyncio.Queue[PipelineJob]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.ensure_future(self._run())
+
+    def submit(self, text: str, context: Optional[Dict[str, Any]] = None) -> PipelineJob:
+        """Queue a command and start parsing it; returns immediately"""
+        self.start()
+        job = PipelineJob(next(self._ids), text, context)
+        self.jobs[job.id] = job
+        job._parse_task = asyncio.ensure_future(self._parse(job))
+        self._queue.put_nowait(job)
+        self._notify(job)
+        return job
+
+    def pending(self) -> List[PipelineJob]:
+        return [job for job in self.jobs.values() if not job.finished]
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued, parsing or executing job
+
+        An executing job stops before its next mouse or keyboard step; a
+        keystroke sequence already being typed is finished first.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        for task in (job._parse_task, job._run_task):
+            if task is not None:
+                task.cancel()
+        self._finish(job, JobStatus.CANCELLED, {
+            'success': False,
+            'error': 'Cancelled',
+            'message': 'Command cancelled'
+        })
+        return True
+
+    async def drain(self):
+        """Wait for every submitted job to finish"""
+        for job in list(self.jobs.values()):
+            await job.wait()
+
+    async def stop(self, cancel_pending: bool = False):
+        if cancel_pending:
+            for job in self.pending():
+                self.cancel(job.id)
+        else:
+            await self.drain()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _parse(self, job: PipelineJob) -> Command:
+        async with self._parse_slots:
+            self._set_status(job, JobStatus.PARSING)
+            command, _ = await self.processor.parse(job.text, job.context, prefetch=False)
+            job.command = command
+            self._set_status(job, JobStatus.PARSED)
+            return command
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            if job.finished:
+                continue
+            try:
+                command = await job._parse_task
+                self._set_status(job, JobStatus.EXECUTING)
+                job._run_task = asyncio.ensure_future(self.processor.execute(command, job.context))
+                result = await job._run_task
+                self._finish(job, JobStatus.DONE if result.get('success', True) else JobStatus.FAILED, result)
+            except asyncio.CancelledError:
+                if not job.finished:
+                    # The worker itself is being stopped
+                    self._finish(job, JobStatus.CANCELLED, {
+                        'success': False, 'error': 'Cancelled', 'message': 'Command cancelled'
+                    })
+                    raise
+                # Only this job was cancelled; carry on with the next one
+            except Exception as e:
+                logger.error(f"Command {job.id} failed: {e}")
+                self._finish(job, JobStatus.FAILED, {
+                    'success': False,
+                    'error': str(e),
+                    'message': 'Failed to process command'
+                })
+
+    def _set_status(self, job: PipelineJob, status: JobStatus):
+        if not job.finished:
+            job.status = status
+            self._notify(job)
+
+    def _finish(self, job: PipelineJob, status: JobStatus, result: Dict[str, Any]):
+        if job.finished:
+            return
+        job.status = status
+        job.result = result
+        job._finished.set()
+        self._notify(job)
+
+    def _notify(self, job: PipelineJob):
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                logger.warning(f"Pipeline status callback failed: {e}")
@@ -3,7 +3,11 @@ import numpy as np
 import pytesseract
 from PIL import Image
 import logging
-from typing import Dict, List, Tuple, Optional
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple, Optional
+
+from ..core.plugins.memo import frame_clock
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +15,11 @@ class VisionSystem:
     def __init__(self):
         self.screen = mss.mss()
         self._setup_tesseract()
+        # OCR of the last full-screen capture, reused by find_text_cached
+        self._index: List[Dict[str, Any]] = []
+        self._index_time = 0.0
+        self._index_generation = frame_clock.generation
+        self._index_lock = threading.Lock()
         
     def _setup_tesseract(self):
         """Configure Tesseract settings"""
@@ -42,32 +51,98 @@ class VisionSystem:
     def find_text_in_image(self, image: np.ndarray, text: str, confidence: float = 0.6) -> List[Dict[str, int]]:
         """Find text in image and return bounding boxes"""
         try:
-            # Convert to PIL Image if needed
-            if isinstance(image, np.ndarray):
-                image = Image.fromarray(image)
-            
-            # Get OCR data with bounding boxes
-            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-            
-            # Find matches
-            boxes = []
-            for i, word in enumerate(data['text']):
-                if text.lower() in word.lower():
-                    if float(data['conf'][i]) >= confidence * 100:
-                        boxes.append({
-                            'x': data['left'][i],
-                            'y': data['top'][i],
-                            'width': data['width'][i],
-                            'height': data['height'][i],
-                            'confidence': float(data['conf'][i]) / 100
-                        })
-            
-            return boxes
-            
+            return self._match_words(self._ocr_words(image), text, confidence)
         except Exception as e:
             logger.error(f"OCR failed: {e}")
             return []
     
+    def _ocr_words(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        """Every recognised word with its bounding box, confidence and line"""
+        # Convert to PIL Image if needed
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        
+        # Get OCR data with bounding boxes
+        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+        words = []
+        for i, word in enumerate(data['text']):
+            if word.strip():
+                words.append({
+                    'text': word,
+                    'x': data['left'][i],
+                    'y': data['top'][i],
+                    'width': data['width'][i],
+                    'height': data['height'][i],
+                    'confidence': float(data['conf'][i]) / 100,
+                    'line': (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+                })
+        return words
+    
+    def _match_words(self, words: List[Dict[str, Any]], text: str, confidence: float) -> List[Dict[str, int]]:
+        """Boxes of single words containing text, or of consecutive words on one line matching a phrase"""
+        needle = text.lower().split()
+        boxes = []
+        if len(needle) <= 1:
+            for word in words:
+                if text.lower() in word['text'].lower() and word['confidence'] >= confidence:
+                    boxes.append({k: word[k] for k in ('x', 'y', 'width', 'height', 'confidence')})
+            return boxes
+        
+        for i in range(len(words) - len(needle) + 1):
+            run = words[i:i + len(needle)]
+            if len({w['line'] for w in run}) != 1:
+                continue
+            if " ".join(w['text'].lower() for w in run) != " ".join(needle):
+                continue
+            if min(w['confidence'] for w in run) < confidence:
+                continue
+            left = min(w['x'] for w in run)
+            top = min(w['y'] for w in run)
+            boxes.append({
+                'x': left,
+                'y': top,
+                'width': max(w['x'] + w['width'] for w in run) - left,
+                'height': max(w['y'] + w['height'] for w in run) - top,
+                'confidence': min(w['confidence'] for w in run)
+            })
+        return boxes
+    
+    def screen_index(self, max_age: float = 2.0, refresh: bool = False,
+                     abort: Optional[Callable[[], bool]] = None) -> List[Dict[str, Any]]:
+        """OCR words on screen, re-captured when older than max_age seconds
+        or when an action may have changed the screen since
+
+        abort is checked between capture and OCR; if it returns True the
+        refresh is dropped and the previous index returned as is.
+        """
+        with self._index_lock:
+            stale = self._index_generation != frame_clock.generation
+            if refresh or stale or time.monotonic() - self._index_time > max_age:
+                generation = frame_clock.generation
+                try:
+                    image = self.capture_screen()
+                    if abort is not None and abort():
+                        return self._index
+                    self._index = self._ocr_words(image)
+                except Exception as e:
+                    logger.error(f"OCR failed: {e}")
+                    self._index = []
+                self._index_generation = generation
+                self._index_time = time.monotonic()
+            return self._index
+    
+    def find_text_cached(self, text: str, confidence: float = 0.6,
+                         max_age: float = 2.0, refresh: bool = False) -> List[Dict[str, int]]:
+        """Like find_text_on_screen, but served from the cached screen index"""
+        return self._match_words(self.screen_index(max_age, refresh), text, confidence)
+    
+    def invalidate_index(self):
+        """Force the next lookup to re-capture, e.g. after the screen changed.
+        Memoized plugin results from the old frame are dropped as well."""
+        with self._index_lock:
+            self._index_time = 0.0
+        frame_clock.advance()
+    
     def get_all_text_on_screen(self) -> str:
         """Get all visible text from screen"""
         screen = self.capture_screen()
@@ -14,7 +14,10 @@ import typer
 from kalki.modules.vision import VisionSystem
 from kalki.modules.actions import ActionEngine
 from kalki.modules.commands import CommandProcessor
+from kalki.modules.macros import MacroLibrary, MacroPlayer, MacroRecorder
+from kalki.modules.pipeline import CommandPipeline, JobStatus, PipelineJob
 from kalki.modules.jan_client import JanClient
+from kalki.integrations.metrics import metrics
 
 # Set up logging
 logging.basicConfig(
@@ -36,10 +39,20 @@ def print_banner(console: Console):
     banner.append(" - Your Local AI Assistant", style="bold white")
     console.print(Panel(banner, border_style="cyan"))
 
+def report_job(console: Console, job: PipelineJob):
+    """Print a pipeline job's outcome once it finishes"""
+    if job.status == JobStatus.DONE:
+        console.print(f"[bold green]✓[/bold green] #{job.id}", job.result['message'])
+    elif job.status in (JobStatus.FAILED, JobStatus.CANCELLED):
+        console.print(f"[bold red]✗[/bold red] #{job.id}", job.result['message'])
+        if job.status == JobStatus.FAILED:
+            console.print(f"Error: {job.result['error']}")
+
 async def main(
     jan_url: str = "http://0.0.0.0:8080",
     safe_mode: bool = True,
     auto_confirm: bool = False,
+    metrics_port: int = 0,
 ):
     """Kalki - A powerful local AI assistant"""
     try:
@@ -47,11 +60,20 @@ async def main(
         console = Console()
         print_banner(console)
         
+        if metrics_port:
+            metrics.serve(port=metrics_port)
+        
         # Initialize core systems
         vision = VisionSystem()
         actions = ActionEngine(safe_mode=safe_mode)
         jan = JanClient(base_url=jan_url)
         processor = CommandProcessor(jan, actions, vision)
+        # Commands are parsed ahead while earlier ones execute
+        pipeline = CommandPipeline(processor, on_update=lambda job: report_job(console, job))
+        macros = MacroLibrary()
+        recorder = MacroRecorder(processor)
+        player = MacroPlayer(processor, vision)
+        recording = None
         
         # Check Jan.ai connection
         try:
@@ -71,33 +93,86 @@ async def main(
         console.print("- 'Open Firefox'")
         console.print("- 'Click the login button'")
         console.print("- 'Type Hello World'")
+        console.print("Commands run in order while you keep typing; 'jobs' lists pending ones, 'cancel <id>' stops one.")
+        console.print("'record <name>' ... 'stop' saves a macro, 'play <name>' replays it, 'macros' lists them.")
         console.print()
         
         while True:
             try:
-                # Get user input
-                command = Prompt.ask("[bold cyan]You[/bold cyan]")
+                # Get user input without blocking queued commands
+                command = await asyncio.to_thread(Prompt.ask, "[bold cyan]You[/bold cyan]")
                 
                 if command.lower() in ['exit', 'quit']:
                     break
+                
+                if command.lower() == 'jobs':
+                    for job in pipeline.pending():
+                        console.print(f"#{job.id} ({job.status.value}) {job.text}", markup=False)
+                    continue
+                
+                if command.lower().startswith('cancel '):
+                    job_id = command.split(maxsplit=1)[1].lstrip('#')
+                    if job_id.isdigit() and pipeline.cancel(int(job_id)):
+                        continue
+                    console.print(f"No pending command #{job_id}")
+                    continue
                     
-                # Process command
-                result = await processor.process_command(command)
+                if command.lower() == 'macros':
+                    for name in macros.list():
+                        console.print(f"{name} ({len(macros.get(name).steps)} steps)", markup=False)
+                    continue
                 
-                if result['success']:
-                    console.print("[bold green]✓[/bold green]", result['message'])
-                else:
-                    console.print("[bold red]✗[/bold red]", result['message'])
-                    if 'error' in result:
-                        console.print(f"Error: {result['error']}")
+                if command.lower().startswith('record '):
+                    name = command.split(maxsplit=1)[1].strip()
+                    # Commands queued before the recording started are not part of it
+                    await pipeline.drain()
+                    recorder.start()
+                    recording = name
+                    console.print(f"Recording macro '{name}'; 'stop' saves it.", markup=False)
+                    continue
                 
-            except KeyboardInterrupt:
+                if command.lower() == 'stop':
+                    if recording is None:
+                        console.print("Not recording a macro")
+                        continue
+                    await pipeline.drain()
+                    macro = recorder.stop(recording)
+                    recording = None
+                    if macro.steps:
+                        macros.save(macro)
+                        console.print(f"Saved macro '{macro.name}' ({len(macro.steps)} steps)", markup=False)
+                    else:
+                        console.print("No commands succeeded while recording; nothing saved")
+                    continue
+                
+                # "play <name>" that is not a macro ("play music") is an ordinary command
+                macro = macros.get(command.split(maxsplit=1)[1].strip()) \
+                    if command.lower().startswith('play ') else None
+                if macro is not None:
+                    # Replay after the queued commands, in order with them
+                    await pipeline.drain()
+                    result = await player.play(macro)
+                    console.print(result['message'], markup=False)
+                    if not result['success']:
+                        console.print(f"Error: {result['error']}", markup=False)
+                    continue
+                    
+                # Queue command
+                job = pipeline.submit(command)
+                console.print(f"[dim]#{job.id} queued[/dim]")
+                
+            except (KeyboardInterrupt, EOFError):
                 break
             except Exception as e:
                 logger.error(f"Command failed: {e}")
                 console.print(f"[bold red]Error:[/bold red] {str(e)}")
         
+        if pipeline.pending():
+            console.print(f"Finishing {len(pipeline.pending())} queued commands...")
+        await pipeline.stop()
+        
         # Cleanup
+        processor.close()
         vision.close()
         console.print("\nGoodbye! 👋")
         
@@ -7,25 +7,45 @@ from typing import Dict, List, Optional, Union, Any
 from pathlib import Path
 import base64
 
+from kalki.integrations.health import health_monitor
+from kalki.integrations.metrics import metrics
+
 log = logging.getLogger("model_handler")
 
 class BaseModelHandler(ABC):
     def __init__(self, model_url: str = "http://localhost:11434"):
         self.model_url = model_url
-        self._check_connection()
+        # Probed in the background; handlers sharing a server share its status
+        self.backend = f"ollama:{model_url}"
+        health_monitor.register(self.backend, self._check_connection)
     
-    def _check_connection(self) -> None:
+    def _check_connection(self) -> bool:
         """Check if the model server is running"""
         try:
             response = requests.get(f"{self.model_url}/api/version", timeout=5)
             if response.status_code == 200:
                 version_info = response.json()
-                log.info(f"Connected to model server version {version_info.get('version', 'unknown')}")
+                log.debug(f"Connected to model server version {version_info.get('version', 'unknown')}")
+                return True
             else:
                 raise ConnectionError(f"Model server returned status code {response.status_code}")
         except Exception as e:
             raise ConnectionError(f"Cannot connect to model server at {self.model_url}: {str(e)}")
     
+    def _post(self, path: str, **kwargs) -> requests.Response:
+        """POST to the model server, skipping backends known to be down"""
+        health_monitor.check(self.backend)
+        try:
+            response = requests.post(f"{self.model_url}{path}", **kwargs)
+        except requests.exceptions.RequestException:
+            health_monitor.record_failure(self.backend)
+            raise
+        if response.status_code >= 500:
+            health_monitor.record_failure(self.backend)
+        else:
+            health_monitor.record_success(self.backend)
+        return response
+    
     @abstractmethod
     def generate(self, prompt: str, **kwargs) -> str:
         """Generate a response from the model"""
@@ -45,20 +65,24 @@ class DolphinHandler(BaseModelHandler):
             
             messages.append({"role": "user", "content": prompt})
             
-            response = requests.post(
-                f"{self.model_url}/api/chat",
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "stream": False
-                },
-                timeout=90
-            )
-            
-            if response.status_code == 200:
-                return response.json()["message"]["content"]
-            else:
-                raise Exception(f"Error: {response.status_code} - {response.text}")
+            with metrics.track("ollama", self.model_name) as timer:
+                response = self._post(
+                    "/api/chat",
+                    json={
+                        "model": self.model_name,
+                        "messages": messages,
+                        "stream": False
+                    },
+                    timeout=90
+                )
+                timer.mark_first_token(response.elapsed.total_seconds())
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    timer.record_usage(result)
+                    return result["message"]["content"]
+                else:
+                    raise Exception(f"Error: {response.status_code} - {response.text}")
         except Exception as e:
             raise Exception(f"Error generating response: {str(e)}")
 
@@ -82,16 +106,18 @@ class QwenHandler(BaseModelHandler):
                 with open(image_path, "rb") as f:
                     data["images"] = [f.read()]
             
-            response = requests.post(
-                f"{self.model_url}/api/generate",
-                json=data,
-                timeout=90
-            )
-            
-            if response.status_code == 200:
-                return response.text
-            else:
-                raise Exception(f"Error: {response.status_code} - {response.text}")
+            with metrics.track("ollama", self.model_name) as timer:
+                response = self._post(
+                    "/api/generate",
+                    json=data,
+                    timeout=90
+                )
+                timer.mark_first_token(response.elapsed.total_seconds())
+                
+                if response.status_code == 200:
+                    return response.text
+                else:
+                    raise Exception(f"Error: {response.status_code} - {response.text}")
         except Exception as e:
             raise Exception(f"Error generating response: {str(e)}")
 
@@ -124,6 +150,33 @@ class ModelHandler:
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
+        
+        # Registered last: the first probe runs on another thread right away
+        self.backend = f"ollama:{self.base_url}"
+        health_monitor.register(self.backend, self._check_connection)
+
+    def _check_connection(self) -> bool:
+        """Probe the Ollama server"""
+        response = requests.get(f"{self.base_url}/api/version", headers=self.headers, timeout=5)
+        return response.status_code == 200
+    
+    def _post(self, url: str, data: Dict[str, Any]) -> requests.Response:
+        """POST to Ollama, skipping the call when the server is known to be down"""
+        health_monitor.check(self.backend)
+        try:
+            response = requests.post(url, json=data, headers=self.headers)
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code >= 500:
+                health_monitor.record_failure(self.backend)
+            else:
+                health_monitor.record_success(self.backend)
+            raise
+        except requests.exceptions.RequestException:
+            health_monitor.record_failure(self.backend)
+            raise
+        health_monitor.record_success(self.backend)
+        return response
 
     def generate(self, 
                 prompt: str, 
@@ -160,10 +213,13 @@ class ModelHandler:
                 data["system"] = system
                 
             try:
-                response = requests.post(url, json=data, headers=self.headers)
-                response.raise_for_status()
+                with metrics.track("ollama", model) as timer:
+                    response = self._post(url, data)
+                    timer.mark_first_token(response.elapsed.total_seconds())
+                    result = response.json()
+                    timer.record_usage(result)
                 return {
-                    "text": response.json()["response"]
+                    "text": result["response"]
                 }
             except Exception as e:
                 self.logger.error(f"Error calling Ollama API: {str(e)}")
@@ -185,10 +241,13 @@ class ModelHandler:
             }
 
             try:
-                response = requests.post(url, json=data, headers=self.headers)
-                response.raise_for_status()
+                with metrics.track("ollama", model) as timer:
+                    response = self._post(url, data)
+                    timer.mark_first_token(response.elapsed.total_seconds())
+                    result = response.json()
+                    timer.record_usage(result)
                 return {
-                    "text": response.json()["message"]["content"]
+                    "text": result["message"]["content"]
                 }
                 
             except Exception as e:
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# Route Classifier - decides which local model should answer a prompt
+# Hashed character/word n-gram features with a small NumPy linear model
+
+import argparse
+import json
+import logging
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+log = logging.getLogger("kalki.route_classifier")
+
+TEXT_MODEL = "dolphin3"
+VISION_MODEL = "qwen:2.5"
+
+# Bootstrap examples used until enough routing outcomes have been logged
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("what is on my screen right now", VISION_MODEL),
+    ("describe this image", VISION_MODEL),
+    ("what do you see in the screenshot", VISION_MODEL),
+    ("look at the picture and tell me what it shows", VISION_MODEL),
+    ("read the text in this screenshot", VISION_MODEL),
+    ("what's in this photo", VISION_MODEL),
+    ("which button is highlighted on the screen", VISION_MODEL),
+    ("can you see the error dialog", VISION_MODEL),
+    ("describe the window that is open", VISION_MODEL),
+    ("what colour is the icon in the corner", VISION_MODEL),
+    ("take a screenshot and tell me what's open", VISION_MODEL),
+    ("look at this", VISION_MODEL),
+    ("check what is visible on my display", VISION_MODEL),
+    ("which app is open in front", VISION_MODEL),
+    ("what does this picture show", VISION_MODEL),
+    ("show me the logs", TEXT_MODEL),
+    ("show me the files in my downloads folder", TEXT_MODEL),
+    ("what is the weather like today", TEXT_MODEL),
+    ("open firefox", TEXT_MODEL),
+    ("type hello world", TEXT_MODEL),
+    ("look up the python docs for asyncio", TEXT_MODEL),
+    ("describe how a circuit breaker works", TEXT_MODEL),
+    ("list running processes", TEXT_MODEL),
+    ("what is in my home directory", TEXT_MODEL),
+    ("summarize the last command output", TEXT_MODEL),
+    ("write a bash script to back up my notes", TEXT_MODEL),
+    ("show disk usage", TEXT_MODEL),
+    ("explain what a mutex is", TEXT_MODEL),
+    ("look up the opening hours of the library", TEXT_MODEL),
+    ("type this into the terminal", TEXT_MODEL),
+    ("tell me a joke", TEXT_MODEL),
+    ("see you later", TEXT_MODEL),
+]
+
+class HashedFeaturizer:
+    """Maps text to a sparse, L2-normalised set of hashed n-gram features."""
+
+    def __init__(self,
+                 n_features: int = 1 << 14,
+                 char_ngrams: Tuple[int, int] = (3, 5),
+                 word_ngrams: Tuple[int, int] = (1, 2)):
+        self.n_features = n_features
+        self.char_ngrams = char_ngrams
+        self.word_ngrams = word_ngrams
+
+    def _grams(self, text: str) -> Iterable[str]:
+        text = " ".join(text.lower().split())
+        padded = f" {text} "
+        lo, hi = self.char_ngrams
+        for n in range(lo, hi + 1):
+            for i in range(len(padded) - n + 1):
+                yield "c" + padded[i:i + n]
+        words = text.split()
+        lo, hi = self.word_ngrams
+        for n in range(lo, hi + 1):
+            for i in range(len(words) - n + 1):
+                yield "w" + " ".join(words[i:i + n])
+
+    def transform(self, text: str) -> Tuple[np.ndarray, float]:
+        """Return (feature indices, per-feature value) for text."""
+        mask = self.n_features - 1
+        indices = np.fromiter(
+            {zlib.crc32(g.encode()) & mask for g in self._grams(text)}, dtype=np.intp
+        )
+        value = 1.0 / np.sqrt(len(indices)) if len(indices) else 0.0
+        return indices, value
+
+class RouteClassifier:
+    """Multinomial logistic regression over hashed n-grams.
+
+    Prediction is a sparse column sum plus a softmax, which keeps a routing
+    decision in the tens of microseconds.
+    """
+
+    def __init__(self,
+                 labels: Sequence[str] = (TEXT_MODEL, VISION_MODEL),
+                 featurizer: Optional[HashedFeaturizer] = None):
+        self.labels = list(labels)
+        self.featurizer = featurizer or HashedFeaturizer()
+        self.weights = np.zeros((len(self.labels), self.featurizer.n_features), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+
+    def _probabilities(self, indices: np.ndarray, value: float) -> np.ndarray:
+        scores = self.weights[:, indices].sum(axis=1) * value + self.bias
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        probs = self._probabilities(*self.featurizer.transform(text))
+        return {label: float(p) for label, p in zip(self.labels, probs)}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return the most likely model and its probability."""
+        probs = self._probabilities(*self.featurizer.transform(text))
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def partial_fit(self, text: str, label: str, learning_rate: float = 0.5, l2: float = 1e-4) -> None:
+        """One SGD step of log loss on a single labelled example."""
+        if label not in self.labels:
+            self.labels.append(label)
+            self.weights = np.vstack([self.weights, np.zeros((1, self.weights.shape[1]), np.float32)])
+            self.bias = np.append(self.bias, np.float32(0.0))
+        indices, value = self.featurizer.transform(text)
+        probs = self._probabilities(indices, value)
+        target = np.zeros(len(self.labels), dtype=np.float32)
+        target[self.labels.index(label)] = 1.0
+        grad = (probs - target).astype(np.float32)
+        self.weights[:, indices] -= learning_rate * (np.outer(grad, np.full(len(indices), value))
+                                                     + l2 * self.weights[:, indices])
+        self.bias -= learning_rate * grad
+
+    def fit(self, examples: Sequence[Tuple[str, str]], epochs: int = 10, seed: int = 0) -> "RouteClassifier":
+        """Train on (prompt, model) pairs from scratch."""
+        rng = np.random.default_rng(seed)
+        self.weights[:] = 0.0
+        self.bias[:] = 0.0
+        examples = list(examples)
+        for epoch in range(epochs):
+            learning_rate = 0.5 / (1 + epoch)
+            for i in rng.permutation(len(examples)):
+                self.partial_fit(*examples[i], learning_rate=learning_rate)
+        return self
+
+    def save(self, path: Path) -> None:
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            labels=np.array(self.labels),
+            n_features=self.featurizer.n_features
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "RouteClassifier":
+        data = np.load(path, allow_pickle=False)
+        classifier = cls(
+            labels=[str(label) for label in data["labels"]],
+            featurizer=HashedFeaturizer(n_features=int(data["n_features"]))
+        )
+        classifier.weights = data["weights"].astype(np.float32)
+        classifier.bias = data["bias"].astype(np.float32)
+        return classifier
+
+    @classmethod
+    def load_or_default(cls, path: Optional[Path] = None) -> "RouteClassifier":
+        """Load a trained model, or train one on the seed examples."""
+        if path and Path(path).exists():
+            try:
+                return cls.load(Path(path))
+            except Exception as e:
+                log.warning(f"Could not load routing model {path}: {str(e)}. Using seed model.")
+        return cls().fit(SEED_EXAMPLES)
+
+def load_outcomes(log_path: Path) -> List[Tuple[str, str]]:
+    """Read (prompt, correct model) pairs from a routing log.
+
+    Only entries carrying a "label" (a recorded outcome) are used; plain
+    routing decisions are the classifier's own guesses.
+    """
+    examples = []
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("label") and entry.get("prompt"):
+                examples.append((entry["prompt"], entry["label"]))
+    return examples
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or query the Kalki routing classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="Train from a routing log")
+    train.add_argument("log", type=Path, help="routing_log.jsonl written by router.ModelRouter")
+    train.add_argument("--out", type=Path, default=Path("routing_model.npz"))
+    train.add_argument("--epochs", type=int, default=10)
+    train.add_argument("--no-seed", action="store_true", help="Do not mix in the seed examples")
+
+    predict = sub.add_parser("predict", help="Classify prompts")
+    predict.add_argument("prompts", nargs="+")
+    predict.add_argument("--model", type=Path, default=Path("routing_model.npz"))
+
+    args = parser.parse_args()
+    if args.command == "train":
+        examples = load_outcomes(args.log)
+        if not args.no_seed:
+            examples += SEED_EXAMPLES
+        classifier = RouteClassifier().fit(examples, epochs=args.epochs)
+        classifier.save(args.out)
+        correct = sum(classifier.predict(p)[0] == label for p, label in examples)
+        print(f"Trained on {len(examples)} examples, training accuracy {correct / len(examples):.1%}")
+    else:
+        classifier = RouteClassifier.load_or_default(args.model)
+        for prompt in args.prompts:
+            label, confidence = classifier.predict(prompt)
+            print(f"{label:12} {confidence:.2f}  {prompt}")
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,65 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import json
 import logging
+import time
+from pathlib import Path
 from model_handler import ModelHandler
+from route_classifier import RouteClassifier, TEXT_MODEL, VISION_MODEL
 
 class ModelRouter:
-    def __init__(self, model_handler: ModelHandler):
+    def __init__(self, 
+                 model_handler: ModelHandler,
+                 classifier: Optional[RouteClassifier] = None,
+                 classifier_path: str = "routing_model.npz",
+                 routing_log: Optional[str] = "logs/routing_log.jsonl",
+                 routing_log_max_bytes: int = 1 << 20,
+                 vision_threshold: float = 0.6):
         self.model = model_handler
         self.logger = logging.getLogger("kalki.router")
         
-        # Keywords that suggest vision tasks
-        self.vision_keywords = [
-            "see", "look", "show", "image", "picture", "screen", 
-            "describe", "what is in", "what's in", "visual"
-        ]
+        # Learned text/vision classifier; the vision model is much slower, so
+        # it is only chosen when the classifier is confident
+        self.classifier = classifier or RouteClassifier.load_or_default(Path(classifier_path))
+        self.vision_threshold = vision_threshold
+        # Only corrected routes are logged, as training data for
+        # route_classifier.py; the file is rotated to .1 once it is full
+        self.routing_log = Path(routing_log) if routing_log else None
+        self.routing_log_max_bytes = routing_log_max_bytes
+        
+    def classify(self, prompt: str, image_path: Optional[str] = None) -> Tuple[str, float]:
+        """Return the model for a prompt and the classifier's confidence"""
+        if image_path:
+            return VISION_MODEL, 1.0
+        model, confidence = self.classifier.predict(prompt)
+        if model == VISION_MODEL and confidence < self.vision_threshold:
+            return TEXT_MODEL, 1.0 - confidence
+        return model, confidence
         
     def choose_model(self, prompt: str, image_path: Optional[str] = None) -> str:
         """Choose appropriate model based on the task"""
-        if image_path or any(keyword in prompt.lower() for keyword in self.vision_keywords):
-            return "qwen:2.5"
-        return "dolphin3"
+        return self.classify(prompt, image_path)[0]
+        
+    def record_outcome(self, prompt: str, correct_model: str) -> None:
+        """Learn which model should have handled a prompt and log it for retraining"""
+        self.classifier.partial_fit(prompt, correct_model)
+        self._log({"prompt": prompt, "label": correct_model})
+        
+    def _log(self, entry: Dict[str, Any]) -> None:
+        if not self.routing_log:
+            return
+        try:
+            self.routing_log.parent.mkdir(parents=True, exist_ok=True)
+            if self.routing_log.exists() and self.routing_log.stat().st_size >= self.routing_log_max_bytes:
+                self.routing_log.replace(self.routing_log.with_name(self.routing_log.name + ".1"))
+            with open(self.routing_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": time.time(), **entry}) + "\n")
+        except OSError as e:
+            self.logger.warning(f"Could not write routing log: {str(e)}")
         
     def route_task(self, 
                    prompt: str, 
                    image_path: Optional[str] = None,
+                   model: Optional[str] = None,
                    **kwargs) -> Dict[Any, Any]:
         """
         Route the task to appropriate model and return response
@@ -29,11 +67,17 @@ class ModelRouter:
         Args:
             prompt: The user's text prompt
             image_path: Optional path to image for visual tasks
+            model: Force a model; if it differs from the classifier's choice
+                the prompt is recorded as a routing correction
             **kwargs: Additional parameters to pass to model API
         """
         try:
-            model = self.choose_model(prompt, image_path)
-            self.logger.info(f"Routing task to model: {model}")
+            chosen, confidence = self.classify(prompt, image_path)
+            if model and model != chosen and not image_path:
+                self.logger.info(f"Routing overridden: {chosen} -> {model}")
+                self.record_outcome(prompt, model)
+            model = model or chosen
+            self.logger.info(f"Routing task to model: {model} (confidence {confidence:.2f})")
             
             # Add system prompt for better task understanding
             system = """You are Kalki, an AI assistant that can control the computer.